@@ -18,22 +18,41 @@ import argparse
 import os
 from pathlib import Path
 import xml.etree.ElementTree as ET
+from collections import defaultdict
 import logging
 import klayout.db
 from datetime import datetime, timezone
 import time
-from subprocess import check_call
+from subprocess import CalledProcessError, Popen
+import json
+import csv
+import hashlib
+import math
+import re
+import shutil
 import multiprocessing as mp
 import concurrent.futures
 import traceback
-from typing import Dict, List, Set, Union, Tuple
+from typing import Callable, Dict, Iterator, List, Union, Tuple
 import sys
 
+try:
+    import layout_cache
+except ModuleNotFoundError:
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+    import layout_cache
 
-def get_rules_with_violations(results_database: Union[str, Path]) -> Set[str]:
+# Coordinate pairs in RDB values, e.g. "polygon: (0.1,0.2;0.3,0.4)".
+RDB_POINT_PATTERN = re.compile(r"(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?),(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)")
+
+
+def read_rdb_summary(results_database: Union[str, Path]) -> Dict[str, int]:
     """
-    Parse a KLayout RDB (Results Database) file and return a set of rule names
-    that have reported violations.
+    Stream a KLayout RDB (Results Database) file and count violations per rule.
+
+    Only the <category> names and the <category> tag of each <item> are read.
+    Every element is released as soon as it is parsed, so large reports are
+    scanned in constant memory.
 
     Parameters
     ----------
@@ -42,8 +61,49 @@ def get_rules_with_violations(results_database: Union[str, Path]) -> Set[str]:
 
     Returns
     -------
-    set
-        A set of rule names (strings) that have violations.
+    dict
+        Mapping of every rule name in the database to its violation count.
+        Rules that ran without violations have a count of 0.
+    """
+    rule_counts = defaultdict(int)
+    stack = []
+
+    for event, elem in ET.iterparse(str(results_database), events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            continue
+
+        if len(stack) == 4:
+            section = stack[1].tag
+            # Top-level categories: report-database/categories/category/name
+            if section == "categories" and elem.tag == "name":
+                rule_counts[f"{elem.text}".replace("'", "")] += 0
+            # Item category: report-database/items/item/category
+            elif section == "items" and elem.tag == "category":
+                rule_counts[f"{elem.text}".replace("'", "")] += 1
+
+        stack.pop()
+        if len(stack) == 2:
+            # Release finished items and categories
+            stack[-1].remove(elem)
+
+    return rule_counts
+
+
+def get_rule_violation_counts(results_database: Union[str, Path]) -> Dict[str, int]:
+    """
+    Parse a KLayout RDB (Results Database) file and return the number of
+    violations reported for each rule.
+
+    Parameters
+    ----------
+    results_database : str or Path
+        Path to the KLayout-generated RDB file.
+
+    Returns
+    -------
+    dict
+        Mapping of rule names to their violation counts.
     """
 
     results_database = Path(results_database)
@@ -52,17 +112,40 @@ def get_rules_with_violations(results_database: Union[str, Path]) -> Set[str]:
         raise FileNotFoundError(f"No such file: {results_database}")
 
     try:
-        tree = ET.parse(results_database)
-        root = tree.getroot()
+        return read_rdb_summary(results_database)
     except ET.ParseError as e:
         logging.error(f"Failed to parse results database: {results_database}")
         raise e
 
-    violating_rules = set()
-    for rule in root[7]:  # root[7] : List rules with violations
-        violating_rules.add(f"{rule[1].text}".replace("'", ""))
 
-    return violating_rules
+def write_summary_json(
+    summary_json: Union[str, Path], report_path: Path, rule_counts: Dict[str, int]
+):
+    """
+    Write a small JSON summary of the DRC results for CI consumption.
+
+    Parameters
+    ----------
+    summary_json : str or Path
+        Path of the JSON file to write.
+    report_path : Path
+        Path to the final results database.
+    rule_counts : dict
+        Mapping of rule names to their violation counts.
+    """
+    violations = {rule: count for rule, count in sorted(rule_counts.items()) if count > 0}
+    summary = {
+        "status": "fail" if violations else "pass",
+        "report": str(report_path),
+        "total_violations": sum(violations.values()),
+        "violated_rules": violations,
+        "checked_rules": len(rule_counts),
+    }
+
+    with open(summary_json, "w") as f:
+        json.dump(summary, f, indent=2)
+
+    logging.info(f"DRC summary written to: {summary_json}")
 
 
 def _get_cell_key(cell: ET.Element) -> str:
@@ -77,10 +160,12 @@ def _get_cell_key(cell: ET.Element) -> str:
 
 
 def _merge_categories(base_categories: ET.Element, new_root: ET.Element):
+    existing_names = {c.findtext("name") for c in base_categories.findall("category")}
     categories = new_root.find("categories")
     if categories is not None:
         for category in categories.findall("category"):
-            base_categories.append(category)
+            if category.findtext("name") not in existing_names:
+                base_categories.append(category)
 
 
 def _merge_cells(base_cells: ET.Element, new_root: ET.Element, existing_keys: set):
@@ -93,13 +178,6 @@ def _merge_cells(base_cells: ET.Element, new_root: ET.Element, existing_keys: se
                 existing_keys.add(key)
 
 
-def _merge_items(base_items: ET.Element, new_root: ET.Element):
-    items = new_root.find("items")
-    if items is not None:
-        for item in items.findall("item"):
-            base_items.append(item)
-
-
 def _group_cells_by_base(base_cells: ET.Element) -> Dict[str, List[Tuple[ET.Element, str]]]:
     grouped = {}
     for cell in base_cells.findall("cell"):
@@ -113,8 +191,13 @@ def _group_cells_by_base(base_cells: ET.Element) -> Dict[str, List[Tuple[ET.Elem
     return grouped
 
 
-def _rename_plain_variants(base_cells: ET.Element, base_items: ET.Element) -> None:
-    """Rename plain variants to :org if other variants exist."""
+def _rename_plain_variants(base_cells: ET.Element) -> Dict[str, str]:
+    """
+    Rename plain variants to :org if other variants exist.
+
+    Returns the mapping of old to new cell names, so item references
+    can be renamed while they are streamed.
+    """
     grouped = _group_cells_by_base(base_cells)
     rename_map = {}
 
@@ -138,21 +221,65 @@ def _rename_plain_variants(base_cells: ET.Element, base_items: ET.Element) -> No
             if pname in rename_map:
                 parent_elem.text = rename_map[pname]
 
-    # Update <items>/<cell> references
-    for item in base_items.findall("item"):
-        cell_elem = item.find("cell")
-        if cell_elem is not None and cell_elem.text:
-            cname = cell_elem.text.strip()
-            if cname in rename_map:
-                cell_elem.text = rename_map[cname]
+    return rename_map
 
 
-def merge_klayout_drc_reports(input_files: List[str], output_file: str):
+def _iterparse_rdb(file_path: Union[str, Path]) -> Iterator[Tuple[str, ET.Element]]:
+    """
+    Stream a KLayout RDB file without keeping its markers in memory.
+
+    Yields ``("item", element)`` for every <item> in <items>. Each item is
+    released once the caller moves on. Finally yields ``("root", root)``
+    with the remaining sections (header, categories, cells and an empty
+    <items>).
+    """
+    depth = 0
+    root = None
+    items_elem = None
+
+    for event, elem in ET.iterparse(str(file_path), events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if depth == 1:
+                root = elem
+            elif depth == 2 and elem.tag == "items":
+                items_elem = elem
+            continue
+
+        depth -= 1
+        if depth == 2 and items_elem is not None and elem.tag == "item":
+            yield "item", elem
+            items_elem.remove(elem)
+        elif depth == 1 and elem.tag == "items":
+            items_elem = None
+
+    yield "root", root
+
+
+def _read_rdb_sections(file_path: Union[str, Path]) -> ET.Element:
+    """Read an RDB file, skipping all <item> entries."""
+    for kind, elem in _iterparse_rdb(file_path):
+        if kind == "root":
+            return elem
+
+
+def merge_klayout_drc_reports(
+    input_files: List[str],
+    output_file: str,
+    item_filter: Callable[[str, ET.Element], bool] = None,
+):
     """
     Merges multiple KLayout DRC report XML files into a single XML file.
+
+    The reports are merged in two streaming passes. The first pass collects
+    categories and cells, which are small. The second pass copies items one
+    at a time into the output. Memory use does not depend on the number of
+    markers.
+
+    If ``item_filter`` is given, it is called with the source file and each
+    <item> element, and only items for which it returns True are written.
     """
-    base_tree = ET.parse(input_files[0])
-    base_root = base_tree.getroot()
+    base_root = _read_rdb_sections(input_files[0])
 
     base_categories = base_root.find("categories")
     base_cells = base_root.find("cells")
@@ -163,23 +290,48 @@ def merge_klayout_drc_reports(input_files: List[str], output_file: str):
             f"Base file '{input_files[0]}' is missing required elements, failed in merging result database."
         )
 
-    # Merge remaining files
+    # Merge categories and cells of remaining files
+    merged_files = [input_files[0]]
     existing_keys = {_get_cell_key(c) for c in base_cells.findall("cell")}
     for file_path in input_files[1:]:
         try:
-            tree = ET.parse(file_path)
-            root = tree.getroot()
-            _merge_categories(base_categories, root)
-            _merge_cells(base_cells, root, existing_keys)
-            _merge_items(base_items, root)
+            root = _read_rdb_sections(file_path)
         except ET.ParseError as e:
             logging.error(f"Error parsing '{file_path}': {e}. Skipping.")
+            continue
+        _merge_categories(base_categories, root)
+        _merge_cells(base_cells, root, existing_keys)
+        merged_files.append(file_path)
 
     # Post-process renaming
-    _rename_plain_variants(base_cells, base_items)
+    rename_map = _rename_plain_variants(base_cells)
+
+    # Write output, streaming the items of every report
+    with open(output_file, "w", encoding="utf-8") as out:
+        out.write("<?xml version='1.0' encoding='utf-8'?>\n")
+        out.write(f"<{base_root.tag}>{base_root.text or ''}")
+
+        for section in base_root:
+            if section.tag != "items":
+                out.write(ET.tostring(section, encoding="unicode"))
+                continue
+
+            out.write(f"<items>{section.text or ''}")
+            for file_path in merged_files:
+                for kind, item in _iterparse_rdb(file_path):
+                    if kind != "item":
+                        continue
+                    if item_filter is not None and not item_filter(file_path, item):
+                        continue
+                    cell_elem = item.find("cell")
+                    if cell_elem is not None and cell_elem.text:
+                        cname = cell_elem.text.strip()
+                        if cname in rename_map:
+                            cell_elem.text = rename_map[cname]
+                    out.write(ET.tostring(item, encoding="unicode"))
+            out.write(f"</items>{section.tail or ''}")
 
-    # Write output
-    base_tree.write(output_file, encoding="utf-8", xml_declaration=True)
+        out.write(f"</{base_root.tag}>\n")
 
 
 def check_drc_results(
@@ -187,6 +339,7 @@ def check_drc_results(
     run_dir: Path,
     layout_path: str,
     switches: dict,
+    summary_json: Union[str, Path] = None,
 ):
     """
     Check the results database(s) generated from the KLayout DRC run and report if the run passed or failed.
@@ -201,6 +354,9 @@ def check_drc_results(
         Full path to the layout file (GDS/OAS).
     switches : SimpleNamespace or None
         Optional argument containing user switches, including topcell name.
+    summary_json : str or Path, optional
+        If given, a JSON summary with the pass/fail status and per-rule
+        violation counts is written to this path.
     """
 
     if len(results_db_files) < 1:
@@ -227,7 +383,11 @@ def check_drc_results(
         report_path = results_db_files[0]
 
     # Parse violations
-    violating_rules = get_rules_with_violations(report_path)
+    rule_counts = get_rule_violation_counts(report_path)
+    violating_rules = {rule for rule, count in rule_counts.items() if count > 0}
+
+    if summary_json:
+        write_summary_json(summary_json, report_path, rule_counts)
 
     if violating_rules:
         logging.error(
@@ -254,7 +414,7 @@ def check_drc_results(
     return 0
 
 
-def get_top_cell_names(gds_path: str):
+def get_top_cell_names(gds_path: str, cache_dir: Path = layout_cache.DEFAULT_CACHE_DIR):
     """
     get_top_cell_names get the top cell names from the GDS file.
 
@@ -262,17 +422,15 @@ def get_top_cell_names(gds_path: str):
     ----------
     gds_path : str
         Path to the target GDS file.
+    cache_dir : Path
+        Layout cache directory.
 
     Returns
     -------
     List of string
         Names of the top cell in the layout.
     """
-    layout = klayout.db.Layout()
-    layout.read(gds_path)
-    top_cells = [t.name for t in layout.top_cells()]
-
-    return top_cells
+    return layout_cache.get_top_cell_names(gds_path, cache_dir)
 
 
 def get_list_of_tables(drc_dir: str, switches: dict):
@@ -342,7 +500,7 @@ def get_run_top_cell_name(args, layout_path: str):
     if args.topcell:
         topcell = args.topcell
     else:
-        layout_topcells = get_top_cell_names(layout_path)
+        layout_topcells = get_top_cell_names(layout_path, Path(args.layout_cache_dir))
         if len(layout_topcells) > 1:
             logging.error(
                 "Layout has multiple topcells. Please specify one using --topcell."
@@ -413,9 +571,12 @@ def generate_klayout_switches(arguments, layout_path: str) -> dict:
     switches["no_angle"] = "true" if arguments.no_angle else "false"
     switches["density_sanity"] = "true" if arguments.density_sanity else "false"
     switches["density"] = "false" if arguments.no_density else "true"
+    if arguments.density_map:
+        switches["density_map"] = Path(arguments.density_map).resolve()
     switches["no_forbidden"] = "false"
     switches["no_pin"] = "false"
     switches["no_recommended"] = "true" if arguments.no_recommended else "false"
+    switches["profile"] = "true" if arguments.profile else "false"
 
     # If explicit table(s) are requested, default to table-only behavior:
     # - Do not auto-enable geometry tables unless explicitly selected.
@@ -531,13 +692,166 @@ def build_switches_string(sws: dict) -> str:
     return " ".join(f"-rd {k}='{v}'" for k, v in sws.items())
 
 
+def run_klayout_cmd(run_cmd: str) -> Dict[str, float]:
+    """
+    Run a KLayout command and measure its runtime, CPU time and peak memory.
+
+    Parameters
+    ----------
+    run_cmd : str
+        Shell command to execute.
+
+    Returns
+    -------
+    dict
+        Dictionary with the run time in seconds (``runtime``), the user and
+        system CPU time in seconds (``cpu_time``) and the peak resident
+        memory in MB (``peak_mem``) of the KLayout process.
+
+    Raises
+    ------
+    CalledProcessError
+        If the command exits with a non-zero status.
+    """
+    start_time = time.time()
+    proc = Popen(run_cmd, shell=True)
+    # wait4 reports the resource usage of this child only, which includes
+    # the KLayout process started by the shell.
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    if proc.returncode != 0:
+        raise CalledProcessError(proc.returncode, run_cmd)
+
+    return {
+        "runtime": time.time() - start_time,
+        "cpu_time": usage.ru_utime + usage.ru_stime,
+        "peak_mem": usage.ru_maxrss / 1024,
+    }
+
+
+def get_history_key(layout_path: str, topcell: str) -> str:
+    """
+    Build the key used to store run statistics of a layout in the history file.
+
+    Parameters
+    ----------
+    layout_path : str
+        Path to the layout file.
+    topcell : str
+        Name of the topcell being checked.
+
+    Returns
+    -------
+    str
+        History key for the layout and topcell.
+    """
+    return f"{Path(layout_path).name}:{topcell}"
+
+
+def load_run_history(history_path: Path) -> dict:
+    """
+    Load per-table run statistics recorded by previous DRC runs.
+
+    Parameters
+    ----------
+    history_path : Path
+        Path to the JSON history file.
+
+    Returns
+    -------
+    dict
+        Mapping of history key to a mapping of table name to its statistics.
+        An empty dict is returned if the file is missing or unreadable.
+    """
+    if not history_path.is_file():
+        return {}
+
+    try:
+        with open(history_path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logging.warning(f"Ignoring unreadable DRC history file {history_path}: {e}")
+        return {}
+
+
+def save_run_history(history_path: Path, history: dict):
+    """
+    Save per-table run statistics to the history file.
+
+    Parameters
+    ----------
+    history_path : Path
+        Path to the JSON history file.
+    history : dict
+        Mapping of history key to a mapping of table name to its statistics.
+    """
+    try:
+        history_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = history_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(history, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, history_path)
+    except OSError as e:
+        logging.warning(f"Could not write DRC history file {history_path}: {e}")
+
+
+def estimate_job_costs(
+    job_names: List[str], history: dict, history_key: str
+) -> Dict[str, Dict[str, float]]:
+    """
+    Estimate runtime and peak memory of each job from previous runs.
+
+    Statistics recorded for the same layout are preferred. Otherwise, the
+    largest value recorded for the job on any layout is used. Jobs without
+    any history are treated as the most expensive known job, so they are
+    started early and never underestimated against the memory budget.
+
+    Parameters
+    ----------
+    job_names : list of str
+        Names of the jobs (tables or decks) to schedule.
+    history : dict
+        Run history as returned by ``load_run_history``.
+    history_key : str
+        History key of the current layout.
+
+    Returns
+    -------
+    dict
+        Mapping of job name to its estimated ``runtime`` and ``peak_mem``.
+    """
+    layout_history = history.get(history_key, {})
+    costs = {}
+
+    for name in job_names:
+        if name in layout_history:
+            costs[name] = layout_history[name]
+            continue
+
+        other_runs = [stats[name] for stats in history.values() if name in stats]
+        if other_runs:
+            costs[name] = {
+                "runtime": max(r["runtime"] for r in other_runs),
+                "peak_mem": max(r["peak_mem"] for r in other_runs),
+            }
+
+    max_runtime = max((c["runtime"] for c in costs.values()), default=0.0)
+    max_mem = max((c["peak_mem"] for c in costs.values()), default=0.0)
+    for name in job_names:
+        costs.setdefault(name, {"runtime": max_runtime, "peak_mem": max_mem})
+
+    return costs
+
+
 def run_check(
     drc_file: str,
     drc_tables: List[str],
     layout_path: str,
     run_dir: Path,
     sws: dict,
-) -> str:
+    run_name: str = None,
+) -> Tuple[str, Dict[str, float]]:
     """
     Run a DRC check based on the provided DRC rule file.
 
@@ -553,21 +867,25 @@ def run_check(
         Output directory where reports and logs will be stored.
     sws : dict
         Dictionary containing runtime switches (e.g., topcell, threads, etc.).
+    run_name : str, optional
+        Name used for the report and log files. Defaults to the joined table names.
 
     Returns
     -------
-    str
-        Path to the DRC results database generated by the run.
+    tuple
+        Path to the DRC results database generated by the run, and the
+        run statistics (runtime in seconds, peak memory in MB).
     """
     layout_name = Path(layout_path).stem
     topcell = sws["topcell"]
+    run_name = run_name or "_".join(drc_tables)
 
     logging.info(
         f"Running IHP-SG13G2 {' '.join(drc_tables)} checks on design {layout_path}, topcell: {topcell}"
     )
 
-    report_path = run_dir / f"{layout_name}_{topcell}_{'_'.join(drc_tables)}.lyrdb"
-    log_path = run_dir / f"{layout_name}_{topcell}_{'_'.join(drc_tables)}.log"
+    report_path = run_dir / f"{layout_name}_{topcell}_{run_name}.lyrdb"
+    log_path = run_dir / f"{layout_name}_{topcell}_{run_name}.log"
     new_sws = sws.copy()
     new_sws.update(
         {"report": report_path, "log": log_path, "run_mode": sws["run_mode"]}
@@ -577,9 +895,13 @@ def run_check(
     sws_str += f" -rd tables=\"{' '.join(drc_tables)}\""
 
     run_cmd = f"klayout -b -r '{drc_file}' {sws_str}"
-    check_call(run_cmd, shell=True)
+    run_stats = run_klayout_cmd(run_cmd)
+    logging.info(
+        f"Finished {run_name} checks in {run_stats['runtime']:.2f} seconds "
+        f"(peak memory: {run_stats['peak_mem']:.1f} MB)"
+    )
 
-    return str(report_path)
+    return str(report_path), run_stats
 
 
 def run_parallel_run(
@@ -628,8 +950,20 @@ def run_parallel_run(
 
     # Main table-based checks
     table_list = args.table if args.table else get_list_of_tables(rule_deck_full_path, switches)
-    for table in table_list:
-        rule_deck_files[table] = rule_deck_full_path / "ihp-sg13g2.drc"
+    rule_deck_tables = {name: [name] for name in rule_deck_files}
+
+    if args.shared_derivations:
+        # Run all tables in one KLayout process, so the layout is read and
+        # layers_def.drc is evaluated only once for the whole table set.
+        rule_deck_files["tables"] = rule_deck_full_path / "ihp-sg13g2.drc"
+        rule_deck_tables["tables"] = table_list
+        logging.info(
+            f"Shared derivations enabled: running {len(table_list)} table(s) in a single KLayout process."
+        )
+    else:
+        for table in table_list:
+            rule_deck_files[table] = rule_deck_full_path / "ihp-sg13g2.drc"
+            rule_deck_tables[table] = [table]
 
     # Disable all runset switches after
     # assembling the table list
@@ -638,24 +972,73 @@ def run_parallel_run(
     switches["no_forbidden"] = "true"
     switches["no_pin"] = "true"
 
+    # Longest-job-first order based on previous runs, so slow decks
+    # do not end up as the tail of the run.
+    history_path = Path(args.history_file).expanduser().resolve()
+    history = load_run_history(history_path)
+    history_key = get_history_key(layout_path, switches["topcell"])
+    job_costs = estimate_job_costs(list(rule_deck_files), history, history_key)
+    pending = sorted(rule_deck_files, key=lambda n: -job_costs[n]["runtime"])
+    mem_budget = args.max_mem * 1024 if args.max_mem else None
+
+    logging.info(f"DRC jobs schedule: {', '.join(pending)}")
+
     result_db_files = []
+    run_stats = {}
     with concurrent.futures.ProcessPoolExecutor(max_workers=workers_count) as executor:
-        future_to_name = {
-            executor.submit(
-                run_check, rule_file, [name], layout_path, run_dir, switches
-            ): name
-            for name, rule_file in rule_deck_files.items()
-        }
+        future_to_name = {}
+        mem_in_use = 0.0
+
+        while pending or future_to_name:
+            # Start the longest pending jobs that fit in the memory budget.
+            for name in list(pending):
+                if len(future_to_name) >= workers_count:
+                    break
+                job_mem = job_costs[name]["peak_mem"]
+                if (
+                    mem_budget is not None
+                    and future_to_name
+                    and mem_in_use + job_mem > mem_budget
+                ):
+                    continue
+                if mem_budget is not None and job_mem > mem_budget:
+                    logging.warning(
+                        f"{name} is expected to use {job_mem:.1f} MB, "
+                        f"which exceeds the memory budget of {mem_budget:.1f} MB."
+                    )
+
+                future = executor.submit(
+                    run_check,
+                    rule_deck_files[name],
+                    rule_deck_tables[name],
+                    layout_path,
+                    run_dir,
+                    switches,
+                    name,
+                )
+                future_to_name[future] = name
+                mem_in_use += job_mem
+                pending.remove(name)
+
+            done, _ = concurrent.futures.wait(
+                future_to_name, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                name = future_to_name.pop(future)
+                mem_in_use -= job_costs[name]["peak_mem"]
+                try:
+                    report_path, stats = future.result()
+                    result_db_files.append(report_path)
+                    run_stats[name] = stats
+                except Exception as e:
+                    logging.error(f"{name} generated an exception: {e}")
+                    traceback.print_exc()
 
-        for future in concurrent.futures.as_completed(future_to_name):
-            name = future_to_name[future]
-            try:
-                result_db_files.append(future.result())
-            except Exception as e:
-                logging.error(f"{name} generated an exception: {e}")
-                traceback.print_exc()
+    if run_stats:
+        history.setdefault(history_key, {}).update(run_stats)
+        save_run_history(history_path, history)
 
-    return check_drc_results(result_db_files, run_dir, layout_path, switches)
+    return check_drc_results(result_db_files, run_dir, layout_path, switches, args.summary_json)
 
 
 def run_single_processor(
@@ -689,17 +1072,17 @@ def run_single_processor(
         """
         if flag_enabled:
             drc_path = rule_deck_full_path / "rule_decks" / f"{name}.drc"
-            result_dbs.append(run_check(drc_path, [name], layout_path, run_dir, switches))
+            result_dbs.append(run_check(drc_path, [name], layout_path, run_dir, switches)[0])
             logging.info(f"Completed running {name.capitalize()} checks.")
 
     # Handle *_only flags (exclusive checks)
     if args.antenna_only:
         run_check_by_flag(True, "antenna")
-        return check_drc_results(result_dbs, run_dir, layout_path, switches)
+        return check_drc_results(result_dbs, run_dir, layout_path, switches, args.summary_json)
 
     if args.density_only:
         run_check_by_flag(True, "density")
-        return check_drc_results(result_dbs, run_dir, layout_path, switches)
+        return check_drc_results(result_dbs, run_dir, layout_path, switches, args.summary_json)
 
     # Run primary table check
     tables = args.table if args.table else ["main"]
@@ -710,7 +1093,7 @@ def run_single_processor(
         switches["no_beol"] = "true"
         switches["no_forbidden"] = "true"
         switches["no_pin"] = "true"
-    result_dbs.append(run_check(rule_deck_full_path / "ihp-sg13g2.drc", tables, layout_path, run_dir, switches))
+    result_dbs.append(run_check(rule_deck_full_path / "ihp-sg13g2.drc", tables, layout_path, run_dir, switches)[0])
 
     # Run additional checks only when not in table-only mode.
     if not args.table:
@@ -719,7 +1102,729 @@ def run_single_processor(
         run_check_by_flag(not args.disable_extra_rules, "sg13g2_maximal")
 
     # Final result verification
-    return check_drc_results(result_dbs, run_dir, layout_path, switches)
+    return check_drc_results(result_dbs, run_dir, layout_path, switches, args.summary_json)
+
+
+def get_top_level_entries(
+    layout: klayout.db.Layout, top_cell: klayout.db.Cell, cell_hashes: Dict[int, str]
+) -> Dict[str, List[int]]:
+    """
+    Collect the shapes and instances placed directly in the top cell.
+
+    Parameters
+    ----------
+    layout : klayout.db.Layout
+        Layout holding the top cell.
+    top_cell : klayout.db.Cell
+        Top cell being checked.
+    cell_hashes : dict
+        Cell hashes as returned by ``layout_cache.compute_cell_hashes``.
+
+    Returns
+    -------
+    dict
+        Mapping of an entry key (hash of the shape or instance) to its
+        bounding box [left, bottom, right, top] in database units.
+    """
+    entries = {}
+
+    for li in layout.layer_indexes():
+        layer_info = str(layout.get_info(li))
+        for shape in top_cell.shapes(li).each():
+            key = hashlib.sha1(f"{layer_info} {shape}".encode()).hexdigest()
+            box = shape.bbox()
+            entries[key] = [box.left, box.bottom, box.right, box.top]
+
+    for inst in top_cell.each_inst():
+        key = hashlib.sha1(layout_cache.get_inst_key(inst, cell_hashes).encode()).hexdigest()
+        box = inst.bbox()
+        entries[key] = [box.left, box.bottom, box.right, box.top]
+
+    return entries
+
+
+def get_deck_hash(rule_deck_full_path: Path, switches: dict) -> str:
+    """
+    Compute a hash of the rule decks, the rule values JSON and the switches.
+
+    Parameters
+    ----------
+    rule_deck_full_path : Path
+        Path to the directory containing rule decks.
+    switches : dict
+        Dictionary of switches passed to KLayout.
+
+    Returns
+    -------
+    str
+        Hex digest identifying the rule set used for a run.
+    """
+    digest = hashlib.sha256()
+
+    for deck in sorted(rule_deck_full_path.rglob("*.drc")):
+        if "testing" in deck.relative_to(rule_deck_full_path).parts:
+            continue
+        digest.update(deck.read_bytes())
+
+    digest.update(Path(switches["drc_json"]).read_bytes())
+
+    run_switches = {
+        k: str(v) for k, v in switches.items() if k not in ("input", "topcell", "threads")
+    }
+    digest.update(json.dumps(run_switches, sort_keys=True).encode())
+
+    return digest.hexdigest()
+
+
+def get_dirty_region(old_entries: dict, new_entries: dict) -> klayout.db.Region:
+    """
+    Build the region covered by top-level shapes and instances that were
+    added, removed or changed between two runs.
+
+    Parameters
+    ----------
+    old_entries : dict
+        Top-level entries recorded by the cached run.
+    new_entries : dict
+        Top-level entries of the current layout.
+
+    Returns
+    -------
+    klayout.db.Region
+        Merged dirty region in database units.
+    """
+    dirty = klayout.db.Region()
+
+    for key in old_entries.keys() ^ new_entries.keys():
+        left, bottom, right, top = old_entries.get(key) or new_entries[key]
+        dirty.insert(klayout.db.Box(left, bottom, right, top))
+
+    return dirty.merged()
+
+
+def write_window_layout(
+    layout: klayout.db.Layout,
+    topcell: str,
+    window: klayout.db.Region,
+    output_path: Path,
+):
+    """
+    Write a flat layout containing only the given window of the top cell.
+
+    Parameters
+    ----------
+    layout : klayout.db.Layout
+        Full layout. It is modified in place.
+    topcell : str
+        Name of the top cell. The window layout keeps the same top cell name.
+    window : klayout.db.Region
+        Region to keep, in database units.
+    output_path : Path
+        Path of the window layout to write.
+    """
+    top_cell = layout.cell(topcell)
+    boxes = [polygon.bbox() for polygon in window.each()]
+    clip_cells = layout.multi_clip(top_cell.cell_index(), boxes)
+
+    layout.rename_cell(top_cell.cell_index(), f"{topcell}$ORIG")
+    window_cell = layout.create_cell(topcell)
+    for ci in clip_cells:
+        window_cell.insert(klayout.db.CellInstArray(ci, klayout.db.Trans()))
+    window_cell.flatten(True)
+
+    save_options = klayout.db.SaveLayoutOptions()
+    save_options.add_cell(window_cell.cell_index())
+    layout.write(str(output_path), save_options)
+
+
+def get_item_bbox(item: ET.Element) -> klayout.db.DBox:
+    """
+    Return the bounding box of all geometry values of an RDB item in microns.
+
+    An empty box is returned for items without geometry.
+    """
+    bbox = klayout.db.DBox()
+    for value in item.iter("value"):
+        for x, y in RDB_POINT_PATTERN.findall(value.text or ""):
+            bbox += klayout.db.DPoint(float(x), float(y))
+    return bbox
+
+
+def load_incremental_cache(cache_path: Path) -> dict:
+    """
+    Load the manifest of the incremental DRC cache.
+
+    Parameters
+    ----------
+    cache_path : Path
+        Cache directory for the layout and topcell.
+
+    Returns
+    -------
+    dict
+        Cache manifest, or an empty dict if there is no usable cache.
+    """
+    manifest_path = cache_path / "manifest.json"
+    if not manifest_path.is_file():
+        return {}
+
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logging.warning(f"Ignoring unreadable incremental DRC cache {manifest_path}: {e}")
+        return {}
+
+
+def save_incremental_cache(cache_path: Path, manifest: dict, reports: Dict[str, str]):
+    """
+    Store the reports and the manifest of a run in the incremental DRC cache.
+
+    Parameters
+    ----------
+    cache_path : Path
+        Cache directory for the layout and topcell.
+    manifest : dict
+        Hashes and top-level entries of the checked layout.
+    reports : dict
+        Mapping of cached deck name to the report generated for it.
+    """
+    cache_path.mkdir(parents=True, exist_ok=True)
+    for name, report in reports.items():
+        shutil.copyfile(report, cache_path / f"{name}.lyrdb")
+
+    manifest = dict(manifest, reports=sorted(reports))
+    with open(cache_path / "manifest.json", "w") as f:
+        json.dump(manifest, f)
+
+    logging.info(f"Incremental DRC cache updated: {cache_path}")
+
+
+def get_local_global_decks(args, rule_deck_full_path: Path, switches: dict) -> Tuple[List[str], dict, dict]:
+    """
+    Select the rule decks of an incremental or windowed DRC run.
+
+    Local decks (tables and extra rules) can be run on a window of the
+    layout, global decks (density, antenna) always run on the full layout.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Parsed CLI arguments from the user.
+    rule_deck_full_path : Path
+        Path to the rule deck directory.
+    switches : dict
+        Dictionary of KLayout switches. Switches of skipped main checks are set in place.
+
+    Returns
+    -------
+    tuple
+        Rule tables to run, and the local and global decks as mappings of
+        deck name to (deck path, tables).
+    """
+    table_only_mode = bool(args.table)
+    tables = args.table if table_only_mode else ["main"]
+    if "main" not in tables:
+        switches["no_feol"] = "true"
+        switches["no_beol"] = "true"
+        switches["no_forbidden"] = "true"
+        switches["no_pin"] = "true"
+
+    local_decks = {"tables": (rule_deck_full_path / "ihp-sg13g2.drc", tables)}
+    global_decks = {}
+    if not table_only_mode:
+        if not args.disable_extra_rules:
+            local_decks["sg13g2_maximal"] = (
+                rule_deck_full_path / "rule_decks" / "sg13g2_maximal.drc",
+                ["sg13g2_maximal"],
+            )
+        if args.antenna:
+            global_decks["antenna"] = (
+                rule_deck_full_path / "rule_decks" / "antenna.drc",
+                ["antenna"],
+            )
+        if not args.no_density:
+            global_decks["density"] = (
+                rule_deck_full_path / "rule_decks" / "density.drc",
+                ["density"],
+            )
+
+    return tables, local_decks, global_decks
+
+
+def get_incremental_manifest(
+    layout: klayout.db.Layout,
+    top_cell: klayout.db.Cell,
+    rule_deck_full_path: Path,
+    switches: dict,
+    tables: List[str],
+) -> dict:
+    """
+    Hash the layout and the rule decks for the incremental DRC cache.
+
+    Parameters
+    ----------
+    layout : klayout.db.Layout
+        Layout to check.
+    top_cell : klayout.db.Cell
+        Top cell of the layout.
+    rule_deck_full_path : Path
+        Path to the rule deck directory.
+    switches : dict
+        Dictionary of KLayout switches.
+    tables : list
+        Rule tables to run.
+
+    Returns
+    -------
+    dict
+        Manifest with the top cell hash, the deck hash and the top-level entries.
+    """
+    cell_hashes = layout_cache.compute_cell_hashes(layout)
+    return {
+        "top_hash": cell_hashes[top_cell.cell_index()],
+        "deck_hash": get_deck_hash(rule_deck_full_path, dict(switches, tables=" ".join(tables))),
+        "top_entries": get_top_level_entries(layout, top_cell, cell_hashes),
+    }
+
+
+def write_dirty_window(
+    layout: klayout.db.Layout,
+    topcell: str,
+    dirty_region: klayout.db.Region,
+    halo: float,
+    window_path: Path,
+):
+    """
+    Clip the changed area of the layout, enlarged by the halo, into a window layout.
+
+    Parameters
+    ----------
+    layout : klayout.db.Layout
+        Full layout. It is modified in place.
+    topcell : str
+        Name of the top cell.
+    dirty_region : klayout.db.Region
+        Changed area in database units.
+    halo : float
+        Halo around the changed area in microns.
+    window_path : Path
+        Path of the window layout to write.
+    """
+    window = dirty_region.sized(int(round(halo / layout.dbu))).merged()
+    logging.info(
+        f"Incremental DRC: {window.count()} changed window(s) covering "
+        f"{window.area() * layout.dbu ** 2:.2f} um^2, halo {halo} um."
+    )
+    write_window_layout(layout, topcell, window, window_path)
+
+
+def merge_window_report(
+    cached_report: Path,
+    window_report: str,
+    report_path: Path,
+    dirty_region: klayout.db.Region,
+    dbu: float,
+):
+    """
+    Merge the cached markers outside the changed area with the markers
+    of the window run inside it.
+
+    Parameters
+    ----------
+    cached_report : Path
+        Report of the cached run on the full layout.
+    window_report : str
+        Report of the run on the window layout.
+    report_path : Path
+        Path of the merged report.
+    dirty_region : klayout.db.Region
+        Changed area in database units.
+    dbu : float
+        Database unit of the layout.
+    """
+    core_boxes = [polygon.bbox().to_dtype(dbu) for polygon in dirty_region.each()]
+
+    def keep_item(file_path, item):
+        bbox = get_item_bbox(item)
+        in_core = not bbox.empty() and any(bbox.touches(b) for b in core_boxes)
+        return in_core if str(file_path) == str(window_report) else not in_core
+
+    merge_klayout_drc_reports([str(cached_report), window_report], str(report_path), item_filter=keep_item)
+
+
+def run_incremental(
+    args,
+    rule_deck_full_path: Path,
+    layout_path: str,
+    switches: Dict,
+    run_dir: Path,
+) -> int:
+    """
+    Runs the DRC checks incrementally, re-checking only the parts of the
+    layout that changed since the cached run.
+
+    Local checks (tables and extra rules) are re-run on a window around the
+    changed top-level shapes and instances, enlarged by the halo. Cached
+    markers outside the changed area are merged with the new markers inside
+    it. Global checks (density, antenna) are re-run on the full layout
+    whenever the layout changed.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Parsed CLI arguments from the user.
+    rule_deck_full_path : Path
+        Path to the rule deck directory.
+    layout_path : str
+        Absolute path to the input layout (GDS/OAS).
+    switches : dict
+        Dictionary of KLayout switches.
+    run_dir : Path
+        Path to the output directory for this DRC run.
+    """
+    # Cached markers are filtered by location, so they must be reported
+    # in top cell coordinates.
+    if switches["run_mode"] != "flat":
+        logging.info("Incremental DRC uses flat run mode to report markers in top cell coordinates.")
+        switches["run_mode"] = "flat"
+
+    topcell = switches["topcell"]
+    layout_name = Path(layout_path).stem
+
+    layout = klayout.db.Layout()
+    layout.read(str(switches["input"]))
+    top_cell = layout.cell(topcell)
+    if top_cell is None:
+        logging.error(f"Topcell '{topcell}' not found in layout {layout_path}.")
+        exit(1)
+
+    tables, local_decks, global_decks = get_local_global_decks(args, rule_deck_full_path, switches)
+
+    manifest = get_incremental_manifest(layout, top_cell, rule_deck_full_path, switches, tables)
+
+    cache_path = Path(args.cache_dir).expanduser().resolve() / f"{layout_name}_{topcell}"
+    cached = load_incremental_cache(cache_path)
+    cached_reports = set(cached.get("reports", []))
+    cache_valid = cached.get("deck_hash") == manifest["deck_hash"]
+    layout_unchanged = cache_valid and cached.get("top_hash") == manifest["top_hash"]
+
+    # Decide what has to run and on which layout.
+    jobs = {}
+    dirty_region = None
+    if cache_valid and cached_reports >= set(local_decks):
+        if layout_unchanged:
+            logging.info("Layout unchanged since the cached DRC run, reusing cached results.")
+        else:
+            dirty_region = get_dirty_region(cached["top_entries"], manifest["top_entries"])
+            window_path = run_dir / f"{layout_name}_window.gds"
+            write_dirty_window(layout, topcell, dirty_region, args.halo, window_path)
+            window_sws = dict(switches, input=str(window_path))
+            jobs.update({name: (deck, t, window_sws) for name, (deck, t) in local_decks.items()})
+    else:
+        if cached:
+            logging.info("Rule decks or switches changed since the cached DRC run, running full DRC.")
+        jobs.update({name: (deck, t, switches) for name, (deck, t) in local_decks.items()})
+
+    for name, (deck, t) in global_decks.items():
+        if not (layout_unchanged and name in cached_reports):
+            jobs[name] = (deck, t, switches)
+
+    # Run the required checks.
+    new_reports = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers_count) as executor:
+        future_to_name = {
+            executor.submit(run_check, deck, t, sws["input"], run_dir, sws, name): name
+            for name, (deck, t, sws) in jobs.items()
+        }
+        for future in concurrent.futures.as_completed(future_to_name):
+            name = future_to_name[future]
+            try:
+                new_reports[name] = future.result()[0]
+            except Exception as e:
+                logging.error(f"{name} generated an exception: {e}")
+                traceback.print_exc()
+
+    if set(new_reports) != set(jobs):
+        logging.error("Incremental DRC run failed, the cache is left unchanged.")
+        return check_drc_results(list(new_reports.values()), run_dir, layout_path, switches, args.summary_json)
+
+    # Assemble the report of every deck.
+    reports = {}
+    for name in list(local_decks) + list(global_decks):
+        report_path = run_dir / f"{layout_name}_{topcell}_{name}.lyrdb"
+        cached_report = cache_path / f"{name}.lyrdb"
+
+        if name in new_reports and (dirty_region is None or name in global_decks):
+            reports[name] = new_reports[name]
+        elif name in new_reports:
+            # Keep cached markers outside the changed area and new markers inside it.
+            merge_window_report(cached_report, new_reports[name], report_path, dirty_region, layout.dbu)
+            os.remove(new_reports[name])
+            reports[name] = str(report_path)
+        else:
+            shutil.copyfile(cached_report, report_path)
+            reports[name] = str(report_path)
+
+    save_incremental_cache(cache_path, manifest, reports)
+
+    return check_drc_results(list(reports.values()), run_dir, layout_path, switches, args.summary_json)
+
+
+def get_layout_bbox(
+    layout_path: str, topcell: str, cache_dir: Path = layout_cache.DEFAULT_CACHE_DIR
+) -> klayout.db.DBox:
+    """
+    Return the bounding box of the topcell in microns.
+
+    The box is taken from the layout cache sidecar if the layout was ingested.
+
+    Parameters
+    ----------
+    layout_path : str
+        Path to the layout file.
+    topcell : str
+        Name of the topcell.
+    cache_dir : Path
+        Directory of the layout cache.
+
+    Returns
+    -------
+    klayout.db.DBox
+        Bounding box of the topcell.
+    """
+    info = layout_cache.get_cached_layout_info(layout_path, cache_dir)
+    if info is not None and info["bbox"].get(topcell):
+        return klayout.db.DBox(*info["bbox"][topcell])
+
+    layout = klayout.db.Layout()
+    layout.read(layout_path)
+    top_cell = layout.cell(topcell)
+    if top_cell is None:
+        logging.error(f"Topcell '{topcell}' not found in layout {layout_path}.")
+        exit(1)
+    return top_cell.dbbox()
+
+
+def split_into_windows(bbox: klayout.db.DBox, count: int) -> List[klayout.db.DBox]:
+    """
+    Split a bounding box into a grid of at most ``count`` windows.
+
+    Parameters
+    ----------
+    bbox : klayout.db.DBox
+        Area to split, in microns.
+    count : int
+        Requested number of windows.
+
+    Returns
+    -------
+    list of klayout.db.DBox
+        Non-overlapping windows covering the bounding box, row by row.
+    """
+    # Pick the grid with the most windows (at most count) whose windows are
+    # closest to square.
+    width = max(bbox.width(), 1e-3)
+    height = max(bbox.height(), 1e-3)
+    cols, rows = max(
+        ((c, count // c) for c in range(1, count + 1)),
+        key=lambda g: (g[0] * g[1], -abs(math.log((width / g[0]) / (height / g[1])))),
+    )
+
+    step_x = bbox.width() / cols
+    step_y = bbox.height() / rows
+
+    windows = []
+    for row in range(rows):
+        for col in range(cols):
+            left = bbox.left + col * step_x
+            bottom = bbox.bottom + row * step_y
+            right = bbox.right if col == cols - 1 else left + step_x
+            top = bbox.top if row == rows - 1 else bottom + step_y
+            windows.append(klayout.db.DBox(left, bottom, right, top))
+
+    return windows
+
+
+def run_windowed(
+    args,
+    rule_deck_full_path: Path,
+    layout_path: str,
+    switches: Dict,
+    run_dir: Path,
+) -> int:
+    """
+    Runs the DRC checks on windows of the layout in separate processes.
+
+    The topcell bounding box is split into windows. Each window is checked
+    by its own KLayout process, with the input clipped to the window plus a
+    halo (``-rd clip``). A marker is kept by the first window whose core
+    area it touches. This drops markers that come from the clipped halo and
+    duplicates from overlapping halos. Global checks (density, antenna) run
+    once on the full layout.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Parsed CLI arguments from the user.
+    rule_deck_full_path : Path
+        Path to the rule deck directory.
+    layout_path : str
+        Absolute path to the input layout (GDS/OAS).
+    switches : dict
+        Dictionary of KLayout switches.
+    run_dir : Path
+        Path to the output directory for this DRC run.
+    """
+    # Markers are assigned to windows by location, so they must be reported
+    # in top cell coordinates.
+    if switches["run_mode"] != "flat":
+        logging.info("Windowed DRC uses flat run mode to report markers in top cell coordinates.")
+        switches["run_mode"] = "flat"
+
+    topcell = switches["topcell"]
+    layout_name = Path(layout_path).stem
+
+    _, local_decks, global_decks = get_local_global_decks(args, rule_deck_full_path, switches)
+
+    windows = split_into_windows(get_layout_bbox(layout_path, topcell, Path(args.layout_cache_dir)), args.windows)
+    logging.info(f"Windowed DRC: {len(windows)} window(s) with a halo of {args.halo} um.")
+
+    jobs = {name: (deck, t, switches) for name, (deck, t) in global_decks.items()}
+    window_jobs = {}
+    for index, window in enumerate(windows):
+        clip_box = window.enlarged(args.halo, args.halo)
+        clip_sws = dict(
+            switches,
+            clip=f"{clip_box.left},{clip_box.bottom},{clip_box.right},{clip_box.top}",
+        )
+        for name, (deck, t) in local_decks.items():
+            job_name = f"{name}_w{index}"
+            jobs[job_name] = (deck, t, clip_sws)
+            window_jobs[job_name] = (name, index)
+
+    new_reports = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers_count) as executor:
+        future_to_name = {
+            executor.submit(run_check, deck, t, layout_path, run_dir, sws, name): name
+            for name, (deck, t, sws) in jobs.items()
+        }
+        for future in concurrent.futures.as_completed(future_to_name):
+            name = future_to_name[future]
+            try:
+                new_reports[name] = future.result()[0]
+            except Exception as e:
+                logging.error(f"{name} generated an exception: {e}")
+                traceback.print_exc()
+
+    # Stitch window reports of each local deck.
+    reports = [new_reports[name] for name in global_decks if name in new_reports]
+    for deck_name in local_decks:
+        window_reports = {
+            new_reports[job]: index
+            for job, (name, index) in window_jobs.items()
+            if name == deck_name and job in new_reports
+        }
+        if not window_reports:
+            continue
+
+        def keep_item(file_path, item, window_reports=window_reports):
+            bbox = get_item_bbox(item)
+            if bbox.empty():
+                # Markers without geometry are kept once, from the first window.
+                return window_reports[file_path] == min(window_reports.values())
+            owners = [i for i, w in enumerate(windows) if bbox.touches(w)]
+            return bool(owners) and owners[0] == window_reports[file_path]
+
+        report_path = run_dir / f"{layout_name}_{topcell}_{deck_name}.lyrdb"
+        merge_klayout_drc_reports(list(window_reports), str(report_path), item_filter=keep_item)
+        for f in window_reports:
+            os.remove(f)
+        reports.append(str(report_path))
+
+    return check_drc_results(reports, run_dir, layout_path, switches, args.summary_json)
+
+
+def write_profile_report(run_dir: Path, layout_path: str, topcell: str):
+    """
+    Combine the per-rule profiles written by the rule decks into one report.
+
+    Each deck writes ``<report>_profile.csv`` next to its results database
+    when run with ``-rd profile=true``. This function sums the records per
+    deck and rule. It writes them sorted by wall time to
+    ``<layout>_<topcell>_profile.csv`` and ``.json``, then removes the
+    partial files.
+
+    Parameters
+    ----------
+    run_dir : Path
+        Directory where DRC run output is stored.
+    layout_path : str
+        Path to the layout file.
+    topcell : str
+        Name of the checked topcell.
+    """
+    prefix = f"{Path(layout_path).stem}_{topcell}_"
+    output_stem = run_dir / f"{prefix}profile"
+    partial_files = [
+        f for f in sorted(run_dir.glob("*_profile.csv")) if f != output_stem.with_suffix(".csv")
+    ]
+
+    if not partial_files:
+        logging.warning("No DRC profile data found.")
+        return
+
+    stats = {}
+    for profile_file in partial_files:
+        deck = profile_file.name[: -len("_profile.csv")]
+        if deck.startswith(prefix):
+            deck = deck[len(prefix):]
+        with open(profile_file, newline="") as f:
+            for row in csv.DictReader(f):
+                key = (deck, row["rule"])
+                entry = stats.setdefault(
+                    key,
+                    {
+                        "deck": deck,
+                        "rule": row["rule"],
+                        "calls": 0,
+                        "wall_time_s": 0.0,
+                        "cpu_time_s": 0.0,
+                        "memory_delta_kb": 0,
+                        "peak_memory_kb": 0,
+                        "output_count": 0,
+                    },
+                )
+                entry["calls"] += 1
+                entry["wall_time_s"] += float(row["wall_time_s"])
+                entry["cpu_time_s"] += float(row["cpu_time_s"])
+                entry["memory_delta_kb"] += int(row["memory_delta_kb"])
+                entry["peak_memory_kb"] = max(entry["peak_memory_kb"], int(row["memory_kb"]))
+                entry["output_count"] += int(row["output_count"])
+        os.remove(profile_file)
+
+    rows = sorted(stats.values(), key=lambda e: e["wall_time_s"], reverse=True)
+    total_wall = sum(e["wall_time_s"] for e in rows) or 1.0
+    for entry in rows:
+        entry["wall_time_s"] = round(entry["wall_time_s"], 4)
+        entry["cpu_time_s"] = round(entry["cpu_time_s"], 4)
+        entry["wall_time_pct"] = round(100.0 * entry["wall_time_s"] / total_wall, 2)
+
+    with open(output_stem.with_suffix(".csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    with open(output_stem.with_suffix(".json"), "w") as f:
+        json.dump(rows, f, indent=2)
+
+    logging.info(f"DRC profile written to: {output_stem.with_suffix('.csv')}")
+    logging.info("Slowest rules:")
+    for entry in rows[:10]:
+        logging.info(
+            f"  {entry['deck']:<16} {entry['rule']:<20} {entry['wall_time_s']:>10.2f} s "
+            f"({entry['wall_time_pct']:.1f}%)  {entry['output_count']} marker(s)"
+        )
 
 
 def main(run_dir: Path, args):
@@ -756,22 +1861,39 @@ def main(run_dir: Path, args):
     # Generate KLayout run switches from arguments
     switches = generate_klayout_switches(args, layout_path)
 
-    # Choose between single-core and multi-core run
-    if workers_count == 1 or args.antenna_only or args.density_only:
-        return run_single_processor(args, rule_deck_full_path, layout_path, switches, run_dir)
+    # Read the compact cached copy of the layout in all KLayout runs
+    if args.layout_cache:
+        cached_path, _ = layout_cache.ingest_layout(layout_path, Path(args.layout_cache_dir))
+        switches["input"] = cached_path
+
+    # Choose between incremental, windowed, single-core and multi-core run
+    if args.incremental and not (args.antenna_only or args.density_only):
+        res = run_incremental(args, rule_deck_full_path, layout_path, switches, run_dir)
+    elif args.windows and args.windows > 1 and not (args.antenna_only or args.density_only):
+        res = run_windowed(args, rule_deck_full_path, layout_path, switches, run_dir)
+    elif workers_count == 1 or args.antenna_only or args.density_only:
+        res = run_single_processor(args, rule_deck_full_path, layout_path, switches, run_dir)
     else:
-        return run_parallel_run(args, rule_deck_full_path, layout_path, switches, run_dir)
+        res = run_parallel_run(args, rule_deck_full_path, layout_path, switches, run_dir)
+
+    if args.profile:
+        write_profile_report(run_dir, layout_path, switches["topcell"])
 
+    return res
 
-def parse_args():
+
+def parse_args(argv: List[str] = None):
     USAGE = """
     run_drc.py (--help | -h)
     run_drc.py --path=<file_path>
             [--table=<table_name>]... [--mp=<num_cores>] [--run_dir=<run_dir_path>]
             [--topcell=<topcell_name>] [--run_mode=<mode>] [--drc_json=<json_path>]
             [--precheck_drc] [--disable_extra_rules] [--no_feol] [--no_beol] [--density_sanity] [--no_density]
-            [--density_thr=<density_threads>] [--density_only] [--antenna]
+            [--density_thr=<density_threads>] [--density_only] [--density_map=<json_path>] [--antenna]
             [--antenna_only] [--no_offgrid] [--no_angle] [--no_recommended]
+            [--shared_derivations] [--max_mem=<mem_gb>] [--history_file=<history_path>]
+            [--summary_json=<json_path>] [--incremental] [--cache_dir=<cache_path>] [--halo=<halo_um>]
+            [--windows=<num_windows>] [--profile] [--layout_cache] [--layout_cache_dir=<cache_path>]
     """
 
     parser = argparse.ArgumentParser(
@@ -860,6 +1982,11 @@ def parse_args():
     parser.add_argument(
         "--density_only", action="store_true", help="Run only density rules."
     )
+    parser.add_argument(
+        "--density_map",
+        type=str,
+        help="Write the per-layer density grids of the density run as JSON to this path.",
+    )
     parser.add_argument(
         "--antenna", action="store_true", help="Enable antenna rule checks."
     )
@@ -879,8 +2006,74 @@ def parse_args():
     parser.add_argument(
         "--no_recommended", action="store_true", help="Disable recommended rule checks."
     )
+    parser.add_argument(
+        "--shared_derivations",
+        action="store_true",
+        help="In parallel mode, run all DRC tables in a single KLayout process "
+        "so the layout load and layer derivations are shared between tables.",
+    )
+    parser.add_argument(
+        "--max_mem",
+        type=float,
+        default=None,
+        help="Memory budget in GB for concurrently running DRC jobs in parallel mode. "
+        "Estimates come from the history of previous runs. [default: no limit]",
+    )
+    parser.add_argument(
+        "--history_file",
+        type=str,
+        default=str(Path.home() / ".cache" / "ihp-sg13g2" / "drc_run_history.json"),
+        help="JSON file recording per-table runtime and peak memory, used to schedule "
+        "parallel runs longest-job-first. [default: ~/.cache/ihp-sg13g2/drc_run_history.json]",
+    )
+    parser.add_argument(
+        "--summary_json",
+        type=str,
+        default=None,
+        help="Write a JSON summary with the pass/fail status and per-rule violation counts to this path.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Re-check only the parts of the layout that changed since the last cached run.",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=str(Path.home() / ".cache" / "ihp-sg13g2" / "drc_incremental"),
+        help="Directory holding the incremental DRC cache. [default: ~/.cache/ihp-sg13g2/drc_incremental]",
+    )
+    parser.add_argument(
+        "--halo",
+        type=float,
+        default=50.0,
+        help="Halo in um added around changed areas in incremental mode, "
+        "and around each window in windowed mode. [default: 50]",
+    )
+    parser.add_argument(
+        "--windows",
+        type=int,
+        default=None,
+        help="Split the layout into this many windows, each checked by its own KLayout process.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record per-rule runtime, memory and marker counts, written as CSV/JSON next to the report.",
+    )
+    parser.add_argument(
+        "--layout_cache",
+        action="store_true",
+        help="Convert the input layout once to a compressed OASIS file in the layout cache and use it for all runs.",
+    )
+    parser.add_argument(
+        "--layout_cache_dir",
+        type=str,
+        default=str(layout_cache.DEFAULT_CACHE_DIR),
+        help="Directory of the layout cache. [default: ~/.cache/ihp-sg13g2/layouts]",
+    )
 
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 
 # ================================================================
@@ -0,0 +1,212 @@
+# ==========================================================================
+# Copyright 2025 IHP PDK Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# SPDX-License-Identifier: Apache-2.0
+# ==========================================================================
+
+"""
+Lightweight GDSII structure index.
+
+Only the record headers of a GDS file are scanned: the byte range of every
+structure and the names it references (SREF/AREF) are recorded, and the
+geometry is never decoded. A cell with all its descendants can then be
+written to a small GDS file by copying the byte ranges of its structures.
+"""
+
+import functools
+import struct
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Set, Tuple
+
+# GDSII record types
+BGNSTR = 0x05
+STRNAME = 0x06
+ENDSTR = 0x07
+SREF = 0x0A
+AREF = 0x0B
+SNAME = 0x12
+ENDLIB = 0x04
+
+STRUCTURE_RECORDS = frozenset([BGNSTR, STRNAME, ENDSTR, SREF, AREF, SNAME, ENDLIB])
+ENDLIB_RECORD = struct.pack(">HBB", 4, ENDLIB, 0)
+
+
+class GdsIndex(NamedTuple):
+    """Structure index of a GDS file."""
+
+    gds_path: str
+    # Library records before the first structure (HEADER, BGNLIB, LIBNAME, UNITS, ...)
+    header: Tuple[int, int]
+    # Byte range of each structure, from BGNSTR to ENDSTR included
+    cells: Dict[str, Tuple[int, int]]
+    # Names of the structures referenced by each structure
+    children: Dict[str, Set[str]]
+
+
+def _decode_name(data: bytes) -> str:
+    """Decode a GDS string record value, dropping the padding null byte."""
+    return data.rstrip(b"\0").decode("ascii", errors="replace")
+
+
+def index_gds(gds_path: str) -> GdsIndex:
+    """
+    Index the structures of a GDS file from its record headers.
+
+    Parameters
+    ----------
+    gds_path : str
+        Path to the GDS file.
+
+    Returns
+    -------
+    GdsIndex
+        Byte ranges and child references of all structures.
+    """
+    with open(gds_path, "rb") as f:
+        data = f.read()
+
+    header_end = None
+    cells = {}
+    children = {}
+    cell_name = None
+    cell_start = 0
+    in_ref = False
+
+    pos = 0
+    size = len(data)
+    while pos + 4 <= size:
+        length = (data[pos] << 8) | data[pos + 1]
+        record_type = data[pos + 2]
+        if length < 4:
+            raise ValueError(f"Invalid GDS record of length {length} at offset {pos} in {gds_path}")
+
+        # Geometry records are by far the most common, so they are skipped first
+        if record_type not in STRUCTURE_RECORDS:
+            pos += length
+            continue
+
+        if record_type == BGNSTR:
+            if header_end is None:
+                header_end = pos
+            cell_start = pos
+        elif record_type == STRNAME:
+            cell_name = _decode_name(data[pos + 4:pos + length])
+            children[cell_name] = set()
+        elif record_type in (SREF, AREF):
+            in_ref = True
+        elif record_type == SNAME and in_ref:
+            children[cell_name].add(_decode_name(data[pos + 4:pos + length]))
+            in_ref = False
+        elif record_type == ENDSTR:
+            cells[cell_name] = (cell_start, pos + length)
+        elif record_type == ENDLIB:
+            break
+
+        pos += length
+
+    if header_end is None:
+        header_end = pos
+
+    return GdsIndex(str(gds_path), (0, header_end), cells, children)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_cached_index(gds_path: str) -> GdsIndex:
+    return index_gds(gds_path)
+
+
+def get_gds_index(gds_path: str) -> GdsIndex:
+    """Return the index of a GDS file, indexing each file only once per process."""
+    return _get_cached_index(str(Path(gds_path).resolve()))
+
+
+def get_top_cells(index: GdsIndex) -> List[str]:
+    """Return the sorted names of the structures not referenced by any other."""
+    referenced = set().union(*index.children.values()) if index.children else set()
+    return sorted(set(index.cells) - referenced)
+
+
+def get_descendants(index: GdsIndex, cell_name: str) -> List[str]:
+    """
+    Return a cell and all cells below it in the hierarchy.
+
+    Parameters
+    ----------
+    index : GdsIndex
+        Index of the GDS file.
+    cell_name : str
+        Name of the cell.
+
+    Returns
+    -------
+    List of str
+        The cell followed by its descendants. References to structures that
+        are not defined in the file are skipped.
+    """
+    if cell_name not in index.cells:
+        raise KeyError(f"Cell '{cell_name}' not found in {index.gds_path}")
+
+    cells = [cell_name]
+    seen = {cell_name}
+    for name in cells:
+        for child in sorted(index.children.get(name, ())):
+            if child in index.cells and child not in seen:
+                seen.add(child)
+                cells.append(child)
+    return cells
+
+
+def write_cell_gds(index: GdsIndex, cell_name: str, out_path: str):
+    """
+    Write a cell and its descendants to a new GDS file.
+
+    The library header and the structures are copied byte for byte, so the
+    new file has the same units and geometry as the original.
+
+    Parameters
+    ----------
+    index : GdsIndex
+        Index of the source GDS file.
+    cell_name : str
+        Name of the cell to extract.
+    out_path : str
+        Path of the GDS file to write.
+    """
+    with open(index.gds_path, "rb") as src, open(out_path, "wb") as dst:
+        for start, end in [index.header] + [index.cells[c] for c in get_descendants(index, cell_name)]:
+            src.seek(start)
+            dst.write(src.read(end - start))
+        dst.write(ENDLIB_RECORD)
+
+
+def extract_cell_gds(gds_path: str, cell_name: str, out_path: str) -> Path:
+    """
+    Extract a cell of a GDS file to its own GDS file.
+
+    Parameters
+    ----------
+    gds_path : str
+        Path to the source GDS file.
+    cell_name : str
+        Name of the cell to extract.
+    out_path : str
+        Path of the GDS file to write.
+
+    Returns
+    -------
+    Path
+        Path of the written GDS file.
+    """
+    write_cell_gds(get_gds_index(gds_path), cell_name, out_path)
+    return Path(out_path)
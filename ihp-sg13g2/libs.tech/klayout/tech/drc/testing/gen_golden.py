@@ -19,20 +19,27 @@ import concurrent.futures
 import traceback
 import yaml
 import argparse
+import json
 import os
+import zlib
 from datetime import datetime, timezone
-import xml.etree.ElementTree as ET
 import time
 import pandas as pd
 import logging
 from pathlib import Path
-from tqdm import tqdm
-import re
 import gdstk
-import klayout.db
-import numpy as np
-from fnmatch import fnmatch
 import shutil
+import sys
+
+from rdb_markers import add_rdb_markers, get_rule_name, read_rdb_markers
+
+try:
+    import layout_cache
+    import regression_cache
+except ModuleNotFoundError:
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+    import layout_cache
+    import regression_cache
 
 
 SUPPORTED_TC_EXT = "gds"
@@ -40,6 +47,9 @@ SUPPORTED_SW_EXT = "yaml"
 GOLDEN_LAY_NUM = 222
 PATH_WIDTH = 0.01
 
+# Work files, shard completion markers and logs, inside the output directory
+STATE_DIR_NAME = ".gen_golden"
+
 
 def check_klayout_version():
     """
@@ -77,62 +87,179 @@ def check_klayout_version():
     logging.info(f"KLayout version: {version_str}")
 
 
-def _move_and_rename_golden_files(run_dir: Path, pattern_merged: str, pattern_golden: str):
-    for path in run_dir.rglob(f"*{pattern_merged}"):
-        if path.is_file():
-            base_name = path.name.replace(pattern_merged, "")
-            tokens = base_name.split("_")
-            simplified_name = "_".join(dict.fromkeys(tokens))
-            new_filename = f"{simplified_name}{pattern_golden}"
-            dest_path = run_dir / new_filename
+def get_golden_name(merged_name: str) -> str:
+    """
+    Get the final golden file name of a merged marker file.
 
-            try:
-                if path.resolve() != dest_path.resolve():
-                    shutil.move(str(path), str(dest_path))
-                elif path != dest_path:
-                    path.rename(dest_path)
-            except Exception as e:
-                logging.warning(f"Failed to move/rename {path} → {dest_path}: {e}")
+    Duplicated name segments are removed, e.g.
+    ``metal2_metal2_metaln_golden_merged.gds`` becomes ``metal2_metaln_golden.gds``.
+    """
+    tokens = merged_name.replace("_golden_merged.gds", "").split("_")
+    return f"{'_'.join(dict.fromkeys(tokens))}_golden.gds"
 
 
-def _remove_unwanted_top_level_files(run_dir: Path, pattern_golden: str):
-    for file in run_dir.glob("*"):
-        if file.is_file() and not fnmatch(file.name, f"*{pattern_golden}"):
-            try:
-                file.unlink()
-            except Exception as e:
-                logging.warning(f"Failed to remove file {file}: {e}")
+def parse_shard(shard: str):
+    """
+    Parse a shard selection of the form ``i/N``.
 
+    Parameters
+    ----------
+    shard : str
+        Shard number ``i`` (1-based) and shard count ``N``.
 
-def _remove_subdir_files_and_dirs(run_dir: Path):
-    for sub_path in run_dir.rglob("*"):
-        if sub_path.is_file() and sub_path.parent != run_dir:
-            try:
-                sub_path.unlink()
-            except Exception as e:
-                logging.warning(f"Failed to remove file {sub_path}: {e}")
+    Returns
+    -------
+    tuple
+        Shard number and shard count.
+    """
+    try:
+        shard_index, shard_count = (int(part) for part in shard.split("/"))
+    except ValueError:
+        logging.error(f"Invalid shard '{shard}', expected i/N, e.g. 1/4.")
+        exit(1)
 
-    for sub_dir in sorted(run_dir.rglob("*"), reverse=True):
-        if sub_dir.is_dir():
-            try:
-                sub_dir.rmdir()
-            except Exception as e:
-                logging.warning(f"Failed to remove directory {sub_dir}: {e}")
+    if not 1 <= shard_index <= shard_count:
+        logging.error(f"Invalid shard '{shard}', i must be between 1 and N.")
+        exit(1)
 
+    return shard_index, shard_count
 
-def clean_run_dir(run_dir: Path):
+
+def select_shard(tc_df: pd.DataFrame, shard_index: int, shard_count: int) -> pd.DataFrame:
     """
-    Cleans the run_dir by:
-    - Moving all *_golden_merged.gds files from subdirectories to the top level.
-    - Renaming them to remove duplicated name segments (e.g., activ_activ → activ).
-    - Removing all other files and directories.
+    Select the test cases of one shard.
+
+    Each (table, testcase, cell) shard is assigned from a CRC of its name, so
+    the assignment does not depend on the machine, the process or the other
+    test cases selected.
+
+    Parameters
+    ----------
+    tc_df : pd.DataFrame
+        DataFrame that holds all the test cases information.
+    shard_index : int
+        Shard number, from 1 to ``shard_count``.
+    shard_count : int
+        Number of shards.
+
+    Returns
+    -------
+    pd.DataFrame
+        Test cases of the shard.
     """
-    pattern_merged = "_golden_merged.gds"
-    pattern_golden = "_golden.gds"
+    shard_ids = [
+        zlib.crc32(f"{table}/{testcase}/{cell}".encode()) % shard_count
+        for table, testcase, cell in get_shard_keys(tc_df)
+    ]
+    return tc_df[[shard_id == shard_index - 1 for shard_id in shard_ids]]
+
+
+def get_shard_keys(tc_df: pd.DataFrame):
+    """Return the (table, testcase, cell) shard keys of the test cases."""
+    return zip(tc_df["table_name"], tc_df["testcase_basename"], tc_df["top_cell"])
+
 
-    _move_and_rename_golden_files(run_dir, pattern_merged, pattern_golden)
-    _remove_unwanted_top_level_files(run_dir, pattern_golden)
-    _remove_subdir_files_and_dirs(run_dir)
+def get_shard_marker(state_dir: Path, table_name: str, testcase_basename: str, cell_name: str) -> Path:
+    """Return the completion marker path of a (table, testcase, cell) shard."""
+    return state_dir / "done" / table_name / f"{testcase_basename}_{cell_name}.json"
+
+
+def get_shard_hash(drc_dir: Path, layout_path: Path, testcase_basename: str, table_name: str, cell_name: str) -> str:
+    """
+    Hash the inputs of a shard, so a golden file is regenerated once they change.
+
+    The hash covers the testcase layout, its switches file, the rule deck
+    with all files it includes, the tech JSON files, the DRC and golden
+    generation scripts and the KLayout version.
+
+    Parameters
+    ----------
+    drc_dir : Path
+        Path to the location where all runsets exist.
+    layout_path : Path
+        Path to the layout of the test pattern.
+    testcase_basename : str
+        Testcase name of the shard.
+    table_name : str
+        Table name of the shard.
+    cell_name : str
+        Cell name of the shard.
+
+    Returns
+    -------
+    str
+        Hash of the shard inputs.
+    """
+    if "antenna" in str(layout_path):
+        deck_path = drc_dir / "rule_decks" / "antenna.drc"
+    elif "density" in str(layout_path):
+        deck_path = drc_dir / "rule_decks" / "density.drc"
+    else:
+        deck_path = drc_dir / "ihp-sg13g2.drc"
+
+    files = [
+        layout_path,
+        Path(layout_path.parent) / f"{testcase_basename}.{SUPPORTED_SW_EXT}",
+        *regression_cache.get_included_files(deck_path),
+        drc_dir / "rule_decks" / "sg13g2_tech_default.json",
+        drc_dir.parents[1] / "python" / "sg13g2_pycell_lib" / "sg13g2_tech_mod.json",
+        drc_dir / "run_drc.py",
+        Path(__file__).resolve(),
+    ]
+    return regression_cache.get_result_key(files, [table_name, cell_name])
+
+
+def is_shard_done(state_dir: Path, table_name: str, testcase_basename: str, cell_name: str, shard_hash: str) -> bool:
+    """Return whether a shard has a completion marker written for the same inputs."""
+    marker = get_shard_marker(state_dir, table_name, testcase_basename, cell_name)
+    try:
+        with open(marker) as f:
+            return json.load(f).get("hash") == shard_hash
+    except (OSError, ValueError):
+        return False
+
+
+def mark_shard_done(
+    state_dir: Path,
+    table_name: str,
+    testcase_basename: str,
+    cell_name: str,
+    golden_path: Path,
+    shard_hash: str,
+):
+    """
+    Write the completion marker of a shard atomically.
+
+    Parameters
+    ----------
+    state_dir : Path
+        State directory of the golden generation.
+    table_name : str
+        Table name of the shard.
+    testcase_basename : str
+        Testcase name of the shard.
+    cell_name : str
+        Cell name of the shard.
+    golden_path : Path
+        Golden file generated by the shard.
+    shard_hash : str
+        Hash of the shard inputs, as returned by ``get_shard_hash``.
+    """
+    marker = get_shard_marker(state_dir, table_name, testcase_basename, cell_name)
+    marker.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = marker.with_name(f"{marker.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(
+            {
+                "table_name": table_name,
+                "testcase": testcase_basename,
+                "cell_name": cell_name,
+                "golden": golden_path.name,
+                "hash": shard_hash,
+            },
+            f,
+        )
+    os.replace(tmp_path, marker)
 
 
 def merge_cells(input_dir: Path, prefix: str, remove_org_gds: bool = True):
@@ -145,7 +272,8 @@ def merge_cells(input_dir: Path, prefix: str, remove_org_gds: bool = True):
     - prefix (str): File prefix (e.g., 'density_pass').
     - remove_org_gds (bool): If True, delete original GDS files after merging.
     """
-    gds_files = sorted(input_dir.glob(f"{prefix}_*.gds"))
+    output_file = input_dir / f"{prefix}_golden.gds"
+    gds_files = sorted(p for p in input_dir.glob(f"{prefix}_*.gds") if p != output_file)
 
     if not gds_files:
         return
@@ -160,9 +288,10 @@ def merge_cells(input_dir: Path, prefix: str, remove_org_gds: bool = True):
         top_cell = gds_lib.top_level()[0].copy(name=suffix)
         merged_lib.add(top_cell)
 
-    # Write merged GDS output
-    output_file = input_dir / f"{prefix}_golden.gds"
-    merged_lib.write_gds(str(output_file))
+    # Write merged GDS output, replacing the previous one atomically
+    tmp_file = output_file.with_name(f"{output_file.name}.{os.getpid()}.tmp")
+    merged_lib.write_gds(str(tmp_file))
+    os.replace(tmp_file, output_file)
 
     # Optionally remove the original GDS files
     if remove_org_gds:
@@ -215,6 +344,8 @@ def generate_merged_testcase(original_testcase, marker_testcase, cell_name):
     # Merging all polygons of markers with original testcase
     for marker_polygon in marker_polygons:
         top_cell_org.add(marker_polygon)
+    # Keeping the rule name labels of the marker datatypes
+    top_cell_org.add(*top_cell_marker.get_labels(apply_repetitions=True, depth=None))
 
     # Adding flattened merged cell
     new_lib.add(top_cell_org.flatten(apply_repetitions=True))
@@ -226,86 +357,6 @@ def generate_merged_testcase(original_testcase, marker_testcase, cell_name):
     return merged_gds_path
 
 
-def draw_polygons(polygon_data, cell, lay_num, lay_dt, path_width):
-    """
-    This function is used for drawing gds file with all violated polygons.
-
-    Parameters
-    ----------
-    polygon_data : str
-        Contains data points for each violated polygon
-    cell: gdstk.Cell
-        Top cell will contains all generated polygons
-    lay_num: int
-        Number of layer used to draw violated polygons
-    lay_dt : int
-        Data type of layer used to draw violated polygons
-    path_width : float
-        Width  will used to draw edges
-
-    Returns
-    -------
-    None
-    """
-
-    # Cleaning data points
-    polygon_data = re.sub(r"\s+", "", polygon_data)
-    polygon_data = re.sub(r"[()]", "", polygon_data)
-
-    tag_split = polygon_data.split(":")
-    tag = tag_split[0]
-    poly_txt = tag_split[1]
-    polygons = re.split(r"[/|]", poly_txt)
-
-    # Select shape type to be drawn
-    if tag == "polygon":
-        for poly in polygons:
-            points = [
-                (float(p.split(",")[0]), float(p.split(",")[1]))
-                for p in poly.split(";")
-            ]
-            cell.add(gdstk.Polygon(points, lay_num, lay_dt))
-
-    elif tag == "edge-pair":
-        for poly in polygons:
-            points = [
-                [float(p.split(",")[0]), float(p.split(",")[1])]
-                for p in poly.split(";")
-            ]
-            dist = np.sqrt(
-                ((points[0][0]) - (points[1][0])) ** 2
-                + ((points[0][1]) - (points[1][1])) ** 2
-            )
-            # Adding condition for extremely small edge length
-            # to generate a path to be drawn
-            if dist < path_width:
-                points[1][0] = points[0][0] + 2 * path_width
-            cell.add(gdstk.FlexPath(points, path_width, layer=lay_num, datatype=lay_dt))
-
-    elif tag == "edge":
-        for poly in polygons:
-            points = [
-                [float(p.split(",")[0]), float(p.split(",")[1])]
-                for p in poly.split(";")
-            ]
-            dist = np.sqrt(
-                ((points[0][0]) - (points[1][0])) ** 2
-                + ((points[0][1]) - (points[1][1])) ** 2
-            )
-            # Adding condition for extremely small edge length
-            # to generate a path to be drawn
-            if dist < path_width:
-                points[1][0] = points[0][0] + 2 * path_width
-            cell.add(gdstk.FlexPath(points, path_width, layer=lay_num, datatype=lay_dt))
-
-    elif "float" in tag or "text" in tag:
-        # Known antenna values for antenna ratios
-        pass
-
-    else:
-        logging.error(f"# Unknown type: {tag} ignored")
-
-
 def convert_db_to_gds(results_database: Path):
     """
     This function will parse Klayout database for analysis.
@@ -324,72 +375,15 @@ def convert_db_to_gds(results_database: Path):
         Path of the output drc runset used for analysis.
     """
 
-    # Generating violated rules and its points
-    cell_name = ""
-    lib = None
-    cell = None
-    in_item = False
-    rule_data_type_map = list()
-
-    for ev, elem in tqdm(ET.iterparse(results_database, events=("start", "end"))):
-
-        if elem.tag != "item" and not in_item:
-            elem.clear()
-            continue
-
-        if elem.tag != "item" and in_item:
-            continue
-
-        if elem.tag == "item" and ev == "start":
-            in_item = True
-            continue
-
-        rules = elem.findall("category")
-        values = elem.findall("values")
-
-        if len(values) > 0:
-            polygons = values[0].findall("value")
-        else:
-            polygons = []
-
-        if cell_name == "":
-            all_cells = elem.findall("cell")
-
-            if len(all_cells) > 0:
-                cell_name = all_cells[0].text
-
-                if cell_name is None:
-                    elem.clear()
-                    continue
-
-                lib = gdstk.Library(f"{cell_name}_golden")
-                cell = lib.new_cell(f"{cell_name}_golden")
-
-        if len(rules) > 0:
-            rule_name = re.sub(r"[^\w\-]", "_", rules[0].text.strip())
-            if rule_name is None:
-                elem.clear()
-                continue
-        else:
-            elem.clear()
-            continue
-
-        if rule_name not in rule_data_type_map:
-            rule_data_type_map.append(rule_name)
-
-        # Drawing polygons here.
-        rule_lay_dt = rule_data_type_map.index(rule_name) + 1
-
-        if cell is not None:
-            for p in polygons:
-                draw_polygons(p.text, cell, GOLDEN_LAY_NUM, rule_lay_dt, PATH_WIDTH)
-
-        # Clearing memory
-        in_item = False
-        elem.clear()
+    # Collecting markers of all rules, then drawing them in bulk
+    cell_name, markers = read_rdb_markers(results_database, get_rule_name)
 
     # Writing final marker GDS file
-    if lib is not None:
+    if cell_name:
+        lib = gdstk.Library(f"{cell_name}_golden")
+        cell = lib.new_cell(f"{cell_name}_golden")
+        add_rdb_markers(cell, markers, GOLDEN_LAY_NUM, PATH_WIDTH)
+
         output_gds_path = results_database.with_suffix('').with_name(f"{results_database.stem}_golden.gds")
         lib.write_gds(str(output_gds_path))
     else:
@@ -430,9 +424,15 @@ def run_test_case(
     testcase_basename: str,
     table_name: str,
     cell_name: str,
+    shard_hash: str,
+    keep: bool = False,
 ):
     """
-    This function run a single test case using the correct DRC file.
+    This function generates the golden file of a single test case shard.
+
+    The DRC run and the marker conversion are done in a work directory. The
+    golden file is then moved into ``run_dir`` atomically and the shard is
+    marked as done.
 
     Parameters
     ----------
@@ -441,18 +441,22 @@ def run_test_case(
     layout_path : str or Path object
         Path string to the layout of the test pattern we want to test.
     run_dir : Path
-        Path to the location where is the regression run is done.
+        Path to the golden output directory.
     testcase_basename : str
         Testcase name that we are running on.
     table_name : str
         Table name that we are running on.
     cell_name : string
         Cell name that we are running on.
+    shard_hash : str
+        Hash of the shard inputs, recorded in its completion marker.
+    keep : bool
+        Keep the work directory of the shard.
 
     Returns
     -------
-    dict
-        A dict with all rule counts
+    Path or bool
+        Path of the golden file, or False if the run generated no results.
     """
     # Get switches used for each run
     sw_file = Path(layout_path.parent).absolute() / f"{testcase_basename}.{SUPPORTED_SW_EXT}"
@@ -470,7 +474,8 @@ def run_test_case(
 
     # Creating run folder structure
     pattern_name = f"{testcase_basename}_{cell_name}"
-    output_loc = run_dir / table_name / cell_name
+    state_dir = run_dir / STATE_DIR_NAME
+    output_loc = state_dir / "work" / table_name / pattern_name
     pattern_log = output_loc / f"{pattern_name}_drc.log"
 
     # command to run drc
@@ -513,7 +518,16 @@ def run_test_case(
         # db to gds conversion
         marker_output = convert_db_to_gds(pattern_results[0])
         # Generating merged testcase for violated rules
-        generate_merged_testcase(layout_path, marker_output, cell_name)
+        merged_output = generate_merged_testcase(layout_path, marker_output, cell_name)
+
+        # Same file system, so the golden file never appears partially written
+        golden_path = run_dir / get_golden_name(merged_output.name)
+        os.replace(merged_output, golden_path)
+        if not keep:
+            shutil.rmtree(output_loc, ignore_errors=True)
+
+        mark_shard_done(state_dir, table_name, testcase_basename, cell_name, golden_path, shard_hash)
+        return golden_path
 
     else:
         logging.error(
@@ -522,7 +536,9 @@ def run_test_case(
         return False
 
 
-def run_all_test_cases(tc_df: pd.DataFrame, drc_dir: Path, run_dir: Path, num_workers: int):
+def run_all_test_cases(
+    tc_df: pd.DataFrame, drc_dir: Path, run_dir: Path, num_workers: int, keep: bool = False
+):
     """
     This function run all test cases from the input dataframe.
 
@@ -536,11 +552,13 @@ def run_all_test_cases(tc_df: pd.DataFrame, drc_dir: Path, run_dir: Path, num_wo
         Path to the location of the testing code and output.
     num_workers : int
         Number of workers to use for running the regression.
+    keep : bool
+        Keep the work directories of the test cases.
 
     Returns
     -------
-    pd.DataFrame
-        A pandas DataFrame with all test cases information post running.
+    int
+        Number of test cases that failed to generate a golden file.
     """
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
@@ -555,11 +573,26 @@ def run_all_test_cases(tc_df: pd.DataFrame, drc_dir: Path, run_dir: Path, num_wo
                     row["testcase_basename"],
                     row["table_name"],
                     row["top_cell"],
+                    row["shard_hash"],
+                    keep,
                 )
             ] = row["run_id"]
 
+        failed = 0
+        for future in concurrent.futures.as_completed(future_to_run_id):
+            run_id = future_to_run_id[future]
+            try:
+                if not future.result():
+                    failed += 1
+            except Exception as exc:
+                logging.error("%d generated an exception: %s" % (run_id, exc))
+                traceback.print_exc()
+                failed += 1
+
+    return failed
+
 
-def build_tests_dataframe(unit_test_cases_dir, target_table):
+def build_tests_dataframe(unit_test_cases_dir, target_table, layout_cache_dir=layout_cache.DEFAULT_CACHE_DIR):
     """
     This function is used for getting all test cases available
     in a formatted dataframe before running.
@@ -570,6 +603,8 @@ def build_tests_dataframe(unit_test_cases_dir, target_table):
         Path string to the location of unit test cases path.
     target_table : str or None
         Name of table that we want to run regression for. If None, run all found.
+    layout_cache_dir : Path
+        Layout cache directory used to look up the top cells of the test cases.
 
     Returns
     -------
@@ -606,7 +641,7 @@ def build_tests_dataframe(unit_test_cases_dir, target_table):
     # Expand rows to one per top cell
     expanded_rows = []
     for _, row in tc_df.iterrows():
-        top_cells = get_top_cell_names(row["test_path"])
+        top_cells = layout_cache.get_top_cell_names(row["test_path"], layout_cache_dir)
         for cell in top_cells:
             new_row = row.copy()
             new_row["top_cell"] = cell
@@ -620,28 +655,16 @@ def build_tests_dataframe(unit_test_cases_dir, target_table):
     return expanded_df
 
 
-def get_top_cell_names(gds_path):
-    """
-    get_top_cell_names get the top cell names from the GDS file.
-
-    Parameters
-    ----------
-    gds_path : string
-        Path to the target GDS file.
-
-    Returns
-    -------
-    List of string
-        Names of the top cell in the layout.
-    """
-    layout = klayout.db.Layout()
-    layout.read(gds_path)
-    top_cells = [t.name for t in layout.top_cells()]
-
-    return top_cells
-
-
-def gen_golden(drc_dir: Path, output_path: Path, target_table: str, cpu_count: int):
+def gen_golden(
+    drc_dir: Path,
+    output_path: Path,
+    target_table: str,
+    cpu_count: int,
+    shard: tuple = (1, 1),
+    resume: bool = False,
+    keep: bool = False,
+    layout_cache_dir: Path = layout_cache.DEFAULT_CACHE_DIR,
+):
     """
     Running Golden Results Generation Procedure.
 
@@ -657,20 +680,53 @@ def gen_golden(drc_dir: Path, output_path: Path, target_table: str, cpu_count: i
         Name of table that we want to run regression for. If None, run all found.
     cpu_count : int
         Number of cores to use in running testcases.
+    shard : tuple
+        Shard number (1-based) and shard count of this run.
+    resume : bool
+        Skip the test cases completed by an earlier run with unchanged inputs.
+    keep : bool
+        Keep the work directories of the test cases.
+    layout_cache_dir : Path
+        Layout cache directory used to look up the top cells of the test cases.
     Returns
     -------
     bool
-        If all regression passed, it returns true. If any of the rules failed it returns false.
+        True if all test cases of the table are complete, False otherwise.
     """
 
     # Get all test cases available in the repo.
     unit_tests_path = drc_dir / "testing" / "testcases" / "unit"
-    tc_df = build_tests_dataframe(unit_tests_path, target_table)
-    logging.info("# Total table gds files found: {}".format(len(tc_df)))
+    all_tc_df = build_tests_dataframe(unit_tests_path, target_table, layout_cache_dir)
+    logging.info("# Total table gds files found: {}".format(len(all_tc_df)))
+    all_tc_df["shard_hash"] = [
+        get_shard_hash(drc_dir, row["test_path"], row["testcase_basename"], row["table_name"], row["top_cell"])
+        for _, row in all_tc_df.iterrows()
+    ]
+
+    # Select the test cases of this shard
+    tc_df = select_shard(all_tc_df, *shard)
+    logging.info(f"# Shard {shard[0]}/{shard[1]} has {len(tc_df)} of {len(all_tc_df)} test cases.")
+
+    state_dir = output_path / STATE_DIR_NAME
+    if resume:
+        done = [
+            is_shard_done(state_dir, *key, shard_hash)
+            for key, shard_hash in zip(get_shard_keys(tc_df), tc_df["shard_hash"])
+        ]
+        tc_df = tc_df[[not d for d in done]]
+        logging.info(f"# Resuming, skipping {sum(done)} completed test cases with unchanged inputs.")
     logging.info("# Found testcases: \n" + str(tc_df))
 
     # Run all test cases.
-    run_all_test_cases(tc_df, drc_dir, output_path, cpu_count)
+    failed = run_all_test_cases(tc_df, drc_dir, output_path, cpu_count, keep)
+    if failed:
+        logging.error(f"# {failed} test cases failed, rerun with --resume to retry them.")
+
+    # The test cases of other shards may still be running
+    return all(
+        is_shard_done(state_dir, *key, shard_hash)
+        for key, shard_hash in zip(get_shard_keys(all_tc_df), all_tc_df["shard_hash"])
+    )
 
 
 def main(drc_dir: Path, output_path: Path, target_table: str):
@@ -710,22 +766,31 @@ def main(drc_dir: Path, output_path: Path, target_table: str):
     check_klayout_version()
 
     # Calling regression function
-    gen_golden(drc_dir, output_path, target_table, workers_count)
+    shard = parse_shard(args.shard)
+    complete = gen_golden(
+        drc_dir, output_path, target_table, workers_count, shard, args.resume, args.keep,
+        Path(args.layout_cache_dir),
+    )
+
+    # Final steps once all shards are done
+    if not complete:
+        logging.info("# Golden generation is not complete yet, rerun the missing shards with --resume.")
+        return
+
+    merge_cells(output_path, "density_pass")
+    merge_cells(output_path, "density_fail")
 
     # keep output dir
     if not args.keep:
-        logging.info(
-            f"Cleaning {output_path} and preserving only *_golden_merged.gds files.."
-        )
-        clean_run_dir(output_path)
-        merge_cells(output_path, "density_pass")
-        merge_cells(output_path, "density_fail")
+        logging.info(f"Cleaning {output_path / STATE_DIR_NAME}..")
+        shutil.rmtree(output_path / STATE_DIR_NAME, ignore_errors=True)
 
 
 def parse_args():
     USAGE = """
     gen_golden.py (--help | -h)
     gen_golden.py [--table_name=<table_name>] [--run_dir=<dir>] [--mp=<num>] [--keep]
+                  [--shard=<i/N>] [--resume] [--layout_cache_dir=<cache_path>]
     """
 
     parser = argparse.ArgumentParser(
@@ -760,6 +825,27 @@ def parse_args():
         help="Keep output logs and intermediate files after processing."
     )
 
+    parser.add_argument(
+        "--shard",
+        type=str,
+        default="1/1",
+        help="Generate only shard i of N of the (table, cell) test cases, e.g. 2/4. [default: 1/1]"
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the test cases completed by an earlier run into the same directory with unchanged inputs."
+    )
+
+    parser.add_argument(
+        "--layout_cache_dir",
+        type=str,
+        default=str(layout_cache.DEFAULT_CACHE_DIR),
+        help="Layout cache directory used to look up the top cells of the test cases. "
+        f"[default: {layout_cache.DEFAULT_CACHE_DIR}]"
+    )
+
     return parser.parse_args()
 
 # ================================================================
@@ -787,13 +873,13 @@ if __name__ == "__main__":
     target_table = args.table_name
 
     # Ensure output directory exists
-    output_path.mkdir(parents=True, exist_ok=True)
+    (output_path / STATE_DIR_NAME).mkdir(parents=True, exist_ok=True)
 
     # Set up logging
     logging.basicConfig(
         level=logging.DEBUG,
         handlers=[
-            logging.FileHandler(output_path / f"{now_str}.log"),
+            logging.FileHandler(output_path / STATE_DIR_NAME / f"{now_str}_{os.getpid()}.log"),
             logging.StreamHandler(),
         ],
         format="%(asctime)s | %(levelname)-7s | [%(threadName)s | %(message)s",
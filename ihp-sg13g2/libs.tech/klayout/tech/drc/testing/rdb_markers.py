@@ -0,0 +1,266 @@
+# =========================================================================================
+# Copyright 2025 IHP PDK Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================================
+
+"""
+Bulk conversion of KLayout DRC result databases to marker shapes.
+
+The point lists of all values are collected per rule and shape type first,
+then decoded with a single NumPy conversion. The markers are either added to
+a gdstk cell in one call per rule, or converted to KLayout regions for an
+in-memory comparison.
+"""
+
+import logging
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple, Union
+
+import gdstk
+import klayout.db
+import numpy as np
+
+# Characters dropped from value strings before splitting them into point lists.
+_VALUE_STRIP = str.maketrans({"(": None, ")": None, " ": None, "\t": None, "\n": None, "|": "/"})
+
+
+def get_rule_name(category_text: str) -> str:
+    """Return the rule name of a results database category text."""
+    return category_text.replace("'", "").strip()
+
+
+def read_rdb_markers(
+    results_database: Union[str, Path], rule_name_fn: Callable[[str], str]
+) -> Tuple[str, Dict[str, Dict[str, List[str]]]]:
+    """
+    Collect the marker point lists of a results database, grouped by rule.
+
+    Parameters
+    ----------
+    results_database : str or Path
+        Path to the KLayout results database.
+    rule_name_fn : callable
+        Maps the category text of an item to the rule name used for markers.
+
+    Returns
+    -------
+    tuple
+        Name of the cell of the first item, and a mapping of rule name to
+        ``{"polygon": [...], "edge": [...]}`` point lists. Rules are kept in
+        order of first appearance.
+    """
+    cell_name = ""
+    markers = {}
+
+    # Only item ends are handled; the children of an item are complete by then.
+    for _, elem in ET.iterparse(results_database):
+        if elem.tag != "item":
+            continue
+
+        category = elem.find("category")
+        if not cell_name:
+            cell = elem.find("cell")
+            if cell is not None and cell.text:
+                cell_name = cell.text
+
+        if category is None or not category.text:
+            elem.clear()
+            continue
+
+        rule_markers = markers.setdefault(rule_name_fn(category.text), {"polygon": [], "edge": []})
+        for value in elem.iterfind("values/value"):
+            tag, _, points = (value.text or "").translate(_VALUE_STRIP).partition(":")
+            if tag == "polygon":
+                rule_markers["polygon"].extend(p for p in points.split("/") if p)
+            elif tag in ("edge", "edge-pair"):
+                rule_markers["edge"].extend(p for p in points.split("/") if p)
+            elif "float" in tag or "text" in tag:
+                # Known antenna values for antenna ratios
+                pass
+            else:
+                logging.error(f"# Unknown type: {tag} ignored")
+
+        elem.clear()
+
+    return cell_name, markers
+
+
+def decode_point_lists(point_lists: List[str]) -> List[np.ndarray]:
+    """
+    Decode "x,y;x,y;..." point lists into coordinate arrays in one pass.
+
+    Parameters
+    ----------
+    point_lists : list of str
+        Point lists as found in result database values.
+
+    Returns
+    -------
+    list of np.ndarray
+        One (n, 2) array per point list.
+    """
+    if not point_lists:
+        return []
+
+    counts = np.fromiter((p.count(";") + 1 for p in point_lists), dtype=np.int64, count=len(point_lists))
+    coords = np.array(";".join(point_lists).replace(";", ",").split(","), dtype=np.float64).reshape(-1, 2)
+
+    # Markers are mostly boxes or edges, so all lists often have the same length
+    if (counts == counts[0]).all():
+        return list(coords.reshape(len(counts), counts[0], 2))
+
+    ends = np.cumsum(counts)
+    return [coords[start:end] for start, end in zip(ends - counts, ends)]
+
+
+def decode_edges(point_lists: List[str], path_width: float) -> np.ndarray:
+    """
+    Decode edge point lists, stretching edges shorter than the path width.
+
+    Short edges are stretched along x to twice the path width, so they stay
+    visible when drawn as paths.
+
+    Parameters
+    ----------
+    point_lists : list of str
+        Edge point lists as found in result database values.
+    path_width : float
+        Width used to draw edges.
+
+    Returns
+    -------
+    np.ndarray
+        (n, 2, 2) array of edge end points.
+    """
+    edges = np.array(decode_point_lists(point_lists)).reshape(-1, 2, 2)
+    short = np.hypot(*(edges[:, 0] - edges[:, 1]).T) < path_width
+    edges[short, 1, 0] = edges[short, 0, 0] + 2 * path_width
+    return edges
+
+
+def add_rdb_markers(
+    cell: gdstk.Cell,
+    markers: Dict[str, Dict[str, List[str]]],
+    lay_num: int,
+    path_width: float,
+) -> Dict[str, int]:
+    """
+    Add the markers of all rules to a cell, one datatype per rule.
+
+    Datatypes are assigned from 1 in the order of the rules in ``markers``.
+    Each datatype also gets a text label with its rule name at the origin,
+    so the markers can be paired with their rule later. Edges are drawn as
+    paths of ``path_width``.
+
+    Parameters
+    ----------
+    cell : gdstk.Cell
+        Cell receiving the markers.
+    markers : dict
+        Markers as returned by ``read_rdb_markers``.
+    lay_num : int
+        Layer number of the markers.
+    path_width : float
+        Width used to draw edges.
+
+    Returns
+    -------
+    dict
+        Mapping of rule name to its marker datatype.
+    """
+    rule_data_type_map = {}
+
+    for rule_name, rule_markers in markers.items():
+        lay_dt = rule_data_type_map.setdefault(rule_name, len(rule_data_type_map) + 1)
+        shapes = [
+            gdstk.Polygon(points, lay_num, lay_dt)
+            for points in decode_point_lists(rule_markers["polygon"])
+        ]
+
+        edges = decode_edges(rule_markers["edge"], path_width)
+        shapes += [gdstk.FlexPath(e, path_width, layer=lay_num, datatype=lay_dt) for e in edges]
+
+        cell.add(*shapes, gdstk.Label(rule_name, (0, 0), layer=lay_num, texttype=lay_dt))
+
+    return rule_data_type_map
+
+
+def _insert_polygons(region: klayout.db.Region, polygons: np.ndarray):
+    """Insert an (n, k, 2) array of polygons in dbu, using boxes where possible."""
+    if polygons.shape[1] == 4:
+        x, y = polygons[..., 0], polygons[..., 1]
+        is_box = (
+            (x[:, 0] == x[:, 1]) & (y[:, 1] == y[:, 2]) & (x[:, 2] == x[:, 3]) & (y[:, 3] == y[:, 0])
+        ) | ((y[:, 0] == y[:, 1]) & (x[:, 1] == x[:, 2]) & (y[:, 2] == y[:, 3]) & (x[:, 3] == x[:, 0]))
+        boxes = np.concatenate([polygons[is_box].min(axis=1), polygons[is_box].max(axis=1)], axis=1)
+        if len(boxes):
+            region.insert([klayout.db.Box(*box) for box in boxes.tolist()])
+        polygons = polygons[~is_box]
+
+    if len(polygons):
+        region.insert(
+            [klayout.db.Polygon([klayout.db.Point(*point) for point in points]) for points in polygons.tolist()]
+        )
+
+
+def get_rdb_marker_regions(
+    markers: Dict[str, Dict[str, List[str]]], path_width: float, dbu: float
+) -> Dict[str, klayout.db.Region]:
+    """
+    Convert the markers of all rules to KLayout regions.
+
+    The regions hold the same shapes that ``add_rdb_markers`` draws: edges
+    become flush-ended rectangles of ``path_width`` along the edge.
+
+    Parameters
+    ----------
+    markers : dict
+        Markers as returned by ``read_rdb_markers``.
+    path_width : float
+        Width used to draw edges.
+    dbu : float
+        Database unit of the regions, in um.
+
+    Returns
+    -------
+    dict
+        Mapping of rule name to its marker region, in the order of ``markers``.
+    """
+    regions = {}
+
+    for rule_name, rule_markers in markers.items():
+        region = klayout.db.Region()
+
+        # Polygons with the same number of points are converted together
+        polygons_by_size = defaultdict(list)
+        for points in decode_point_lists(rule_markers["polygon"]):
+            polygons_by_size[len(points)].append(points)
+        for polygons in polygons_by_size.values():
+            _insert_polygons(region, np.rint(np.array(polygons) / dbu).astype(np.int64))
+
+        # Rectangle corners of each edge path, offset by half the width along the normal
+        edges = decode_edges(rule_markers["edge"], path_width)
+        direction = edges[:, 1] - edges[:, 0]
+        normal = direction[:, ::-1] * [-1, 1] / np.hypot(*direction.T)[:, None] * (path_width / 2)
+        corners = np.stack(
+            [edges[:, 0] + normal, edges[:, 1] + normal, edges[:, 1] - normal, edges[:, 0] - normal],
+            axis=1,
+        )
+        _insert_polygons(region, np.rint(corners / dbu).astype(np.int64))
+
+        regions[rule_name] = region
+
+    return regions
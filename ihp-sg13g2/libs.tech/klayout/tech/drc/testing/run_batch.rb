@@ -0,0 +1,60 @@
+# frozen_string_literal: true
+
+#=========================================================================================
+# Copyright 2025 IHP PDK Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#=========================================================================================
+
+#================================================
+#----------- BATCHED KLAYOUT RUNNER -------------
+#================================================
+
+# Runs a list of DRC jobs in one KLayout session:
+#
+#   klayout -b -r run_batch.rb -rd jobs=<jobs_file>
+#
+# Each line of the jobs file is "<deck>\t<name>=<value>\t...". The values
+# are set as the same global variables that -rd would set, then the deck is
+# run. Each deck is loaded once and reused by all jobs that run it. A failing
+# job is reported and does not stop the remaining jobs.
+
+macros = {}
+failed = 0
+jobs = File.readlines($jobs, chomp: true).reject { |line| line.strip.empty? }
+
+jobs.each_with_index do |line, index|
+  deck, *assignments = line.split("\t")
+  names = []
+
+  assignments.each do |assignment|
+    name, value = assignment.split('=', 2)
+    raise "Invalid switch name '#{name}' in #{$jobs}" unless name =~ /\A\w+\z/
+
+    eval("$#{name} = value", binding, __FILE__, __LINE__)
+    names << name
+  end
+
+  puts "BATCH JOB #{index + 1}/#{jobs.size}: #{File.basename(deck)} #{$topcell}"
+  begin
+    macros[deck] ||= RBA::Macro.new(deck)
+    macros[deck].run
+  rescue StandardError => e
+    failed += 1
+    puts "BATCH JOB #{index + 1} FAILED: #{e.message}"
+  ensure
+    names.each { |name| eval("$#{name} = nil", binding, __FILE__, __LINE__) }
+  end
+end
+
+puts "BATCH DONE: #{jobs.size - failed}/#{jobs.size} jobs completed."
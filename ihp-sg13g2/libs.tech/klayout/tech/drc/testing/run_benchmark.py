@@ -0,0 +1,465 @@
+# =========================================================================================
+# Copyright 2025 IHP PDK Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================================
+
+"""
+Runtime benchmark of the SG13G2 DRC rule tables.
+
+Every unit testcase is run with the same KLayout job as the regression, one
+run at a time, in each selected run mode. The wall time, CPU time and peak
+memory of each table are appended to a CSV history, and ``--compare`` flags
+the tables that got slower than a baseline run.
+"""
+
+import argparse
+import logging
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import run_drc
+    from run_regression import build_tests_dataframe, check_klayout_version, get_drc_job
+    import regression_cache
+except ModuleNotFoundError:
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+    import run_drc
+    from run_regression import build_tests_dataframe, check_klayout_version, get_drc_job
+    import regression_cache
+
+
+RUN_MODES = ["deep", "flat", "tiling"]
+METRICS = ["wall_time", "cpu_time", "peak_mem"]
+HISTORY_COLUMNS = [
+    "label",
+    "timestamp",
+    "git_commit",
+    "klayout_version",
+    "table_name",
+    "run_mode",
+    "cells",
+    "failed",
+    *METRICS,
+]
+
+
+def get_git_commit(repo_dir: Path) -> str:
+    """Return the short commit hash of the checkout, or an empty string outside git."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=repo_dir,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_benchmark_case(drc_dir: Path, row: pd.Series, run_dir: Path, run_mode: str) -> dict:
+    """
+    Run the KLayout job of one test case cell and measure it.
+
+    Parameters
+    ----------
+    drc_dir : Path
+        Path to the DRC directory where all the DRC files are located.
+    row : pd.Series
+        Test case row of the test cases DataFrame.
+    run_dir : Path
+        Path to the location where the benchmark run is done.
+    run_mode : str
+        KLayout run mode of the job: deep, flat or tiling.
+
+    Returns
+    -------
+    dict
+        Wall time and CPU time in seconds and peak memory in MB of the run,
+        and whether it failed.
+    """
+    deck, switches = get_drc_job(
+        drc_dir,
+        row["test_path"],
+        run_dir / run_mode,
+        row["testcase_basename"],
+        row["table_name"],
+        row["top_cell"],
+    )
+    switches["run_mode"] = run_mode
+    Path(switches["report"]).parent.mkdir(parents=True, exist_ok=True)
+
+    run_cmd = f"klayout -b -r '{deck}' {run_drc.build_switches_string(switches)} > /dev/null 2>&1"
+    try:
+        stats = run_drc.run_klayout_cmd(run_cmd)
+    except subprocess.CalledProcessError as e:
+        logging.error(f"{row['testcase_basename']} {row['top_cell']} failed in {run_mode} mode: {e}")
+        return {"failed": 1, "wall_time": 0.0, "cpu_time": 0.0, "peak_mem": 0.0}
+
+    return {
+        "failed": 0,
+        "wall_time": stats["runtime"],
+        "cpu_time": stats["cpu_time"],
+        "peak_mem": stats["peak_mem"],
+    }
+
+
+def run_benchmark(
+    drc_dir: Path, run_dir: Path, target_table: str, run_modes: list, repeat: int
+) -> pd.DataFrame:
+    """
+    Benchmark all unit test cases of the selected tables.
+
+    Runs are done one at a time, so they do not compete for cores or memory.
+    With ``repeat`` above 1, the fastest run of each cell is kept.
+
+    Parameters
+    ----------
+    drc_dir : Path
+        Path to the DRC directory where all the DRC files are located.
+    run_dir : Path
+        Path to the location where the benchmark run is done.
+    target_table : str or None
+        Name of table to benchmark. If None, benchmark all found.
+    run_modes : list
+        KLayout run modes to benchmark each table in.
+    repeat : int
+        Number of runs of each cell.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per table and run mode, with the summed wall and CPU time, the
+        largest peak memory, the number of cells and of failed runs.
+    """
+    unit_tests_path = drc_dir / "testing" / "testcases" / "unit"
+    tc_df = build_tests_dataframe([unit_tests_path], target_table)
+    logging.info(f"# Benchmarking {len(tc_df)} test case cells in {', '.join(run_modes)} mode.")
+
+    records = []
+    for run_mode in run_modes:
+        for _, row in tc_df.iterrows():
+            runs = [run_benchmark_case(drc_dir, row, run_dir, run_mode) for _ in range(repeat)]
+            best = min(runs, key=lambda r: (r["failed"], r["wall_time"]))
+            logging.info(
+                f"{row['table_name']:<16} {row['top_cell']:<24} {run_mode:<7} "
+                f"wall {best['wall_time']:8.2f}s  cpu {best['cpu_time']:8.2f}s  "
+                f"peak {best['peak_mem']:8.1f} MB"
+            )
+            records.append({"table_name": row["table_name"], "run_mode": run_mode, **best})
+
+    df = pd.DataFrame(records)
+    return (
+        df.groupby(["table_name", "run_mode"], sort=True)
+        .agg(
+            cells=("failed", "size"),
+            failed=("failed", "sum"),
+            wall_time=("wall_time", "sum"),
+            cpu_time=("cpu_time", "sum"),
+            peak_mem=("peak_mem", "max"),
+        )
+        .reset_index()
+    )
+
+
+def append_history(history_path: Path, results_df: pd.DataFrame, label: str, repo_dir: Path):
+    """
+    Append the results of a benchmark run to the CSV history.
+
+    Parameters
+    ----------
+    history_path : Path
+        Path to the CSV history file. It is created if missing.
+    results_df : pd.DataFrame
+        Results as returned by ``run_benchmark``.
+    label : str
+        Label of the benchmark run, used to select it in comparisons.
+    repo_dir : Path
+        Directory of the checkout, used to record its commit.
+    """
+    df = results_df.copy()
+    df["label"] = label
+    df["timestamp"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    df["git_commit"] = get_git_commit(repo_dir)
+    df["klayout_version"] = regression_cache.get_klayout_version()
+
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    df[HISTORY_COLUMNS].to_csv(
+        history_path, mode="a", header=not history_path.is_file(), index=False, float_format="%.3f"
+    )
+    logging.info(f"Benchmark results of '{label}' appended to {history_path}")
+
+
+def compare_runs(
+    history_df: pd.DataFrame,
+    baseline: str,
+    target: str,
+    metric: str,
+    threshold: float,
+    min_value: float,
+) -> pd.DataFrame:
+    """
+    Compare a benchmark run with a baseline run per table and run mode.
+
+    Parameters
+    ----------
+    history_df : pd.DataFrame
+        Benchmark history as stored by ``append_history``.
+    baseline : str
+        Label of the baseline run.
+    target : str
+        Label of the run to check.
+    metric : str
+        Compared metric: wall_time, cpu_time or peak_mem.
+    threshold : float
+        Increase over the baseline, in percent, above which a table regressed.
+    min_value : float
+        Tables below this baseline value are not flagged, as short runs
+        are dominated by KLayout startup and noise.
+
+    Returns
+    -------
+    pd.DataFrame
+        Baseline and target values, change in percent and regression flag
+        of each table and run mode that passed in both runs.
+    """
+    # The latest run of each label wins if a label was recorded twice. Table
+    # runs with failed cells are left out, their sums are not comparable.
+    runs = history_df.drop_duplicates(["label", "table_name", "run_mode"], keep="last")
+    runs = runs[runs["failed"] == 0]
+    keys = ["table_name", "run_mode"]
+    df = runs[runs["label"] == baseline][keys + [metric]].merge(
+        runs[runs["label"] == target][keys + [metric]], on=keys, suffixes=("_baseline", "_target")
+    )
+
+    base = df[f"{metric}_baseline"]
+    df["change_pct"] = ((df[f"{metric}_target"] - base) / base.where(base > 0) * 100).round(1)
+    df["regressed"] = (df["change_pct"] > threshold) & (base >= min_value)
+    return df.sort_values(["regressed", "change_pct"], ascending=False).reset_index(drop=True)
+
+
+def main(drc_dir: Path, run_dir: Path, args: argparse.Namespace):
+    """
+    Main Procedure.
+
+    Runs the benchmark, or compares two runs of the history with --compare.
+
+    Parameters
+    ----------
+    drc_dir : Path
+        Path to the DRC directory where all the DRC files are located.
+    run_dir : Path
+        Path to the location where the benchmark run is done.
+    args : argparse.Namespace
+        Parsed command-line arguments.
+    """
+
+    # Pandas printing setup
+    pd.set_option("display.max_columns", None)
+    pd.set_option("display.max_rows", None)
+    pd.set_option("display.width", 1000)
+
+    history_path = Path(args.history_file).expanduser().resolve()
+
+    if not args.compare:
+        run_modes = args.run_mode.split(",")
+        unknown = [m for m in run_modes if m not in RUN_MODES]
+        if unknown:
+            logging.error(f"Unknown run mode(s) {', '.join(unknown)}, allowed are {', '.join(RUN_MODES)}.")
+            exit(1)
+
+        check_klayout_version()
+        results_df = run_benchmark(drc_dir, run_dir, args.table_name, run_modes, args.repeat)
+        logging.info("# Benchmark results: \n" + str(results_df))
+        append_history(history_path, results_df, args.label or run_dir.name, drc_dir)
+        return
+
+    if not history_path.is_file():
+        logging.error(f"Benchmark history {history_path} doesn't exist, please run the benchmark first.")
+        exit(1)
+
+    history_df = pd.read_csv(history_path)
+    labels = list(dict.fromkeys(history_df["label"]))
+    target = args.target or labels[-1]
+    baseline = args.baseline or (labels[-2] if len(labels) > 1 else None)
+    for label in (baseline, target):
+        if label not in labels:
+            logging.error(f"Benchmark run '{label}' not found in {history_path}.")
+            exit(1)
+
+    df = compare_runs(history_df, baseline, target, args.metric, args.threshold, args.min_value)
+    logging.info(f"# {args.metric} of '{target}' against baseline '{baseline}': \n" + str(df))
+
+    regressed = df[df["regressed"]]
+    if len(regressed) > 0:
+        logging.error(
+            f"{len(regressed)} table runs regressed by more than {args.threshold}%: "
+            + ", ".join(f"{r.table_name} ({r.run_mode})" for r in regressed.itertuples())
+        )
+        exit(1)
+
+    logging.info(f"No table regressed by more than {args.threshold}%.")
+
+
+def parse_args():
+    USAGE = """
+    run_benchmark.py (--help | -h)
+    run_benchmark.py [--run_dir=<run_dir>] [--table_name=<table_name>] [--run_mode=<modes>]
+                     [--repeat=<num>] [--label=<label>] [--history_file=<csv_path>]
+    run_benchmark.py --compare [--baseline=<label>] [--target=<label>] [--metric=<metric>]
+                     [--threshold=<percent>] [--min_value=<value>] [--history_file=<csv_path>]
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Run IHP-SG13G2 DRC Runtime Benchmark.",
+        usage=USAGE,
+    )
+
+    parser.add_argument(
+        "--run_dir",
+        type=str,
+        default=None,
+        help="Run directory to save all the results. If not provided, a timestamped directory will be created."
+    )
+
+    parser.add_argument(
+        "--table_name",
+        type=str,
+        default=None,
+        help="Target specific rule table to benchmark."
+    )
+
+    parser.add_argument(
+        "--run_mode",
+        type=str,
+        default="deep,flat",
+        help="Comma-separated KLayout run modes to benchmark: deep, flat, tiling. [default: deep,flat]"
+    )
+
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="Number of runs of each test case, the fastest is kept. [default: 1]"
+    )
+
+    parser.add_argument(
+        "--label",
+        type=str,
+        default=None,
+        help="Label of the benchmark run in the history. [default: run directory name]"
+    )
+
+    parser.add_argument(
+        "--history_file",
+        type=str,
+        default=str(Path.home() / ".cache" / "ihp-sg13g2" / "drc_benchmark_history.csv"),
+        help="CSV file collecting the results of all benchmark runs. "
+        "[default: ~/.cache/ihp-sg13g2/drc_benchmark_history.csv]"
+    )
+
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Compare two benchmark runs of the history instead of running the benchmark."
+    )
+
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=None,
+        help="Label of the baseline run. [default: second to last run in the history]"
+    )
+
+    parser.add_argument(
+        "--target",
+        type=str,
+        default=None,
+        help="Label of the run to check against the baseline. [default: last run in the history]"
+    )
+
+    parser.add_argument(
+        "--metric",
+        type=str,
+        choices=METRICS,
+        default="wall_time",
+        help="Compared metric. [default: wall_time]"
+    )
+
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="Flag tables whose metric grew by more than this percentage. [default: 10]"
+    )
+
+    parser.add_argument(
+        "--min_value",
+        type=float,
+        default=1.0,
+        help="Ignore tables whose baseline metric is below this value (s or MB). [default: 1]"
+    )
+
+    return parser.parse_args()
+
+# ================================================================
+# -------------------------- MAIN --------------------------------
+# ================================================================
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    args = parse_args()
+
+    # Generate timestamped run directory name
+    now_str = datetime.now(timezone.utc).strftime("benchmark_%Y_%m_%d_%H_%M_%S")
+
+    # Determine run directory
+    if args.run_dir in [None, "", "pwd"]:
+        run_dir = Path.cwd().resolve() / now_str
+    else:
+        run_dir = Path(args.run_dir).resolve()
+
+    # Setup paths
+    testing_dir = Path(__file__).resolve().parent
+    drc_dir = testing_dir.parent
+
+    # Setup logging, a comparison only logs to the console
+    handlers = [logging.StreamHandler()]
+    if not args.compare:
+        run_dir.mkdir(parents=True, exist_ok=True)
+        handlers.append(logging.FileHandler(run_dir / f"{now_str}.log"))
+
+    logging.basicConfig(
+        level=logging.DEBUG,
+        handlers=handlers,
+        format="%(asctime)s | %(levelname)-7s | %(message)s",
+        datefmt="%d-%b-%Y %H:%M:%S",
+    )
+
+    # Start timing
+    time_start = time.time()
+
+    # Run main logic
+    main(drc_dir, run_dir, args)
+
+    # End timing
+    elapsed_time = time.time() - time_start
+    logging.info(f"Total DRC Benchmark Run time: {elapsed_time:.2f} seconds")
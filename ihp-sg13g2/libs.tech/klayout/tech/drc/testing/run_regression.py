@@ -21,27 +21,40 @@ import yaml
 import argparse
 import os
 from datetime import datetime, timezone
-import xml.etree.ElementTree as ET
 import time
 import pandas as pd
 import logging
 from pathlib import Path
-from tqdm import tqdm
 import re
-import gdstk
 import klayout.db
+import klayout.rdb
 import errno
-import numpy as np
 from collections import defaultdict
 from itertools import product
+import sys
+
+try:
+    import run_drc
+    from run_drc import get_top_cell_names, read_rdb_summary
+    from rdb_markers import get_rdb_marker_regions, get_rule_name, read_rdb_markers
+    import regression_cache
+except ModuleNotFoundError:
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+    import run_drc
+    from run_drc import get_top_cell_names, read_rdb_summary
+    from rdb_markers import get_rdb_marker_regions, get_rule_name, read_rdb_markers
+    import regression_cache
 
 
 SUPPORTED_TC_EXT = "gds"
 SUPPORTED_SW_EXT = "yaml"
 GOLDEN_LAY_NUM = 222
-VIOL_LAY_NUM = 333
 PATH_WIDTH = 0.01
+BATCH_RUNNER = Path(__file__).resolve().parent / "run_batch.rb"
 RULE_SEP = "--"
+# Table guard of the rule deck files included by ihp-sg13g2.drc
+TABLE_GUARD = re.compile(r"TABLES\.include\?\('(\w+)'\)")
 ANALYSIS_RULES = [
     "viol_not_golden",
     "golden_not_viol",
@@ -81,44 +94,6 @@ RULES_VAR = {
 }
 
 
-def get_unit_test_coverage(gds_file):
-    """
-    This function is used for getting all test cases available inside a single test table.
-    Parameters
-    ----------
-    gds_file : str
-        Path string to the location of unit test cases path.
-    Returns
-    -------
-    list
-        A list of unique rules found.
-    """
-    # Get rules from gds
-    rules = []
-
-    # layer num of rule text
-    lay_num = 11
-    # layer data type of rule text
-    lay_dt = 222
-
-    # Getting all rules names from testcase
-    library = gdstk.read_gds(gds_file)
-    top_cells = library.top_level()  # Get top cells
-    for cell in top_cells:
-        flatten_cell = cell.flatten()
-        # Get all text labels for each cell
-        labels = flatten_cell.get_labels(
-            apply_repetitions=True, depth=None, layer=lay_num, texttype=lay_dt
-        )
-        # Get label value
-        for label in labels:
-            rule = label.text
-            if rule not in rules:
-                rules.append(rule)
-
-    return rules
-
-
 def check_klayout_version():
     """
     check_klayout_version checks KLayout version and ensures
@@ -177,40 +152,6 @@ def get_switches(yaml_file, rule_name):
     return [f"{param}={value}" for param, value in yaml_dic[rule_name].items()]
 
 
-def parse_results_db(results_database):
-    """
-    This function will parse Klayout database for analysis.
-
-    Parameters
-    ----------
-    results_database : string or Path object
-        Path string to the results file
-
-    Returns
-    -------
-    set
-        A set that contains all rules in the database with or without violations
-    """
-
-    mytree = ET.parse(results_database)
-    myroot = mytree.getroot()
-
-    # Initial values for counter
-    rule_counts = defaultdict(int)
-
-    # Get the list of all rules that ran regardless it generated output or not
-    for z in myroot[5]:
-        rule_name = f"{z[0].text}"
-        rule_counts[rule_name] = 0
-
-    # Count rules with violations.
-    for z in myroot[7]:
-        rule_name = f"{z[1].text}".replace("'", "")
-        rule_counts[rule_name] += 1
-
-    return rule_counts
-
-
 def parse_results_db_splitted(results_database):
     """
     This function will parse Klayout database for analysis.
@@ -225,15 +166,9 @@ def parse_results_db_splitted(results_database):
         A set that contains all rules in the database with violations
     """
 
-    mytree = ET.parse(results_database)
-    myroot = mytree.getroot()
+    rule_counts = read_rdb_summary(results_database)
 
-    all_violating_rules = set()
-
-    for z in myroot[7]:  # myroot[7] : List rules with viloations
-        all_violating_rules.add(f"{z[1].text}".replace("'", ""))
-
-    return all_violating_rules
+    return {rule for rule, count in rule_counts.items() if count > 0}
 
 
 def analyze_splitted_results(layout_path, pattern_results, cell_name, test_criteria):
@@ -296,27 +231,6 @@ def analyze_splitted_results(layout_path, pattern_results, cell_name, test_crite
         return rule_results
 
 
-def get_top_cell_names(gds_path):
-    """
-    get_top_cell_names get the top cell names from the GDS file.
-
-    Parameters
-    ----------
-    gds_path : string
-        Path to the target GDS file.
-
-    Returns
-    -------
-    List of string
-        Names of the top cell in the layout.
-    """
-    layout = klayout.db.Layout()
-    layout.read(gds_path)
-    top_cells = [t.name for t in layout.top_cells()]
-
-    return top_cells
-
-
 def run_test_case(
     drc_dir: Path,
     layout_path: str,
@@ -407,73 +321,324 @@ def run_test_case(
                 line = line.strip()
                 logging.info(f"{line}")
 
-    # Checking if run is completed or failed
-    pattern_results = list(output_loc.glob(f"{pattern_name}*.lyrdb"))
+    # Checking if run is completed or failed, skipping analysis reports of earlier runs
+    pattern_results = [
+        p for p in output_loc.glob(f"{pattern_name}*.lyrdb") if not p.stem.endswith("_final")
+    ]
 
     # Analysis of splitted testcases into patterns
     if test_criteria in ["pass", "fail"]:
         return analyze_splitted_results(
             layout_path, pattern_results, cell_name, test_criteria
         )
+
+    if len(pattern_results) < 1:
+        return rule_counts
+
+    return compare_golden_markers(layout_path, pattern_results[0])
+
+
+def get_drc_job(
+    drc_dir: Path,
+    layout_path: Path,
+    run_dir: Path,
+    testcase_basename: str,
+    table_name: str,
+    cell_name: str,
+):
+    """
+    Build the KLayout job that run_drc.py would run for a single test case.
+
+    Parameters
+    ----------
+    drc_dir : Path
+        Path to the location where all runset exist.
+    layout_path : Path
+        Path to the layout of the test pattern.
+    run_dir : Path
+        Path to the location where is the regression run is done.
+    testcase_basename : str
+        Testcase name that we are running on.
+    table_name : str
+        Table name that we are running on.
+    cell_name : str
+        Cell name that we are running on.
+
+    Returns
+    -------
+    tuple
+        Rule deck path and the switches of the run.
+    """
+    sw_file = Path(layout_path.parent).absolute() / f"{testcase_basename}.{SUPPORTED_SW_EXT}"
+    argv = get_switches(sw_file, testcase_basename) if os.path.exists(sw_file) else []
+
+    output_loc = run_dir / table_name / cell_name
+    argv += [
+        f"--path={layout_path}",
+        f"--table={table_name}",
+        f"--topcell={cell_name}",
+        f"--run_dir={output_loc}",
+        "--run_mode=deep",
+    ]
+
+    # Same runset selection as run_drc.py single-processor runs
+    if "antenna" in str(layout_path):
+        argv.append("--antenna_only")
+        deck, tables = drc_dir / "rule_decks" / "antenna.drc", ["antenna"]
+    elif "density" in str(layout_path):
+        argv += ["--density_only", "--density_sanity"]
+        deck, tables = drc_dir / "rule_decks" / "density.drc", ["density"]
     else:
-        # Get list of rules covered in the test case
-        rules_tested = get_unit_test_coverage(layout_path)
+        deck, tables = drc_dir / "ihp-sg13g2.drc", [table_name]
+
+    drc_args = run_drc.parse_args(argv)
+    switches = run_drc.generate_klayout_switches(drc_args, str(layout_path))
+    if deck.name == "ihp-sg13g2.drc":
+        switches.update({"no_feol": "true", "no_beol": "true", "no_forbidden": "true", "no_pin": "true"})
+
+    run_name = "_".join(tables)
+    switches["report"] = output_loc / f"{testcase_basename}_{cell_name}_{run_name}.lyrdb"
+    switches["log"] = output_loc / f"{testcase_basename}_{cell_name}_{run_name}.log"
+    switches["tables"] = " ".join(tables)
+
+    return deck, switches
+
+
+def run_klayout_batch(jobs: list, batch_dir: Path, batch_name: str):
+    """
+    Run a list of KLayout jobs in one KLayout session.
+
+    Parameters
+    ----------
+    jobs : list
+        List of (rule deck path, switches dict) tuples.
+    batch_dir : Path
+        Directory for the jobs file and the batch log.
+    batch_name : str
+        Name used for the jobs file and the batch log.
+    """
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    jobs_file = batch_dir / f"{batch_name}_jobs.txt"
+    batch_log = batch_dir / f"{batch_name}_batch.log"
+
+    with open(jobs_file, "w") as f:
+        for deck, switches in jobs:
+            fields = [str(deck)] + [f"{k}={v}" for k, v in switches.items() if v is not None]
+            f.write("\t".join(fields) + "\n")
+
+    call_str = f"klayout -b -r {BATCH_RUNNER} -rd jobs={jobs_file} > {batch_log} 2>&1"
+    try:
+        check_call(call_str, shell=True)
+    except Exception as e:
+        logging.error("%s generated an exception: %s" % (batch_name, e))
+        traceback.print_exc()
 
-        if len(pattern_results) > 0:
-            # db to gds conversion
-            marker_output, runset_analysis = convert_results_db_to_gds(
-                pattern_results[0], rules_tested
+    # dumping log into output to make CI have the log
+    if batch_log.is_file():
+        logging.info(f"# Dumping {batch_name} batch output log:")
+        with open(batch_log, "r") as f:
+            for line in f:
+                logging.info(line.strip())
+
+
+def run_table_batch(drc_dir: Path, table_df: pd.DataFrame, run_dir: Path) -> dict:
+    """
+    Run all test cases of one table in a single KLayout session.
+
+    The DRC runs of all cells share one KLayout process. The golden
+    comparison of each cell is done in memory afterwards.
+
+    Parameters
+    ----------
+    drc_dir : Path
+        Path to the location where all runset exist.
+    table_df : pd.DataFrame
+        Test cases of one table.
+    run_dir : Path
+        Path to the location where is the regression run is done.
+
+    Returns
+    -------
+    dict
+        Mapping of run id to its rule counts, or to the exception of the run.
+    """
+    table_name = table_df["table_name"].iloc[0]
+    results = {}
+
+    jobs = {}
+    for _, row in table_df.iterrows():
+        deck, switches = get_drc_job(
+            drc_dir, row["test_path"], run_dir, row["testcase_basename"], table_name, row["top_cell"]
+        )
+        Path(switches["report"]).parent.mkdir(parents=True, exist_ok=True)
+        jobs[row["run_id"]] = (deck, switches)
+
+    run_klayout_batch(list(jobs.values()), run_dir / table_name, f"{table_name}_drc")
+
+    for _, row in table_df.iterrows():
+        run_id = row["run_id"]
+        report = Path(jobs[run_id][1]["report"])
+        if not report.is_file():
+            results[run_id] = Exception("Failed DRC run.")
+            continue
+
+        if row["test_criteria"] in ["pass", "fail"]:
+            results[run_id] = analyze_splitted_results(
+                row["test_path"], [report], row["top_cell"], row["test_criteria"]
             )
+            continue
 
-            # Generating merged testcase for violated rules
-            merged_output = generate_merged_testcase(layout_path, marker_output)
-
-            # Generating final db file
-            if os.path.exists(merged_output):
-                final_report = (
-                    f'{merged_output.split(f".{SUPPORTED_TC_EXT}")[0]}_final.lyrdb'
-                )
-                analysis_log = (
-                    f'{merged_output.split(f".{SUPPORTED_TC_EXT}")[0]}_analysis.log'
-                )
-                call_str = (
-                    f"klayout -b -r {runset_analysis} "
-                    f"-rd input={merged_output} "
-                    f"-rd report={final_report} "
-                    f"> {analysis_log} 2>&1"
-                )
-                failed_analysis_step = False
+        try:
+            results[run_id] = compare_golden_markers(row["test_path"], report)
+        except Exception as e:
+            results[run_id] = e
 
-                try:
-                    check_call(call_str, shell=True)
-                except Exception as e:
-                    failed_analysis_step = True
-                    logging.error("%s generated an exception: %s" % (pattern_name, e))
-                    traceback.print_exc()
+    return results
 
-                # dumping log into output to make CI have the log
-                if os.path.isfile(analysis_log):
-                    logging.info("# Dumping analysis run output log:")
-                    with open(analysis_log, "r") as f:
-                        for line in f:
-                            line = line.strip()
-                            logging.info(f"{line}")
-
-                if failed_analysis_step:
-                    raise Exception("Failed DRC analysis run.")
-
-                if os.path.exists(final_report):
-                    rule_counts = parse_results_db(final_report)
-                    return rule_counts
-                else:
-                    return rule_counts
-            else:
-                return rule_counts
-        else:
-            return rule_counts
 
+class TestCaseResults:
+    """
+    Columnar store of the results of all test cases, indexed by run id.
+
+    The run status of each test case is kept in a preallocated column, and
+    the rule counts are appended as plain records. The DataFrames are built
+    once, after all test cases ran.
 
-def run_all_test_cases(tc_df: pd.DataFrame, drc_dir: Path, run_dir: Path, num_workers: int):
+    Parameters
+    ----------
+    tc_df : pd.DataFrame
+        DataFrame that holds all the test cases information for running.
+    """
+
+    def __init__(self, tc_df: pd.DataFrame):
+        self.run_index = {run_id: i for i, run_id in enumerate(tc_df["run_id"])}
+        self.table_names = tc_df["table_name"].tolist()
+        self.run_status = ["no status"] * len(tc_df)
+        self.records = {"run_id": [], "rule_name": [], "type": [], "count": []}
+
+    def set_status(self, run_id: int, status: str):
+        """Set the run status of a test case."""
+        self.run_status[self.run_index[run_id]] = status
+
+    def add_rule_results(self, run_id: int, rule_results: dict):
+        """Add the "<rule><RULE_SEP><analysis rule>" counts of a test case."""
+        for analysis_rule, count in rule_results.items():
+            rule_name, _, rule_type = analysis_rule.partition(RULE_SEP)
+            self.records["run_id"].append(run_id)
+            self.records["rule_name"].append(rule_name)
+            self.records["type"].append(rule_type)
+            self.records["count"].append(int(count))
+
+    def get_results_df(self) -> pd.DataFrame:
+        """
+        Build the rule results of all test cases.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per test case and rule with the analysis rule counts.
+        """
+        if not self.records["run_id"]:
+            return pd.DataFrame()
+
+        results_df = pd.DataFrame(self.records).pivot(
+            index=["run_id", "rule_name"], columns="type", values="count"
+        )
+        results_df = results_df.fillna(0).reset_index()
+
+        for c in ANALYSIS_RULES:
+            if c not in results_df.columns:
+                results_df[c] = 0
+
+        results_df[ANALYSIS_RULES] = results_df[ANALYSIS_RULES].astype(int)
+        results_df["table_name"] = [
+            self.table_names[self.run_index[run_id]] for run_id in results_df["run_id"]
+        ]
+        results_df["in_tests"] = 1
+        return results_df[["table_name", "rule_name"] + ANALYSIS_RULES + ["in_tests"]]
+
+    def get_status_df(self) -> pd.DataFrame:
+        """
+        Build the distinct run statuses of each table.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per table and run status found in its test cases.
+        """
+        status_df = pd.DataFrame({"table_name": self.table_names, "run_status": self.run_status})
+        return status_df.drop_duplicates()
+
+
+def get_result_cache_key(
+    drc_dir: Path,
+    layout_path: Path,
+    testcase_basename: str,
+    table_name: str,
+    cell_name: str,
+    test_criteria: str,
+) -> str:
+    """
+    Compute the result cache key of a single test case.
+
+    The key covers the testcase layout, its switches file, the rule deck
+    files that run for its table, the tech JSON files, the DRC and
+    regression scripts and the KLayout version.
+
+    Parameters
+    ----------
+    drc_dir : Path
+        Path to the location where all runset exist.
+    layout_path : Path
+        Path to the layout of the test pattern.
+    testcase_basename : str
+        Testcase name that we are running on.
+    table_name : str
+        Table name that we are running on.
+    cell_name : str
+        Cell name that we are running on.
+    test_criteria : str
+        Type of test that we are running on.
+
+    Returns
+    -------
+    str
+        Cache key of the test case result.
+    """
+    if "antenna" in str(layout_path):
+        deck_files = regression_cache.get_included_files(drc_dir / "rule_decks" / "antenna.drc")
+    elif "density" in str(layout_path):
+        deck_files = regression_cache.get_included_files(drc_dir / "rule_decks" / "density.drc")
+    else:
+        # Table rule decks only run if their table is selected
+        deck_files = []
+        for deck_file in regression_cache.get_included_files(drc_dir / "ihp-sg13g2.drc"):
+            guards = TABLE_GUARD.findall(deck_file.read_text())
+            if not guards or table_name in guards:
+                deck_files.append(deck_file)
+
+    testing_dir = Path(__file__).resolve().parent
+    files = [
+        layout_path,
+        Path(layout_path.parent) / f"{testcase_basename}.{SUPPORTED_SW_EXT}",
+        *deck_files,
+        drc_dir / "rule_decks" / "sg13g2_tech_default.json",
+        drc_dir.parents[1] / "python" / "sg13g2_pycell_lib" / "sg13g2_tech_mod.json",
+        drc_dir / "run_drc.py",
+        testing_dir / "run_regression.py",
+        testing_dir / "rdb_markers.py",
+    ]
+    return regression_cache.get_result_key(files, [table_name, cell_name, test_criteria])
+
+
+def run_all_test_cases(
+    tc_df: pd.DataFrame,
+    drc_dir: Path,
+    run_dir: Path,
+    num_workers: int,
+    batch: bool = False,
+    cache_dir: Path = None,
+):
     """
     This function run all test cases from the input dataframe.
 
@@ -487,90 +652,104 @@ def run_all_test_cases(tc_df: pd.DataFrame, drc_dir: Path, run_dir: Path, num_wo
         Path string to the location of the testing code and output.
     num_workers : int
         Number of workers to use for running the regression.
+    batch : bool
+        Run all test cases of a table in one KLayout session instead of
+        one run_drc.py call per test case.
+    cache_dir : Path, optional
+        Result cache directory. Test cases with a stored result for the same
+        inputs are not run again. Disabled if None.
 
     Returns
     -------
-    pd.DataFrame
-        A pandas DataFrame with all test cases information post running.
+    tuple
+        The TestCaseResults of all test cases, and the test cases DataFrame
+        with their run status.
     """
 
-    results_df_list = []
-    tc_df["run_status"] = "no status"
+    results = TestCaseResults(tc_df)
+    cache_keys = {}
+
+    def add_run_result(run_id, rule_results):
+        if isinstance(rule_results, Exception):
+            logging.error("%d generated an exception: %s" % (run_id, rule_results))
+            results.set_status(run_id, "exception")
+            return
+
+        if run_id in cache_keys:
+            regression_cache.save_result(
+                cache_dir, cache_keys[run_id], {"rule_results": dict(rule_results)}
+            )
+
+        if rule_results:
+            results.add_rule_results(run_id, rule_results)
+            results.set_status(run_id, "completed")
+        else:
+            results.set_status(run_id, "no output")
+
+    # Reuse stored results of test cases whose inputs did not change
+    run_df = tc_df
+    if cache_dir is not None:
+        for _, row in tc_df.iterrows():
+            key = get_result_cache_key(
+                drc_dir,
+                row["test_path"],
+                row["testcase_basename"],
+                row["table_name"],
+                row["top_cell"],
+                row["test_criteria"],
+            )
+            cached = regression_cache.load_result(cache_dir, key)
+            if cached is None:
+                cache_keys[row["run_id"]] = key
+            else:
+                add_run_result(row["run_id"], cached["rule_results"])
+
+        run_df = tc_df[tc_df["run_id"].isin(cache_keys)]
+        logging.info(
+            f"# Reusing cached results of {len(tc_df) - len(run_df)} test cases, running {len(run_df)}."
+        )
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
-        future_to_run_id = dict()
-        for i, row in tc_df.iterrows():
-            future_to_run_id[
-                executor.submit(
-                    run_test_case,
-                    drc_dir,
-                    row["test_path"],
-                    run_dir,
-                    row["testcase_basename"],
-                    row["table_name"],
-                    row["top_cell"],
-                    row["test_criteria"],
-                )
-            ] = row["run_id"]
-
-        for future in concurrent.futures.as_completed(future_to_run_id):
-            run_id = future_to_run_id[future]
-            try:
-                rule_results = future.result()
-                if rule_results:
-                    rule_results_df = pd.DataFrame(
-                        {
-                            "analysis_rule": rule_results.keys(),
-                            "count": rule_results.values(),
-                        }
-                    )
-                    rule_results_df["rule_name"] = (
-                        rule_results_df["analysis_rule"].str.split(RULE_SEP).str[0]
-                    )
-                    rule_results_df["type"] = (
-                        rule_results_df["analysis_rule"].str.split(RULE_SEP).str[1]
-                    )
-                    rule_results_df.drop(columns=["analysis_rule"], inplace=True)
-                    rule_results_df["count"] = rule_results_df["count"].astype(int)
-                    rule_results_df = rule_results_df.pivot(
-                        index="rule_name", columns="type", values="count"
-                    )
-                    rule_results_df = rule_results_df.fillna(0)
-                    rule_results_df = rule_results_df.reset_index(drop=False)
-                    rule_results_df = rule_results_df.rename(
-                        columns={"index": "rule_name"}
+        if batch:
+            future_to_run_ids = {
+                executor.submit(run_table_batch, drc_dir, table_df, run_dir): list(table_df["run_id"])
+                for _, table_df in run_df.groupby("table_name")
+            }
+            for future in concurrent.futures.as_completed(future_to_run_ids):
+                try:
+                    for run_id, rule_results in future.result().items():
+                        add_run_result(run_id, rule_results)
+                except Exception as exc:
+                    traceback.print_exc()
+                    for run_id in future_to_run_ids[future]:
+                        add_run_result(run_id, exc)
+        else:
+            future_to_run_id = dict()
+            for i, row in run_df.iterrows():
+                future_to_run_id[
+                    executor.submit(
+                        run_test_case,
+                        drc_dir,
+                        row["test_path"],
+                        run_dir,
+                        row["testcase_basename"],
+                        row["table_name"],
+                        row["top_cell"],
+                        row["test_criteria"],
                     )
-                    rule_results_df["table_name"] = tc_df.loc[
-                        tc_df["run_id"] == run_id, "table_name"
-                    ].iloc[0]
-
-                    for c in ANALYSIS_RULES:
-                        if c not in rule_results_df.columns:
-                            rule_results_df[c] = 0
-
-                    rule_results_df[ANALYSIS_RULES] = rule_results_df[
-                        ANALYSIS_RULES
-                    ].astype(int)
-                    rule_results_df = rule_results_df[
-                        ["table_name", "rule_name"] + ANALYSIS_RULES
-                    ]
-                    results_df_list.append(rule_results_df)
-                    tc_df.loc[tc_df["run_id"] == run_id, "run_status"] = "completed"
-                else:
-                    tc_df.loc[tc_df["run_id"] == run_id, "run_status"] = "no output"
-
-            except Exception as exc:
-                logging.error("%d generated an exception: %s" % (run_id, exc))
-                traceback.print_exc()
-                tc_df.loc[tc_df["run_id"] == run_id, "run_status"] = "exception"
-
-    if len(results_df_list) > 0:
-        results_df = pd.concat(results_df_list)
-        results_df["in_tests"] = 1
-    else:
-        results_df = pd.DataFrame()
+                ] = row["run_id"]
+
+            for future in concurrent.futures.as_completed(future_to_run_id):
+                run_id = future_to_run_id[future]
+                try:
+                    add_run_result(run_id, future.result())
+                except Exception as exc:
+                    traceback.print_exc()
+                    add_run_result(run_id, exc)
+
+    tc_df["run_status"] = results.run_status
 
-    return results_df, tc_df
+    return results, tc_df
 
 
 def expand_interpolations(rule_str, rules_vars):
@@ -680,249 +859,108 @@ def parse_existing_rules(
     return df
 
 
-def generate_merged_testcase(orignal_testcase, marker_testcase):
+def get_golden_datatypes(layout: klayout.db.Layout, top_cell: klayout.db.Cell) -> dict:
     """
-    This function will merge orignal gds file with generated
-    markers gds file.
+    Get the golden marker datatype of each rule from its rule name label.
 
     Parameters
     ----------
-    orignal_testcase : string or Path object
-        Path string to the orignal testcase
-
-    marker_testcase : string or Path
-        Path of the output marker gds file generated from db file.
+    layout : klayout.db.Layout
+        Testcase layout with golden markers on GOLDEN_LAY_NUM.
+    top_cell : klayout.db.Cell
+        Top cell of the testcase.
 
     Returns
     -------
-    merged_gds_path : string or Path
-        Path of the final merged gds file generated.
-    """
-
-    new_lib = gdstk.Library()
-
-    lib_org = gdstk.read_gds(orignal_testcase)
-    lib_marker = gdstk.read_gds(marker_testcase)
-
-    # Getting flattened top cells
-    top_cell_org = lib_org.top_level()[0].flatten(apply_repetitions=True)
-    top_cell_marker = lib_marker.top_level()[0].flatten(apply_repetitions=True)
-    marker_polygons = top_cell_marker.get_polygons(
-        apply_repetitions=True, include_paths=True, depth=None
-    )
-
-    # Merging all polygons of markers with original testcase
-    for marker_polygon in marker_polygons:
-        top_cell_org.add(marker_polygon)
-
-    # Adding flattened merged cell
-    new_lib.add(top_cell_org.flatten(apply_repetitions=True))
-
-    # Writing final merged gds file
-    merged_gds_path = f'{marker_testcase.replace(".gds", "")}_merged.gds'
-    new_lib.write_gds(merged_gds_path)
-
-    return merged_gds_path
-
-
-def draw_polygons(polygon_data, cell, lay_num, lay_dt, path_width):
+    dict
+        Mapping of rule name to golden layer index, empty for golden files
+        written before the labels were added.
     """
-    This function is used for drawing gds file with all violated polygons.
+    golden_layers = {}
+    for layer_index in layout.layer_indexes():
+        if layout.get_info(layer_index).layer != GOLDEN_LAY_NUM:
+            continue
+        shapes = top_cell.begin_shapes_rec(layer_index)
+        shapes.shape_flags = klayout.db.Shapes.STexts
+        while not shapes.at_end():
+            golden_layers[shapes.shape().text_string] = layer_index
+            shapes.next()
+    return golden_layers
 
-    Parameters
-    ----------
-    polygon_data : str
-        Contains data points for each violated polygon
-    cell: gdstk.Cell
-        Top cell will contains all generated polygons
-    lay_num: int
-        Number of layer used to draw violated polygons
-    lay_dt : int
-        Data type of layer used to draw violated polygons
-    path_width : float
-        Width  will used to draw edges
 
-    Returns
-    -------
-    None
+def compare_golden_markers(layout_path, results_database: Path) -> dict:
     """
+    Compare the violations of a DRC run with the golden markers of its testcase.
 
-    # Cleaning data points
-    polygon_data = re.sub(r"\s+", "", polygon_data)
-    polygon_data = re.sub(r"[()]", "", polygon_data)
-
-    tag_split = polygon_data.split(":")
-    tag = tag_split[0]
-    poly_txt = tag_split[1]
-    polygons = re.split(r"[/|]", poly_txt)
-
-    # Select shape type to be drawn
-    if tag == "polygon":
-        for poly in polygons:
-            points = [
-                (float(p.split(",")[0]), float(p.split(",")[1]))
-                for p in poly.split(";")
-            ]
-            cell.add(gdstk.Polygon(points, lay_num, lay_dt))
-
-    elif tag == "edge-pair":
-        for poly in polygons:
-            points = [
-                [float(p.split(",")[0]), float(p.split(",")[1])]
-                for p in poly.split(";")
-            ]
-            dist = np.sqrt(
-                ((points[0][0]) - (points[1][0])) ** 2
-                + ((points[0][1]) - (points[1][1])) ** 2
-            )
-            # Adding condition for extremely small edge length
-            # to generate a path to be drawn
-            if dist < path_width:
-                points[1][0] = points[0][0] + 2 * path_width
-            cell.add(gdstk.FlexPath(points, path_width, layer=lay_num, datatype=lay_dt))
-
-    elif tag == "edge":
-        for poly in polygons:
-            points = [
-                [float(p.split(",")[0]), float(p.split(",")[1])]
-                for p in poly.split(";")
-            ]
-            dist = np.sqrt(
-                ((points[0][0]) - (points[1][0])) ** 2
-                + ((points[0][1]) - (points[1][1])) ** 2
-            )
-            # Adding condition for extremely small edge length
-            # to generate a path to be drawn
-            if dist < path_width:
-                points[1][0] = points[0][0] + 2 * path_width
-            cell.add(gdstk.FlexPath(points, path_width, layer=lay_num, datatype=lay_dt))
-
-    elif "float" in tag or "text" in tag:
-        # Known antenna values for antenna ratios
-        pass
-
-    else:
-        logging.error(f"# Unknown type: {tag} ignored")
-
-
-def convert_results_db_to_gds(results_database: str, rules_tested: list):
-    """
-    Parses a KLayout .lyrdb result file and generates:
-    - A GDSII file with polygons drawn for violated rules.
-    - A DRC runset for golden-vs-violation analysis.
+    The violation markers of each rule and the golden markers labelled with
+    the same rule name are compared as regions in memory. Golden markers of
+    rules without violations are reported as golden_not_viol. The mismatching
+    markers are also written to a results database next to the DRC report,
+    so they can be viewed on the testcase layout.
 
     Parameters
     ----------
-    results_database : str or Path
-        Path to the KLayout results .lyrdb file.
-    rules_tested : list of str
-        List of rule names expected to be tested in this run.
+    layout_path : str or Path object
+        Path to the testcase layout with golden markers on GOLDEN_LAY_NUM.
+    results_database : Path
+        Path to the KLayout results database of the DRC run.
 
     Returns
     -------
-    output_gds_path : str
-        Path to the generated marker GDS file.
-    output_runset_path : str
-        Path to the generated DRC analysis runset.
+    dict
+        A dict with the viol_not_golden and golden_not_viol counts of each rule.
     """
     if not results_database.is_file():
         logging.error(f"Results database file does not exist: {results_database}")
         raise FileNotFoundError(results_database)
 
-    base_path = results_database.with_suffix("")  # removes .lyrdb suffix
-    output_gds_path = f"{base_path}_markers.gds"
-    output_runset_path = f"{base_path}_analysis.drc"
-
-    # Initial DRC analysis header
-    runset_analysis_setup = """
-source($input)
-report("DRC analysis run report at", $report)
-full_chip = extent.sized(0.0)
-"""
-    analysis_rules = [runset_analysis_setup]
-
-    # Parsing XML DB
-    rule_data_type_map = list()
-    cell_name = ""
-    lib = None
-    cell = None
-    in_item = False
-
-    for event, elem in tqdm(
-        ET.iterparse(results_database, events=("start", "end")), desc="Parsing results"
-    ):
-        if elem.tag != "item" and not in_item:
-            elem.clear()
-            continue
+    _, markers = read_rdb_markers(results_database, get_rule_name)
 
-        if elem.tag == "item" and event == "start":
-            in_item = True
-            continue
-
-        if elem.tag == "item" and event == "end":
-            rules = elem.findall("category")
-            values = elem.find("values")
-            polygons = values.findall("value") if values is not None else []
-
-            if not cell_name:
-                cell_elems = elem.findall("cell")
-                if cell_elems:
-                    cell_name = cell_elems[0].text or ""
-                    lib = gdstk.Library(f"{cell_name}_markers")
-                    cell = lib.new_cell(f"{cell_name}_markers")
-
-            rule_name = rules[0].text.replace("'", "") if rules else None
-            if not rule_name:
-                elem.clear()
-                in_item = False
-                continue
-
-            if rule_name not in rule_data_type_map:
-                rule_data_type_map.append(rule_name)
-
-            # Draw polygons
-            rule_lay_dt = rule_data_type_map.index(rule_name) + 1
-            for p in polygons:
-                draw_polygons(p.text, cell, VIOL_LAY_NUM, rule_lay_dt, PATH_WIDTH)
-
-            elem.clear()
-            in_item = False
-
-    if not lib or not cell:
-        logging.error(f"No valid violations found in {results_database}")
-        raise RuntimeError("Marker generation failed")
-
-    lib.write_gds(output_gds_path)
-
-    # Generate marker inputs and analysis
-    sorted_rules = sorted(rule_data_type_map)
-    rule_layer_map = {rule: idx + 1 for idx, rule in enumerate(sorted_rules)}
-    all_rules = set(sorted_rules) | set(rules_tested)
-
-    for rule in all_rules:
-        lay_dt = rule_layer_map.get(rule)
-        if lay_dt:
-            golden_marker = f"rule_{rule.replace('.', '_')}_golden"
-            viol_marker = f"rule_{rule.replace('.', '_')}_viol"
-            analysis_rules.append(
-                f"{golden_marker} = input({GOLDEN_LAY_NUM}, {lay_dt})\n"
-            )
-            analysis_rules.append(f"{viol_marker} = input({VIOL_LAY_NUM}, {lay_dt})\n")
+    layout = klayout.db.Layout()
+    layout.read(str(layout_path))
+    top_cell = layout.top_cells()[0]
+    viol_regions = get_rdb_marker_regions(markers, PATH_WIDTH, layout.dbu)
+
+    golden_layers = get_golden_datatypes(layout, top_cell)
+    if not golden_layers:
+        # Golden files without rule name labels use the datatypes in report order
+        logging.warning(f"No golden rule labels in {layout_path}, pairing markers in report order.")
+        golden_layers = {
+            rule: layout.find_layer(GOLDEN_LAY_NUM, lay_dt) for lay_dt, rule in enumerate(viol_regions, start=1)
+        }
+        paired = {li for li in golden_layers.values() if li is not None}
+        for layer_index in layout.layer_indexes():
+            info = layout.get_info(layer_index)
+            if info.layer == GOLDEN_LAY_NUM and layer_index not in paired:
+                golden_layers[f"{GOLDEN_LAY_NUM}/{info.datatype}"] = layer_index
+
+    report = klayout.rdb.ReportDatabase("DRC analysis run report")
+    report.top_cell_name = top_cell.name
+    report_cell = report.create_cell(top_cell.name)
+    trans = klayout.db.CplxTrans(layout.dbu)
+
+    rule_counts = {}
+    for rule in list(viol_regions) + [r for r in golden_layers if r not in viol_regions]:
+        viol = viol_regions.get(rule, klayout.db.Region())
+        golden_layer = golden_layers.get(rule)
+        golden = (
+            klayout.db.Region(top_cell.begin_shapes_rec(golden_layer))
+            if golden_layer is not None
+            else klayout.db.Region()
+        )
 
-        # Output checks if not both golden and tested
-        if not (rule in sorted_rules and rule in rules_tested):
-            for tag, src, ref in [
-                ("viol_not_golden", viol_marker, golden_marker),
-                ("golden_not_viol", golden_marker, viol_marker),
-            ]:
-                analysis_rules.append(
-                    f'{src}.not_interacting({ref}).output("{rule}{RULE_SEP}{tag}", "{rule}{RULE_SEP}{tag} polygons")\n'
-                )
+        for tag, src, ref in [
+            ("viol_not_golden", viol, golden),
+            ("golden_not_viol", golden, viol),
+        ]:
+            mismatch = src.not_interacting(ref)
+            category = report.create_category(f"{rule}{RULE_SEP}{tag}")
+            report.create_items(report_cell.rdb_id(), category.rdb_id(), trans, mismatch)
+            rule_counts[f"{rule}{RULE_SEP}{tag}"] = mismatch.count()
 
-    with open(output_runset_path, "w") as f:
-        f.writelines(analysis_rules)
+    report.save(str(results_database.with_name(f"{results_database.stem}_final.lyrdb")))
 
-    return output_gds_path, output_runset_path
+    return rule_counts
 
 
 def build_tests_dataframe(unit_test_case_dirs, target_table):
@@ -991,18 +1029,14 @@ def build_tests_dataframe(unit_test_case_dirs, target_table):
     return expanded_df
 
 
-def aggregate_results(
-    tc_df: pd.DataFrame, results_df: pd.DataFrame, rules_df: pd.DataFrame
-) -> pd.DataFrame:
+def aggregate_results(results: TestCaseResults, rules_df: pd.DataFrame) -> pd.DataFrame:
     """
     Aggregates analysis data from testcases, rule results, and rule deck coverage.
 
     Parameters
     ----------
-    tc_df : pd.DataFrame
-        DataFrame with test case info (e.g., table_name, run_status).
-    results_df : pd.DataFrame
-        DataFrame with marker analysis results per rule.
+    results : TestCaseResults
+        Rule results and run statuses of all test cases.
     rules_df : pd.DataFrame
         DataFrame listing all rules in the rule deck.
 
@@ -1011,6 +1045,8 @@ def aggregate_results(
     pd.DataFrame
         Aggregated DataFrame with rule coverage and rule status.
     """
+    results_df = results.get_results_df()
+
     # Ensure required columns are present
     if rules_df.empty and results_df.empty:
         logging.error("No rules available for analysis or results.")
@@ -1032,7 +1068,7 @@ def aggregate_results(
     df["in_tests"] = df.get("in_tests", 0).fillna(0)
 
     # Attach testcase run status
-    df = pd.merge(df, tc_df[["table_name", "run_status"]], how="left", on="table_name")
+    df = pd.merge(df, results.get_status_df(), how="left", on="table_name")
 
     # Initialize rule_status
     df["rule_status"] = "Unknown"
@@ -1063,7 +1099,14 @@ def aggregate_results(
     return df
 
 
-def run_regression(drc_dir: Path, output_path: Path, target_table: str, cpu_count: int):
+def run_regression(
+    drc_dir: Path,
+    output_path: Path,
+    target_table: str,
+    cpu_count: int,
+    batch: bool = False,
+    cache_dir: Path = None,
+):
     """
     Running Regression Procedure.
 
@@ -1079,6 +1122,10 @@ def run_regression(drc_dir: Path, output_path: Path, target_table: str, cpu_coun
         Name of table that we want to run regression for. If None, run all found.
     cpu_count : int
         Number of cpu cores to use in running testcases.
+    batch : bool
+        Run all test cases of a table in one KLayout session.
+    cache_dir : Path, optional
+        Result cache directory, or None to run all test cases.
     Returns
     -------
     bool
@@ -1102,12 +1149,14 @@ def run_regression(drc_dir: Path, output_path: Path, target_table: str, cpu_coun
     logging.info("# Found testcases: \n" + str(tc_df))
 
     # Run all test cases.
-    results_df, tc_df = run_all_test_cases(tc_df, drc_dir, output_path, cpu_count)
-    logging.info("# Testcases found results: \n" + str(results_df))
+    results, tc_df = run_all_test_cases(
+        tc_df, drc_dir, output_path, cpu_count, batch, cache_dir
+    )
+    logging.info("# Testcases found results: \n" + str(results.get_results_df()))
     logging.info("# Updated testcases: \n" + str(tc_df))
 
     # Aggregate all dataframes into one
-    df = aggregate_results(tc_df, results_df, rules_df)
+    df = aggregate_results(results, rules_df)
     df.drop_duplicates(inplace=True)
     logging.info("# Final analysis table: \n" + str(df))
 
@@ -1163,7 +1212,10 @@ def main(drc_dir: Path, output_path: Path, target_table: str):
     check_klayout_version()
 
     # Calling regression function
-    run_status = run_regression(drc_dir, output_path, target_table, workers_count)
+    cache_dir = Path(args.cache_dir).expanduser().resolve() if args.cache else None
+    run_status = run_regression(
+        drc_dir, output_path, target_table, workers_count, args.batch, cache_dir
+    )
 
     if run_status:
         logging.info("Test completed successfully.")
@@ -1175,7 +1227,8 @@ def main(drc_dir: Path, output_path: Path, target_table: str):
 def parse_args():
     USAGE = """
     run_regression.py (--help | -h)
-    run_regression.py [--run_dir=<run_dir>] [--table_name=<table_name>] [--mp=<num>]
+    run_regression.py [--run_dir=<run_dir>] [--table_name=<table_name>] [--mp=<num>] [--batch]
+                      [--cache] [--cache_dir=<cache_dir>]
     """
 
     parser = argparse.ArgumentParser(
@@ -1204,6 +1257,25 @@ def parse_args():
         help="The number of parts to split the rule deck for parallel execution. [default: 1]"
     )
 
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Run all test cases of a table in one KLayout session."
+    )
+
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Reuse stored results of test cases whose inputs did not change since an earlier run."
+    )
+
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=str(regression_cache.DEFAULT_CACHE_DIR / "drc"),
+        help="Directory of the regression result cache. [default: ~/.cache/ihp-sg13g2/regression/drc]"
+    )
+
     return parser.parse_args()
 
 # ================================================================
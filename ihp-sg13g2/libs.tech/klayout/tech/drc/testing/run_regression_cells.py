@@ -35,7 +35,6 @@ Options:
 """
 
 import os
-import shutil
 import time
 import logging
 import traceback
@@ -47,7 +46,7 @@ from subprocess import run
 from docopt import docopt
 import pandas as pd
 from pathlib import Path
-import gdstk
+from gds_index import extract_cell_gds, get_gds_index, get_top_cells
 
 # ==============================
 # Constants / Config
@@ -176,42 +175,19 @@ def waived_info(lib: str, cell_name: str) -> dict | None:
 
 
 # ==============================
-# gdstk-based cell discovery
+# GDS index based cell discovery
 # ==============================
 
-def gdstk_list_topcells(gds_path: str) -> list[str]:
-    """Return a sorted list of top cell names in a GDS using gdstk."""
+def list_topcells(gds_path: str) -> list[str]:
+    """Return a sorted list of top cell names in a GDS from its structure index."""
     gds_path = os.path.abspath(gds_path)
     if not os.path.isfile(gds_path):
         raise FileNotFoundError(f"GDS not found: {gds_path}")
 
-    lib = gdstk.read_gds(gds_path)
+    return get_top_cells(get_gds_index(gds_path))
 
-    all_names = set()
-    for cell in lib.cells:
-        if getattr(cell, "name", None):
-            all_names.add(cell.name)
 
-    referenced = set()
-    for cell in lib.cells:
-        refs = getattr(cell, "references", None)
-        if not refs:
-            continue
-        for ref in refs:
-            target = getattr(ref, "cell", None)
-            if target is None:
-                continue
-            if isinstance(target, str):
-                referenced.add(target)
-            else:
-                name = getattr(target, "name", None)
-                if name:
-                    referenced.add(name)
-
-    return sorted(all_names - referenced)
-
-
-def gdstk_list_first_level_cells(gds_path: str, topcell_name: str) -> list[str]:
+def list_first_level_cells(gds_path: str, topcell_name: str) -> list[str]:
     """
     Return a sorted list of unique cell names referenced directly by `topcell_name`
     (1st hierarchy level only).
@@ -222,30 +198,11 @@ def gdstk_list_first_level_cells(gds_path: str, topcell_name: str) -> list[str]:
     if not os.path.isfile(gds_path):
         raise FileNotFoundError(f"GDS not found: {gds_path}")
 
-    lib = gdstk.read_gds(gds_path)
-
-    top = None
-    for c in lib.cells:
-        if getattr(c, "name", None) == topcell_name:
-            top = c
-            break
-    if top is None:
+    index = get_gds_index(gds_path)
+    if topcell_name not in index.cells:
         raise RuntimeError(f"Top cell '{topcell_name}' not found in {gds_path}")
 
-    children = set()
-    refs = getattr(top, "references", None) or []
-    for ref in refs:
-        target = getattr(ref, "cell", None)
-        if target is None:
-            continue
-        if isinstance(target, str):
-            children.add(target)
-        else:
-            name = getattr(target, "name", None)
-            if name:
-                children.add(name)
-
-    return sorted(children)
+    return sorted(index.children[topcell_name])
 
 
 # ==============================
@@ -336,7 +293,7 @@ def discover_libref_tests(libref_root: str) -> pd.DataFrame:
             continue
 
         try:
-            topcells = gdstk_list_topcells(gds)
+            topcells = list_topcells(gds)
         except Exception as e:
             logging.error(f"[DISCOVERY] Failed to read topcells for {lib_name} ({gds}): {e}")
             continue
@@ -349,7 +306,7 @@ def discover_libref_tests(libref_root: str) -> pd.DataFrame:
         if lib_name == "sg13g2_io" and len(topcells) == 1:
             io_wrapper = topcells[0]
             try:
-                first_level = gdstk_list_first_level_cells(gds, io_wrapper)
+                first_level = list_first_level_cells(gds, io_wrapper)
             except Exception as e:
                 logging.error(
                     f"[DISCOVERY] {lib_name}: failed to get 1st-level cells from wrapper '{io_wrapper}' ({gds}): {e}"
@@ -386,7 +343,7 @@ def discover_libref_tests(libref_root: str) -> pd.DataFrame:
             for gds_path in sram_files:
                 gds = str(gds_path)
                 try:
-                    topcells = gdstk_list_topcells(gds)
+                    topcells = list_topcells(gds)
                 except Exception as e:
                     logging.error(f"[DISCOVERY] Failed to read SRAM topcells ({gds}): {e}")
                     continue
@@ -466,14 +423,14 @@ def run_test_case(
     cell_dir = os.path.join(run_dir, lib, cell_name)
     os.makedirs(cell_dir, exist_ok=True)
 
-    gds_basename = os.path.basename(layout_path)
-    layout_path_run = os.path.join(cell_dir, gds_basename)
+    layout_path_run = os.path.join(cell_dir, f"{cell_name}.{SUPPORTED_TC_EXT}")
     pattern_log = os.path.join(cell_dir, f"{cell_name}_drc.log")
 
+    # The DRC run only reads the cell and its subcells, not the whole library
     try:
-        shutil.copyfile(layout_path, layout_path_run)
+        extract_cell_gds(layout_path, cell_name, layout_path_run)
     except Exception as e:
-        logging.error(f"[{lib}/{cell_name}] Failed to copy GDS: {e}")
+        logging.error(f"[{lib}/{cell_name}] Failed to extract cell GDS: {e}")
         return "Failed", ""
 
     run_drc_py = os.path.join(drc_dir, "run_drc.py")
@@ -0,0 +1,283 @@
+# =========================================================================================
+# Copyright 2025 IHP PDK Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================================
+
+"""
+Layout ingest cache shared by the SG13G2 KLayout DRC and LVS runners.
+
+An input layout is converted once to a compressed OASIS file (CBLOCKs,
+strict mode) that is stored in a cache directory under its content hash.
+A sidecar JSON next to it records the top cells, their bounding boxes and
+the database unit. Later runs and parallel workers read the compact file,
+and top cells are looked up in the sidecar instead of reading the layout.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import klayout.db
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "ihp-sg13g2" / "layouts"
+
+# Name of the index mapping file path and stat data to content hashes.
+STAT_INDEX_NAME = "stat_index.json"
+
+
+def _load_stat_index(cache_dir: Path) -> dict:
+    """Load the file stat index of the cache, or an empty dict."""
+    index_path = cache_dir / STAT_INDEX_NAME
+    if not index_path.is_file():
+        return {}
+    try:
+        with open(index_path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _get_stat_key(layout_path: Path) -> str:
+    """Return a key identifying a file by path, size and modification time."""
+    stat = layout_path.stat()
+    return f"{layout_path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+
+
+def _write_json(path: Path, data: dict):
+    """Write a JSON file atomically."""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def get_layout_digest(layout_path: str, cache_dir: Path = DEFAULT_CACHE_DIR) -> str:
+    """
+    Return the content hash of a layout file.
+
+    The hash is looked up in the stat index of the cache first, so an
+    unchanged file is not read again.
+
+    Parameters
+    ----------
+    layout_path : str
+        Path to the layout file.
+    cache_dir : Path
+        Cache directory.
+
+    Returns
+    -------
+    str
+        SHA-256 hex digest of the file content.
+    """
+    layout_path = Path(layout_path)
+    stat_key = _get_stat_key(layout_path)
+    stat_index = _load_stat_index(cache_dir)
+    if stat_key in stat_index:
+        return stat_index[stat_key]
+
+    digest = hashlib.sha256()
+    with open(layout_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 24), b""):
+            digest.update(chunk)
+    content_hash = digest.hexdigest()
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    stat_index = _load_stat_index(cache_dir)
+    stat_index[stat_key] = content_hash
+    _write_json(cache_dir / STAT_INDEX_NAME, stat_index)
+
+    return content_hash
+
+
+def get_cached_layout_info(layout_path: str, cache_dir: Path = DEFAULT_CACHE_DIR) -> Optional[dict]:
+    """
+    Return the sidecar info of a layout if it is already in the cache.
+
+    The lookup uses only the stat index, so the layout is not read or hashed.
+
+    Parameters
+    ----------
+    layout_path : str
+        Path to the layout file.
+    cache_dir : Path
+        Cache directory.
+
+    Returns
+    -------
+    dict or None
+        Sidecar info (``top_cells``, ``bbox`` in um, ``dbu``, ``source``), or None
+        if the layout has not been ingested.
+    """
+    cache_dir = Path(cache_dir).expanduser().resolve()
+    try:
+        stat_key = _get_stat_key(Path(layout_path))
+    except OSError:
+        return None
+
+    content_hash = _load_stat_index(cache_dir).get(stat_key)
+    if content_hash is None:
+        return None
+
+    sidecar_path = cache_dir / f"{content_hash}.json"
+    if not sidecar_path.is_file() or not (cache_dir / f"{content_hash}.oas").is_file():
+        return None
+
+    try:
+        with open(sidecar_path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _bbox_to_list(bbox: klayout.db.DBox) -> Optional[List[float]]:
+    """Return a box as [left, bottom, right, top], or None if it is empty."""
+    if bbox.empty():
+        return None
+    return [bbox.left, bbox.bottom, bbox.right, bbox.top]
+
+
+def ingest_layout(layout_path: str, cache_dir: Path = DEFAULT_CACHE_DIR) -> Tuple[str, dict]:
+    """
+    Convert a layout to a compressed OASIS file in the cache, once.
+
+    Parameters
+    ----------
+    layout_path : str
+        Path to the input layout (GDS/OAS).
+    cache_dir : Path
+        Cache directory.
+
+    Returns
+    -------
+    tuple
+        Path to the cached OASIS file and its sidecar info.
+    """
+    cache_dir = Path(cache_dir).expanduser().resolve()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    content_hash = get_layout_digest(layout_path, cache_dir)
+    oas_path = cache_dir / f"{content_hash}.oas"
+    sidecar_path = cache_dir / f"{content_hash}.json"
+
+    if oas_path.is_file() and sidecar_path.is_file():
+        with open(sidecar_path) as f:
+            info = json.load(f)
+        logging.info(f"Using cached layout {oas_path} for {layout_path}")
+        return str(oas_path), info
+
+    logging.info(f"Converting {layout_path} to cached OASIS layout {oas_path}")
+    layout = klayout.db.Layout()
+    layout.read(str(layout_path))
+
+    save_options = klayout.db.SaveLayoutOptions()
+    save_options.format = "OASIS"
+    save_options.oasis_compression_level = 10
+    save_options.oasis_write_cblocks = True
+    save_options.oasis_strict_mode = True
+
+    tmp_path = oas_path.with_name(f"{oas_path.stem}.{os.getpid()}.tmp.oas")
+    layout.write(str(tmp_path), save_options)
+    os.replace(tmp_path, oas_path)
+
+    info = {
+        "source": str(Path(layout_path).resolve()),
+        "dbu": layout.dbu,
+        "top_cells": [c.name for c in layout.top_cells()],
+        "bbox": {c.name: _bbox_to_list(c.dbbox()) for c in layout.top_cells()},
+    }
+    _write_json(sidecar_path, info)
+
+    return str(oas_path), info
+
+
+def get_top_cell_names(layout_path: str, cache_dir: Path = DEFAULT_CACHE_DIR) -> List[str]:
+    """
+    Get the top cell names of a layout.
+
+    The names come from the cache sidecar if the layout was ingested.
+    Otherwise only the cell hierarchy is read, without any shapes.
+
+    Parameters
+    ----------
+    layout_path : str
+        Path to the target layout file.
+    cache_dir : Path
+        Cache directory.
+
+    Returns
+    -------
+    List of string
+        Names of the top cells in the layout.
+    """
+    info = get_cached_layout_info(layout_path, cache_dir)
+    if info is not None:
+        return info["top_cells"]
+
+    load_options = klayout.db.LoadLayoutOptions()
+    load_options.layer_map = klayout.db.LayerMap()
+    load_options.create_other_layers = False
+
+    layout = klayout.db.Layout()
+    layout.read(str(layout_path), load_options)
+    return [t.name for t in layout.top_cells()]
+
+
+def get_inst_key(inst: klayout.db.Instance, cell_hashes: Dict[int, str]) -> str:
+    """Return a key for an instance that does not depend on cell indexes."""
+    return f"{cell_hashes[inst.cell_index]} {inst.cplx_trans} {inst.a} {inst.b} {inst.na} {inst.nb}"
+
+
+def compute_cell_hashes(layout: klayout.db.Layout) -> Dict[int, str]:
+    """
+    Compute a geometry hash for every cell of a layout.
+
+    The hash of a cell covers its own shapes on all layers and the hashes and
+    placements of its child instances, so it changes whenever anything in the
+    cell's subtree changes.
+
+    Parameters
+    ----------
+    layout : klayout.db.Layout
+        Layout to hash.
+
+    Returns
+    -------
+    dict
+        Mapping of cell index to its hex digest.
+    """
+    layer_infos = {li: str(layout.get_info(li)) for li in layout.layer_indexes()}
+    cell_hashes = {}
+
+    for ci in layout.each_cell_bottom_up():
+        cell = layout.cell(ci)
+        digest = hashlib.sha256()
+
+        for li in sorted(layer_infos, key=lambda i: layer_infos[i]):
+            shapes = cell.shapes(li)
+            if shapes.is_empty():
+                continue
+            digest.update(f"L {layer_infos[li]}\n".encode())
+            for shape_str in sorted(str(shape) for shape in shapes.each()):
+                digest.update(f"{shape_str}\n".encode())
+
+        for inst_str in sorted(get_inst_key(inst, cell_hashes) for inst in cell.each_inst()):
+            digest.update(f"I {inst_str}\n".encode())
+
+        cell_hashes[ci] = digest.hexdigest()
+
+    return cell_hashes
@@ -18,13 +18,26 @@
 """Run IHP 130nm BiCMOS Open Source PDK - SG13G2 LVS."""
 
 import argparse
+import concurrent.futures
+import glob
+import hashlib
+import json
 import os
 import logging
+import re
+import shlex
 import klayout.db
 from datetime import datetime, timezone
 from subprocess import Popen, PIPE, STDOUT
 import time
 import sys
+from pathlib import Path
+
+try:
+    import layout_cache
+except ModuleNotFoundError:
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+    import layout_cache
 
 
 class ConsoleColorFormatter(logging.Formatter):
@@ -331,7 +344,7 @@ def check_layout_type(layout_path):
     return layout_path
 
 
-def get_top_cell_names(gds_path):
+def get_top_cell_names(gds_path, cache_dir=layout_cache.DEFAULT_CACHE_DIR):
     """
     Get the top cell names from the GDS file.
 
@@ -339,17 +352,15 @@ def get_top_cell_names(gds_path):
     ----------
     gds_path : string
         Path to the target GDS file.
+    cache_dir : Path
+        Layout cache directory.
 
     Returns
     -------
     List of string
         Names of the top cell in the layout.
     """
-    layout = klayout.db.Layout()
-    layout.read(gds_path)
-    top_cells = [t.name for t in layout.top_cells()]
-
-    return top_cells
+    return layout_cache.get_top_cell_names(gds_path, cache_dir)
 
 
 def get_run_top_cell_name(args, layout_path):
@@ -374,7 +385,7 @@ def get_run_top_cell_name(args, layout_path):
     if args.topcell:
         topcell = args.topcell
     else:
-        layout_topcells = get_top_cell_names(layout_path)
+        layout_topcells = get_top_cell_names(layout_path, Path(args.layout_cache_dir))
         if len(layout_topcells) > 1:
             logging.error(
                 "Layout has multiple topcells. Use --topcell to determine which topcell you want."
@@ -532,7 +543,7 @@ def check_lvs_results(results_db_files: list):
         exit(1)
 
 
-def run_check(lvs_file: str, path: str, run_dir: str, sws: dict):
+def run_check(lvs_file: str, path: str, run_dir: str, sws: dict, echo: bool = True):
     """
     Run LVS check.
 
@@ -546,6 +557,8 @@ def run_check(lvs_file: str, path: str, run_dir: str, sws: dict):
         String that holds the full path of the run location.
     sws : dict
         Dictionary that holds all switches that needs to be passed to the antenna checks.
+    echo : bool
+        Echo the KLayout output to stdout.
 
     Returns
     -------
@@ -583,8 +596,9 @@ def run_check(lvs_file: str, path: str, run_dir: str, sws: dict):
     if proc.stdout:
         for line in proc.stdout:
             output_lines.append(line)
-            sys.stdout.write(line)
-            sys.stdout.flush()
+            if echo:
+                sys.stdout.write(line)
+                sys.stdout.flush()
     proc.wait()
     combined_output = "".join(output_lines)
 
@@ -608,6 +622,676 @@ def run_check(lvs_file: str, path: str, run_dir: str, sws: dict):
     }
 
 
+def get_lvs_deck_hash(lvs_rule_deck: str, switches: dict) -> str:
+    """
+    Hash the LVS runset files and the run switches that affect comparison.
+
+    Parameters
+    ----------
+    lvs_rule_deck : str
+        Path to the main LVS runset.
+    switches : dict
+        Run switches passed to KLayout.
+
+    Returns
+    -------
+    str
+        SHA-256 hex digest of the runset and switches.
+    """
+    deck_dir = os.path.dirname(lvs_rule_deck)
+    digest = hashlib.sha256()
+    for deck_file in [lvs_rule_deck] + sorted(glob.glob(os.path.join(deck_dir, "rule_decks", "*.lvs"))):
+        digest.update(os.path.basename(deck_file).encode())
+        with open(deck_file, "rb") as f:
+            digest.update(f.read())
+
+    ignored = {"input", "topcell", "schematic", "layout_netlist", "blank_cells", "verified_cells"}
+    digest.update(json.dumps({k: v for k, v in switches.items() if k not in ignored}, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def _iter_spice_lines(netlist_path: str):
+    """Yield the logical lines of a SPICE/CDL file, with continuations joined and comments dropped."""
+    current = None
+    with open(netlist_path, errors="replace") as f:
+        for raw_line in f:
+            line = raw_line.strip()
+            if not line or line.startswith("*"):
+                continue
+            if line.startswith("+") and current is not None:
+                current = f"{current} {line[1:].strip()}"
+                continue
+            if current is not None:
+                yield current
+            current = line
+    if current is not None:
+        yield current
+
+
+def read_spice_subckts(netlist_path: str, header: list = None, subckts: dict = None):
+    """
+    Read the subcircuit definitions of a SPICE/CDL netlist.
+
+    Included netlists are followed.
+
+    Parameters
+    ----------
+    netlist_path : str
+        Path to the schematic netlist.
+    header : list
+        Dot statements outside of subcircuits to fill, used when following includes.
+    subckts : dict
+        Subcircuit mapping to fill, used when following includes.
+
+    Returns
+    -------
+    tuple
+        Dot statements outside of subcircuits (e.g. ``.GLOBAL``, ``.PARAM``) and a
+        mapping of upper-case subcircuit name to the lines of its definition.
+    """
+    header = [] if header is None else header
+    subckts = {} if subckts is None else subckts
+    name, lines = None, []
+
+    for line in _iter_spice_lines(netlist_path):
+        words = line.split()
+        keyword = words[0].lower()
+        if keyword in (".include", ".inc") and len(words) > 1:
+            include_path = os.path.join(os.path.dirname(netlist_path), words[1].strip("'\""))
+            if os.path.isfile(include_path):
+                read_spice_subckts(include_path, header, subckts)
+            continue
+        if keyword == ".subckt" and len(words) > 1:
+            name, lines = words[1].upper(), []
+        if name is not None:
+            lines.append(" ".join(words))
+            if keyword == ".ends":
+                subckts[name] = lines
+                name = None
+        elif keyword.startswith(".") and keyword != ".end":
+            header.append(line)
+
+    return header, subckts
+
+
+def get_subckt_children(lines: list) -> list:
+    """
+    Get the subcircuits instantiated by a subcircuit definition.
+
+    Parameters
+    ----------
+    lines : list
+        Lines of the subcircuit definition as returned by ``read_spice_subckts``.
+
+    Returns
+    -------
+    list
+        Upper-case names of the instantiated subcircuits.
+    """
+    children = []
+    for line in lines[1:]:
+        if line[0].lower() == "x":
+            words = [w for w in line.split() if "=" not in w and w != "/"]
+            if len(words) > 1:
+                children.append(words[-1].upper())
+    return children
+
+
+def get_subckt_hashes(netlist_path: str) -> dict:
+    """
+    Hash every subcircuit of a SPICE/CDL netlist together with its subcircuits.
+
+    The hash of a subcircuit covers its own definition, the hashes of all
+    subcircuits it instantiates and the dot statements outside of
+    subcircuits (e.g. ``.GLOBAL``), so it changes with anything below it.
+
+    Parameters
+    ----------
+    netlist_path : str
+        Path to the schematic netlist.
+
+    Returns
+    -------
+    dict
+        Mapping of upper-case subcircuit name to the hash of its subtree.
+    """
+    header, subckts = read_spice_subckts(netlist_path)
+    hashes = {}
+
+    def subtree_hash(name, stack):
+        if name not in hashes:
+            lines = subckts[name]
+            child_hashes = [
+                subtree_hash(child, stack | {name})
+                for child in get_subckt_children(lines)
+                if child in subckts and child not in stack and child != name
+            ]
+            text = "\n".join(header + lines + child_hashes)
+            hashes[name] = hashlib.sha256(text.encode()).hexdigest()
+        return hashes[name]
+
+    for name in subckts:
+        subtree_hash(name, frozenset())
+    return hashes
+
+
+def get_cell_reuse_keys(layout_path: str, topcell: str, netlist_path: str, deck_hash: str) -> dict:
+    """
+    Compute the reuse key of every cell below the top cell.
+
+    A key covers the cell geometry, its schematic subcircuit with all
+    subcircuits below it and the runset, so a cell is only reused while none
+    of them changed. Cells without a
+    schematic subcircuit get no key.
+
+    Parameters
+    ----------
+    layout_path : str
+        Path to the layout file.
+    topcell : str
+        Name of the top cell.
+    netlist_path : str
+        Path to the schematic netlist.
+    deck_hash : str
+        Hash returned by ``get_lvs_deck_hash``.
+
+    Returns
+    -------
+    dict
+        Mapping of cell name to its reuse key.
+    """
+    layout = klayout.db.Layout()
+    layout.read(layout_path)
+    top_cell = layout.cell(topcell)
+    if top_cell is None:
+        return {}
+
+    cell_hashes = layout_cache.compute_cell_hashes(layout)
+    subckt_hashes = get_subckt_hashes(netlist_path)
+
+    keys = {}
+    for ci in top_cell.called_cells():
+        cell_name = layout.cell(ci).name
+        subckt_hash = subckt_hashes.get(cell_name.upper())
+        if subckt_hash is None:
+            continue
+        key_str = f"{cell_name} {cell_hashes[ci]} {subckt_hash} {deck_hash}"
+        keys[cell_name] = hashlib.sha256(key_str.encode()).hexdigest()
+
+    return keys
+
+
+def load_verified_cells(cache_dir: str) -> dict:
+    """
+    Load the verified cells cache.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the verified cells cache.
+
+    Returns
+    -------
+    dict
+        Mapping of reuse key to cell name, or an empty dict.
+    """
+    cache_path = os.path.join(cache_dir, "verified_cells.json")
+    if not os.path.isfile(cache_path):
+        return {}
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        logging.warning(f"Ignoring unreadable verified cells cache {cache_path}")
+        return {}
+
+
+def save_verified_cells(cache_dir: str, verified: dict):
+    """
+    Save the verified cells cache atomically.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the verified cells cache.
+    verified : dict
+        Mapping of reuse key to cell name.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, "verified_cells.json")
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(verified, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, cache_path)
+
+
+# Layers kept in abstract cells, by their name in rule_decks/layers_definitions.lvs:
+# the conducting stack from diffusion and poly up to TopMetal2 with its labels,
+# and the well and implant layers that classify diffusion as well and substrate taps.
+ABSTRACT_LAYERS = [
+    "activ_drw", "activ_filler", "gatpoly_drw", "gatpoly_filler", "cont_drw",
+    "metal1_drw", "metal1_filler", "metal1_slit", "metal1_text", "via1_drw",
+    "metal2_drw", "metal2_filler", "metal2_slit", "metal2_text", "via2_drw",
+    "metal3_drw", "metal3_filler", "metal3_slit", "metal3_text", "via3_drw",
+    "metal4_drw", "metal4_filler", "metal4_slit", "metal4_text", "via4_drw",
+    "metal5_drw", "metal5_filler", "metal5_slit", "metal5_text", "topvia1_drw",
+    "topmetal1_drw", "topmetal1_filler", "topmetal1_slit", "topmetal1_text", "topvia2_drw",
+    "topmetal2_drw", "topmetal2_filler", "topmetal2_slit", "topmetal2_text",
+    "nwell_drw", "nwell_text", "psd_drw", "text_drw",
+]
+
+# Device regions cut out of the kept layers instead of keeping the device layers,
+# so gates, resistor bodies, inductors and MIM vias become gaps between nets.
+ABSTRACT_CUTS = {
+    "activ_drw": ["gatpoly_drw", "gatpoly_filler"],
+    "activ_filler": ["gatpoly_drw", "gatpoly_filler"],
+    "gatpoly_drw": ["polyres_drw", "res_drw"],
+    "metal1_drw": ["metal1_res"],
+    "metal2_drw": ["metal2_res"],
+    "metal3_drw": ["metal3_res"],
+    "metal4_drw": ["metal4_res"],
+    "metal5_drw": ["metal5_res"],
+    "topvia1_drw": ["mim_drw"],
+    "topmetal1_drw": ["topmetal1_res", "ind_drw"],
+    "topmetal2_drw": ["topmetal2_res", "ind_drw"],
+}
+
+
+def read_layer_definitions(layers_path: str = None) -> dict:
+    """
+    Read the GDS layer and datatype of every layer defined by the runset.
+
+    Parameters
+    ----------
+    layers_path : str
+        Path to the layer definitions. Defaults to ``rule_decks/layers_definitions.lvs``.
+
+    Returns
+    -------
+    dict
+        Mapping of layer name to its (layer, datatype) pair.
+    """
+    if layers_path is None:
+        layers_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rule_decks", "layers_definitions.lvs")
+    with open(layers_path) as f:
+        return {
+            name: (int(layer), int(datatype))
+            for name, layer, datatype in re.findall(
+                r"^(\w+)\s*=\s*(?:get_polygons|labels)\((\d+),\s*(\d+)\)", f.read(), re.MULTILINE
+            )
+        }
+
+
+def write_abstract_layout(layout_path: str, cells: list, out_path: str) -> str:
+    """
+    Write a copy of the layout with some cells replaced by interconnect abstracts.
+
+    Each cell is flattened and only its shapes on ``ABSTRACT_LAYERS`` are kept,
+    with the device regions of ``ABSTRACT_CUTS`` cut out. The extraction of a
+    black box cell then traces its wiring down to diffusion, poly and taps,
+    but does not derive or extract the devices inside it.
+
+    Parameters
+    ----------
+    layout_path : str
+        Path to the layout file.
+    cells : list
+        Names of the cells to replace by abstracts.
+    out_path : str
+        Path of the layout to write.
+
+    Returns
+    -------
+    str
+        Path of the written layout.
+    """
+    layout = klayout.db.Layout()
+    layout.read(layout_path)
+
+    layer_defs = read_layer_definitions()
+    layer_index = {
+        name: layout.find_layer(*layer_defs[name])
+        for name in set(ABSTRACT_LAYERS).union(*ABSTRACT_CUTS.values())
+    }
+    kept = {layer_index[name] for name in ABSTRACT_LAYERS} - {None}
+    drop_layers = [li for li in layout.layer_indexes() if li not in kept]
+
+    for cell_name in cells:
+        cell = layout.cell(cell_name)
+        if cell is None:
+            continue
+        cell.flatten(True)
+
+        for name, cut_names in ABSTRACT_CUTS.items():
+            if layer_index[name] is None:
+                continue
+            cut = klayout.db.Region()
+            for cut_name in cut_names:
+                if layer_index[cut_name] is not None:
+                    cut.insert(cell.shapes(layer_index[cut_name]))
+            if cut.is_empty():
+                continue
+            shapes = cell.shapes(layer_index[name])
+            texts = [s.text for s in shapes.each(klayout.db.Shapes.STexts)]
+            wires = klayout.db.Region(shapes) - cut
+            shapes.clear()
+            shapes.insert(wires)
+            for text in texts:
+                shapes.insert(text)
+
+        for li in drop_layers:
+            cell.shapes(li).clear()
+
+    layout.write(out_path)
+    logging.info(f"Wrote layout with {len(cells)} abstract cells to {out_path}")
+    return out_path
+
+
+def get_block_cells(layout_path: str, topcell: str, netlist_path: str, blocks: str = None) -> list:
+    """
+    Select the blocks to check in their own worker processes.
+
+    Parameters
+    ----------
+    layout_path : str
+        Path to the layout file.
+    topcell : str
+        Name of the top cell.
+    netlist_path : str
+        Path to the schematic netlist.
+    blocks : str
+        Comma-separated block cell names. If not given, all cells placed
+        directly in the top cell that have a schematic subcircuit are used.
+
+    Returns
+    -------
+    list
+        Names of the block cells.
+    """
+    layout = klayout.db.Layout()
+    layout.read(layout_path)
+    top_cell = layout.cell(topcell)
+    _, subckts = read_spice_subckts(netlist_path)
+
+    if blocks:
+        block_cells = [b.strip() for b in blocks.split(",") if b.strip()]
+        for block in block_cells:
+            if layout.cell(block) is None:
+                logging.error(f"Block cell {block} is not in layout {layout_path}.")
+                exit(1)
+            if block.upper() not in subckts:
+                logging.error(f"Block cell {block} has no subcircuit in netlist {netlist_path}.")
+                exit(1)
+        return block_cells
+
+    return sorted(
+        layout.cell(ci).name
+        for ci in top_cell.each_child_cell()
+        if layout.cell(ci).name.upper() in subckts
+    )
+
+
+def write_block_netlist(netlist_path: str, block: str, out_path: str):
+    """
+    Write a netlist holding a block subcircuit and all subcircuits it uses.
+
+    Parameters
+    ----------
+    netlist_path : str
+        Path to the full schematic netlist.
+    block : str
+        Name of the block subcircuit.
+    out_path : str
+        Path of the netlist to write.
+    """
+    header, subckts = read_spice_subckts(netlist_path)
+
+    used = []
+    pending = [block.upper()]
+    while pending:
+        name = pending.pop()
+        if name in used or name not in subckts:
+            continue
+        used.append(name)
+        pending.extend(get_subckt_children(subckts[name]))
+
+    with open(out_path, "w") as f:
+        f.write(f"* Block {block} from {netlist_path}\n")
+        for line in header:
+            f.write(f"{line}\n")
+        for name in reversed(used):
+            f.write("\n" + "\n".join(subckts[name]) + "\n")
+
+
+def run_block_check(lvs_file: str, block: str, run_dir: str, sws: dict, netlist_path: str) -> dict:
+    """
+    Extract and compare one block in its own KLayout process.
+
+    Parameters
+    ----------
+    lvs_file : str
+        Path to the LVS runset.
+    block : str
+        Name of the block cell.
+    run_dir : str
+        Run directory of the block.
+    sws : dict
+        Run switches of the full run.
+    netlist_path : str
+        Path to the full schematic netlist.
+
+    Returns
+    -------
+    dict
+        Block name, status and artifact paths.
+    """
+    os.makedirs(run_dir, exist_ok=True)
+    block_netlist = os.path.join(run_dir, f"{block}.cdl")
+    write_block_netlist(netlist_path, block, block_netlist)
+
+    block_sws = sws.copy()
+    block_sws["topcell"] = block
+    block_sws["schematic"] = block_netlist
+    block_sws["blank_cells"] = None
+    block_sws["verified_cells"] = None
+
+    try:
+        artifacts = run_check(lvs_file, os.path.join(run_dir, block), run_dir, block_sws, echo=False)
+        outcome = evaluate_run_outcome(artifacts["layout_log_path"], False)
+    except KLayoutRunError as e:
+        artifacts = e.artifacts
+        outcome = f"KLayout run failed with exit code {e.returncode}."
+
+    return {"block": block, "status": _summary_status_from_outcome(outcome), **artifacts}
+
+
+def run_blocks_parallel(lvs_file: str, blocks: list, run_dir: str, sws: dict, netlist_path: str, workers: int) -> list:
+    """
+    Check blocks in parallel worker processes.
+
+    Parameters
+    ----------
+    lvs_file : str
+        Path to the LVS runset.
+    blocks : list
+        Names of the block cells.
+    run_dir : str
+        Run directory of the full run. Each block runs in ``blocks/<block>``.
+    sws : dict
+        Run switches of the full run.
+    netlist_path : str
+        Path to the full schematic netlist.
+    workers : int
+        Number of blocks checked at the same time.
+
+    Returns
+    -------
+    list
+        Result of each block as returned by ``run_block_check``.
+    """
+    logging.info(f"Checking {len(blocks)} blocks with {workers} workers: {', '.join(blocks)}")
+
+    results = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                run_block_check, lvs_file, block, os.path.join(run_dir, "blocks", block), sws, netlist_path
+            ): block
+            for block in blocks
+        }
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            logging.info(f"Block {result['block']}: {result['status']}")
+            results.append(result)
+
+    return sorted(results, key=lambda r: r["block"])
+
+
+def setup_cell_reuse(
+    args: argparse.Namespace, switches: dict, lvs_rule_deck: str, netlist_path: str, lvs_run_dir: str,
+    compare_layout: bool,
+) -> tuple:
+    """
+    Select the previously verified cells to compare as black boxes.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Parsed command-line arguments.
+    switches : dict
+        Run switches, updated for the reuse run.
+    lvs_rule_deck : str
+        Path to the LVS runset.
+    netlist_path : str
+        Path to the schematic netlist.
+    lvs_run_dir : str
+        Run directory of the full run.
+    compare_layout : bool
+        Whether the run extracts the layout and compares it to a netlist.
+
+    Returns
+    -------
+    tuple
+        Reuse key of every cell with a subcircuit and the names of the reused cells.
+    """
+    if not args.reuse_cells:
+        return {}, []
+    if not compare_layout:
+        logging.warning("--reuse_cells needs layout extraction and a --netlist to compare against, ignoring it.")
+        return {}, []
+
+    if switches["run_mode"] != "deep":
+        logging.info("Verified cell reuse needs hierarchical extraction, switching to deep mode.")
+        switches["run_mode"] = "deep"
+    deck_hash = get_lvs_deck_hash(lvs_rule_deck, switches)
+    reuse_keys = get_cell_reuse_keys(switches["input"], switches["topcell"], netlist_path, deck_hash)
+    verified = load_verified_cells(args.cell_cache_dir)
+    reused_cells = sorted(name for name, key in reuse_keys.items() if key in verified)
+    logging.info(f"Reusing {len(reused_cells)} of {len(reuse_keys)} cells as verified black boxes.")
+    switches["verified_cells"] = os.path.join(lvs_run_dir, "verified_cells.txt")
+    return reuse_keys, reused_cells
+
+
+def update_verified_cells(cache_dir: str, verified_cells_path: str, reuse_keys: dict, block_results: list):
+    """
+    Add the cells that matched in this run to the verified cells cache.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the verified cells cache.
+    verified_cells_path : str
+        Cell names that matched, as written by the runset.
+    reuse_keys : dict
+        Reuse key of every cell, as returned by ``get_cell_reuse_keys``.
+    block_results : list
+        Block results, blocks that failed on their own are not added.
+    """
+    if not os.path.isfile(verified_cells_path):
+        return
+    verified = load_verified_cells(cache_dir)
+    failed_blocks = {r["block"] for r in block_results if r["status"] != "PASS"}
+    with open(verified_cells_path) as f:
+        for cell_name in f.read().split():
+            if cell_name in reuse_keys and cell_name not in failed_blocks:
+                verified[reuse_keys[cell_name]] = cell_name
+    save_verified_cells(cache_dir, verified)
+
+
+def setup_block_runs(
+    args: argparse.Namespace, switches: dict, lvs_rule_deck: str, netlist_path: str, lvs_run_dir: str,
+    compare_layout: bool,
+) -> tuple:
+    """
+    Check the blocks in parallel before the top-level run.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Parsed command-line arguments.
+    switches : dict
+        Run switches, updated for the top-level run.
+    lvs_rule_deck : str
+        Path to the LVS runset.
+    netlist_path : str
+        Path to the schematic netlist.
+    lvs_run_dir : str
+        Run directory of the full run.
+    compare_layout : bool
+        Whether the run extracts the layout and compares it to a netlist.
+
+    Returns
+    -------
+    tuple
+        Names of the block cells and the result of each block.
+    """
+    if not args.workers:
+        return [], []
+    if not compare_layout:
+        logging.warning("--workers needs layout extraction and a --netlist to compare against, ignoring it.")
+        return [], []
+
+    if switches["run_mode"] != "deep":
+        logging.info("Block black boxes need hierarchical extraction, switching to deep mode.")
+        switches["run_mode"] = "deep"
+    blocks = get_block_cells(switches["input"], switches["topcell"], netlist_path, args.blocks)
+    block_results = run_blocks_parallel(lvs_rule_deck, blocks, lvs_run_dir, switches, netlist_path, args.workers)
+    return blocks, block_results
+
+
+def write_blocks_summary(lvs_run_dir: str, layout_path: str, topcell: str, run_artifacts: dict,
+                         block_results: list) -> list:
+    """
+    Write the results of the top-level run and all blocks to ``<layout>_blocks.json``.
+
+    Parameters
+    ----------
+    lvs_run_dir : str
+        Run directory of the full run.
+    layout_path : str
+        Path to the layout file.
+    topcell : str
+        Name of the top cell.
+    run_artifacts : dict
+        Artifact paths of the top-level run.
+    block_results : list
+        Result of each block as returned by ``run_block_check``.
+
+    Returns
+    -------
+    list
+        Names of the blocks with LVS errors.
+    """
+    failed_blocks = [r["block"] for r in block_results if r["status"] != "PASS"]
+    blocks_summary = os.path.join(lvs_run_dir, f"{os.path.basename(layout_path).split('.')[0]}_blocks.json")
+    with open(blocks_summary, "w") as f:
+        json.dump({"top": {"block": topcell, **run_artifacts}, "blocks": block_results}, f, indent=2)
+    logging.info(f"Block results summary at: {blocks_summary}")
+    if failed_blocks:
+        logging.error(f"Blocks with LVS errors: {', '.join(failed_blocks)}")
+    return failed_blocks
+
+
 def main(lvs_run_dir: str, args: argparse.Namespace):
     """
     Main function to run the LVS.
@@ -707,12 +1391,42 @@ def main(lvs_run_dir: str, args: argparse.Namespace):
         args, layout_path, netlist_path, layout_netlist_path, effective_net_only
     )
 
+    # Read the compact cached copy of the layout in the KLayout run
+    if args.layout_cache and not layout_netlist_path and args.layout:
+        switches["input"], _ = layout_cache.ingest_layout(layout_path, Path(args.layout_cache_dir))
+
+    # Compare previously verified cells and separately checked blocks as black boxes
+    compare_layout = not (layout_netlist_path or effective_net_only or not netlist_path)
+    reuse_keys, reused_cells = setup_cell_reuse(
+        args, switches, lvs_rule_deck, netlist_path, lvs_run_dir, compare_layout
+    )
+    blocks, block_results = setup_block_runs(
+        args, switches, lvs_rule_deck, netlist_path, lvs_run_dir, compare_layout
+    )
+
+    blank_cells = sorted(set(reused_cells) | set(blocks))
+    if blank_cells:
+        switches["input"] = write_abstract_layout(
+            switches["input"], blank_cells, os.path.join(lvs_run_dir, "abstract_layout.oas")
+        )
+        switches["blank_cells"] = shlex.quote(",".join(blank_cells))
+
     # Run LVS check
     run_artifacts = run_check(lvs_rule_deck, layout_path, lvs_run_dir, switches)
 
+    # Remember the cells that matched for the next run
+    if reuse_keys:
+        update_verified_cells(args.cell_cache_dir, switches["verified_cells"], reuse_keys, block_results)
+
     # Check run
     check_lvs_results(run_artifacts["report_path"])
 
+    failed_blocks = []
+    if block_results:
+        failed_blocks = write_blocks_summary(
+            lvs_run_dir, layout_path, switches["topcell"], run_artifacts, block_results
+        )
+
     return {
         "layout_path": layout_path,
         "topcell": switches["topcell"],
@@ -722,6 +1436,7 @@ def main(lvs_run_dir: str, args: argparse.Namespace):
         "report_path": run_artifacts["report_path"],
         "layout_log_path": run_artifacts["layout_log_path"],
         "extracted_netlist_path": run_artifacts["extracted_netlist_path"],
+        "failed_blocks": failed_blocks,
     }
 
 
@@ -730,7 +1445,7 @@ def main(lvs_run_dir: str, args: argparse.Namespace):
 # ================================================================
 
 
-if __name__ == "__main__":
+def parse_args(argv: list = None):
     USAGE = """
     run_lvs.py (--help | -h)
     run_lvs.py [--layout=<layout_path>]
@@ -739,7 +1454,9 @@ if __name__ == "__main__":
                [--no_net_names] [--spice_comments] [--net_only] [--no_simplify]
                [--no_series_res] [--no_parallel_res] [--combine_devices] [--top_lvl_pins]
                [--purge] [--purge_nets] [--ignore_top_ports_mismatch]
-               [--implicit_nets=<nets>]
+               [--implicit_nets=<nets>] [--layout_cache] [--layout_cache_dir=<cache_path>]
+               [--reuse_cells] [--cell_cache_dir=<cache_path>]
+               [--workers=<num_workers>] [--blocks=<cell_names>]
     """
 
     parser = argparse.ArgumentParser(
@@ -805,7 +1522,51 @@ if __name__ == "__main__":
         action="store_true",
         help="Ignore top-level port mismatches during comparison.",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--layout_cache",
+        action="store_true",
+        help="Convert the input layout once to a compressed OASIS file in the layout cache and read it in the run.",
+    )
+    parser.add_argument(
+        "--layout_cache_dir",
+        type=str,
+        default=str(layout_cache.DEFAULT_CACHE_DIR),
+        help="Directory of the layout cache. [default: ~/.cache/ihp-sg13g2/layouts]",
+    )
+    parser.add_argument(
+        "--reuse_cells",
+        action="store_true",
+        help=(
+            "Compare cells that matched in an earlier run with the same geometry, schematic subcircuit "
+            "and runset as black boxes. Uses deep mode."
+        ),
+    )
+    parser.add_argument(
+        "--cell_cache_dir",
+        type=str,
+        default=os.path.join(os.path.expanduser("~"), ".cache", "ihp-sg13g2", "lvs_cells"),
+        help="Directory of the verified cells cache. [default: ~/.cache/ihp-sg13g2/lvs_cells]",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help=(
+            "Extract and compare each block in its own KLayout process, this many at a time, "
+            "then compare the top level with the blocks as black boxes. Uses deep mode."
+        ),
+    )
+    parser.add_argument(
+        "--blocks",
+        type=str,
+        default=None,
+        help="Comma-separated block cells for --workers. [default: all cells placed in the top cell with a subcircuit]",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
 
     # Generate a timestamped run directory name
     now_str = datetime.now(timezone.utc).strftime("lvs_run_%Y_%m_%d_%H_%M_%S")
@@ -874,6 +1635,10 @@ if __name__ == "__main__":
                 run_meta.get("effective_net_only", False),
                 run_meta.get("layout_netlist_path_used"),
             )
+            if run_meta.get("failed_blocks"):
+                run_meta["outcome"] = (
+                    f"Comparison mode: FAIL (blocks do not match: {', '.join(run_meta['failed_blocks'])})."
+                )
         logging.getLogger().removeHandler(collector)
         emit_important_summary(
             lvs_run_dir,
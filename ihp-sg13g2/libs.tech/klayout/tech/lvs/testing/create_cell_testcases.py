@@ -9,9 +9,10 @@ create_cell_testcases.py
     <cell>_iso: Rect: nBuLay.drawing-32/0, Ring: NWell.drawing-31/0
 2. Create testcases/sg13g2_cells/<cell>/netlist/<cell>.cdl files
     from "libs.ref/cdl/sg13g2_stdcell.cdl"
+Existing GDS and CDL files are only rewritten if their generated content changed.
 """
 
-# import sys
+import sys
 from sys import stderr
 import os
 import re
@@ -25,6 +26,12 @@ import shutil
 import logging
 import inspect
 
+try:
+    import layout_cache
+except ModuleNotFoundError:
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+    import layout_cache
+
 BOUNDARY_LAYER = (189, 4)
 DIGISUB_LAYER = (60, 0)
 NBULAY_LAYER = (32, 0)
@@ -187,6 +194,37 @@ def get_points_with_hole(rect_outer, rect_inner):
     return ring_points
 
 
+def get_layout_fingerprint(layout):
+    """
+    Return the database unit and the name and hierarchy hash of every cell.
+
+    Two layouts with the same fingerprint have the same cells and geometry,
+    even if their GDS files differ in timestamps or record order.
+    """
+    cell_hashes = layout_cache.compute_cell_hashes(layout)
+    return layout.dbu, sorted((layout.cell(ci).name, cell_hash) for ci, cell_hash in cell_hashes.items())
+
+
+def is_same_layout(gds_path_new, gds_path_old):
+    """Check if two GDS files have the same fingerprint."""
+    if not os.path.exists(gds_path_old):
+        return False
+    fingerprints = []
+    for gds_path in (gds_path_new, gds_path_old):
+        layout = pya.Layout()
+        layout.read(gds_path)
+        fingerprints.append(get_layout_fingerprint(layout))
+    return fingerprints[0] == fingerprints[1]
+
+
+def is_same_text(text, file_path):
+    """Check if an existing file has the given content."""
+    if not os.path.exists(file_path):
+        return False
+    with open(file_path, 'rt') as f:
+        return f.read() == text
+
+
 # ~~~~~~~~~~~~~~~~~~~~~~~ Main Procedure ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # Clone cdl PDK -> LVS
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -251,22 +289,24 @@ def clone_cdl_files(cdl_in: str, cell_list: list, ref_dir: str, out_dir: str,
             warn('Manual update may be needed', verbose=True)
 
         else:
-            info(f'Clone subckt_ref[{cell_ref}] -> {dest_path}', verbose=True)
-            with open(dest_path, 'wt') as f_out:
-                for line in subckt_ref['HEADER']:
-                    f_out.write(line)
-                f_out.write('\n')
+            cdl_lines = list(subckt_ref['HEADER'])
+            cdl_lines.append('\n')
 
-                for line in subckt_ref[cell_ref]:
-                    f_out.write(line)
-                f_out.write('\n')
+            cdl_lines.extend(subckt_ref[cell_ref])
+            cdl_lines.append('\n')
 
-                for line in subckt_ref[cell_ref]:
-                    f_out.write(line.replace(cell_ref, f"{cell_ref}_iso"))
-                f_out.write('\n')
+            cdl_lines.extend(line.replace(cell_ref, f"{cell_ref}_iso") for line in subckt_ref[cell_ref])
+            cdl_lines.append('\n')
 
-                for line in subckt_ref[cell_ref]:
-                    f_out.write(line.replace(cell_ref, f"{cell_ref}_digisub"))
+            cdl_lines.extend(line.replace(cell_ref, f"{cell_ref}_digisub") for line in subckt_ref[cell_ref])
+            cdl_text = ''.join(cdl_lines)
+
+            if is_same_text(cdl_text, dest_path):
+                info(f'Unchanged subckt_ref[{cell_ref}] -> {dest_path} => Skipped', verbose=verbose)
+            else:
+                info(f'Clone subckt_ref[{cell_ref}] -> {dest_path}', verbose=True)
+                with open(dest_path, 'wt') as f_out:
+                    f_out.write(cdl_text)
 
         out_dir_by_cell[cell_ref] = os.path.dirname(dest_path)
 
@@ -413,7 +453,16 @@ def insert_stdcell_frames(gds_in: str, cell_list: list, ref_dir: str, out_dir: s
         layout_gds_cell = layout_gds.create_cell(cell_iso.name)
         layout_gds_cell.copy_tree(cell_iso)
 
-        layout_gds.write(os.path.join(dest_path))
+        # Keep the existing file if its cells did not change. The new file is
+        # compared after writing, as shapes are normalized by the GDS round trip.
+        tmp_path = f'{os.path.splitext(dest_path)[0]}.{os.getpid()}.tmp.gds'
+        layout_gds.write(tmp_path)
+        if is_same_layout(tmp_path, dest_path):
+            info(f'Unchanged cell {cell.name} -> {dest_path} => Skipped', verbose=verbose)
+            os.remove(tmp_path)
+        else:
+            info(f'Write cell {cell.name} -> {dest_path}', verbose=verbose)
+            os.replace(tmp_path, dest_path)
         out_dir_by_cell[cell.name] = os.path.dirname(dest_path)
 
     # fh_out.close()
@@ -0,0 +1,72 @@
+# frozen_string_literal: true
+
+#=========================================================================================
+# Copyright 2025 IHP PDK Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#=========================================================================================
+
+#================================================
+#------------ PERSISTENT LVS WORKER -------------
+#================================================
+
+# Runs LVS jobs read from stdin in one long-lived KLayout session:
+#
+#   klayout -b -r lvs_worker.rb
+#
+# Each input line is "<deck>\t<name>=<value>\t...". The values are set as the
+# same global variables that -rd would set, then the deck is run. Each deck is
+# loaded once and reused by all later jobs. The deck output is written to
+# stdout, followed by one line with the job result:
+#
+#   LVS_WORKER_RESULT {"status": "match" | "mismatch" | "extracted" | "error", ...}
+#
+# The worker exits at the end of its input.
+
+require 'json'
+
+$stdout.sync = true
+macros = {}
+
+while (line = $stdin.gets)
+  line = line.chomp
+  next if line.strip.empty?
+
+  deck, *assignments = line.split("\t")
+  names = []
+  result = { 'status' => 'error', 'error' => nil }
+  start_time = Time.now
+
+  begin
+    assignments.each do |assignment|
+      name, value = assignment.split('=', 2)
+      raise "Invalid switch name '#{name}'" unless name =~ /\A\w+\z/
+
+      eval("$#{name} = value", binding, __FILE__, __LINE__)
+      names << name
+    end
+
+    # Set by the deck after the comparison
+    $lvs_status = nil
+    macros[deck] ||= RBA::Macro.new(deck)
+    macros[deck].run
+    result['status'] = $lvs_status || 'extracted'
+  rescue StandardError => e
+    result['error'] = e.message
+  ensure
+    names.each { |name| eval("$#{name} = nil", binding, __FILE__, __LINE__) }
+  end
+
+  result['run_time'] = Time.now - start_time
+  puts "LVS_WORKER_RESULT #{JSON.generate(result)}"
+end
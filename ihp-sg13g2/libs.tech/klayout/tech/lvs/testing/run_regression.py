@@ -17,8 +17,10 @@
 
 """Run IHP 130nm BiCMOS Open Source PDK - SG13G2 LVS device regression."""
 
-from subprocess import check_call
+from subprocess import check_call, Popen, PIPE, STDOUT
 import concurrent.futures
+import json
+import queue
 import traceback
 import yaml
 import argparse
@@ -31,11 +33,23 @@ import glob
 from pathlib import Path
 import errno
 import shutil
+import sys
+
+try:
+    import regression_cache
+    import run_lvs
+except ModuleNotFoundError:
+    sys.path.append(str(Path(__file__).resolve().parents[1]))
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+    import regression_cache
+    import run_lvs
 
 # CONSTANTS
 SUPPORTED_TC_EXT = "gds"
 SUPPORTED_SPICE_EXT = "cdl"
 SUPPORTED_SW_EXT = "yaml"
+WORKER_SCRIPT = Path(__file__).resolve().parent / "lvs_worker.rb"
+WORKER_RESULT_PREFIX = "LVS_WORKER_RESULT "
 
 
 def parse_existing_devices(rule_deck_path, output_path, target_device_group=None):
@@ -297,7 +311,213 @@ def run_test_case(
     return device_status
 
 
-def run_all_test_cases(tc_df, lvs_dir, run_dir, num_workers):
+class LVSWorker:
+    """
+    Long-lived KLayout process that runs LVS jobs sent over its stdin.
+
+    The worker runs ``lvs_worker.rb``, which loads each rule deck once and
+    reports a structured result for every job.
+    """
+
+    def __init__(self):
+        self.proc = Popen(
+            ["klayout", "-b", "-r", str(WORKER_SCRIPT)],
+            stdin=PIPE,
+            stdout=PIPE,
+            stderr=STDOUT,
+            text=True,
+            bufsize=1,
+        )
+
+    def run_job(self, deck, switches, log_path):
+        """
+        Run one LVS job and wait for its result.
+
+        Parameters
+        ----------
+        deck : string or Path
+            Path to the LVS rule deck.
+        switches : dict
+            Switches of the run, as passed with -rd to KLayout.
+        log_path : string or Path
+            Path of the file receiving the KLayout output of the job.
+
+        Returns
+        -------
+        dict
+            Job result with ``status`` (match, mismatch, extracted or error),
+            ``error`` and ``run_time``.
+        """
+        fields = [str(deck)] + [f"{k}={v}" for k, v in switches.items() if v is not None]
+        self.proc.stdin.write("\t".join(fields) + "\n")
+        self.proc.stdin.flush()
+
+        with open(log_path, "w") as log:
+            for line in self.proc.stdout:
+                if line.startswith(WORKER_RESULT_PREFIX):
+                    return json.loads(line[len(WORKER_RESULT_PREFIX):])
+                log.write(line)
+
+        raise RuntimeError(f"LVS worker exited with code {self.proc.wait()}")
+
+    def close(self):
+        """Stop the worker process."""
+        if self.proc.poll() is None:
+            self.proc.stdin.close()
+            self.proc.wait()
+
+
+def get_lvs_job(lvs_dir, layout_path, netlist_path, run_dir, device_name):
+    """
+    Build the KLayout job that run_lvs.py would run for a single test case.
+
+    Parameters
+    ----------
+    lvs_dir : string or Path
+        Path to the location where all runsets exist.
+    layout_path : string or Path object
+        Path string to the layout of the test pattern we want to test.
+    netlist_path : string or Path object
+        Path string to the netlist of the test pattern we want to test.
+    run_dir : string or Path object
+        Path to the location where is the regression run is done.
+    device_name : string
+        Device name that we are running on.
+
+    Returns
+    -------
+    tuple
+        Rule deck path and the switches of the run.
+    """
+    sw_file = os.path.join(
+        Path(layout_path.parent).absolute(), f"{device_name}.{SUPPORTED_SW_EXT}"
+    )
+    argv = get_switches(sw_file, device_name) if os.path.exists(sw_file) else []
+
+    # Same run folder structure as run_test_case
+    output_loc = os.path.join(run_dir, device_name)
+    os.makedirs(output_loc, exist_ok=True)
+    layout_path_run = os.path.join(output_loc, f"{device_name}.gds")
+    netlist_path_run = os.path.join(output_loc, f"{device_name}.cdl")
+    shutil.copyfile(layout_path, layout_path_run)
+    shutil.copyfile(netlist_path, netlist_path_run)
+
+    argv += [
+        f"--layout={layout_path_run}",
+        f"--netlist={netlist_path_run}",
+        f"--run_dir={output_loc}",
+        "--ignore_top_ports_mismatch",
+    ]
+    lvs_args = run_lvs.parse_args(argv)
+    switches = run_lvs.generate_klayout_switches(
+        lvs_args, layout_path_run, netlist_path_run, None, False
+    )
+
+    # Values are not passed through a shell, so they are set unquoted
+    switches["implicit_nets"] = lvs_args.implicit_nets
+    switches["report"] = os.path.join(output_loc, f"{device_name}.lvsdb")
+    switches["log"] = os.path.join(output_loc, f"{device_name}.log")
+    switches["target_netlist"] = os.path.join(output_loc, f"{device_name}_extracted.cir")
+
+    return os.path.join(lvs_dir, "sg13g2.lvs"), switches
+
+
+def run_pool_test_case(
+    workers,
+    lvs_dir,
+    layout_path,
+    netlist_path,
+    run_dir,
+    device_name,
+):
+    """
+    Run a single test case on a worker from the pool.
+
+    Parameters
+    ----------
+    workers : queue.Queue
+        Idle LVS workers. A worker that dies during the job is replaced.
+    lvs_dir : string or Path
+        Path to the location where all runsets exist.
+    layout_path : stirng or Path object
+        Path string to the layout of the test pattern we want to test.
+    netlist_path : stirng or Path object
+        Path string to the netlist of the test pattern we want to test.
+    run_dir : stirng or Path object
+        Path to the location where is the regression run is done.
+    device_name : string
+        Device name that we are running on.
+
+    Returns
+    -------
+    str
+        Status of the device, Passed or Failed.
+    """
+    deck, switches = get_lvs_job(lvs_dir, layout_path, netlist_path, run_dir, device_name)
+    pattern_clean = ".".join(os.path.basename(layout_path).split(".")[:-1])
+    pattern_log = os.path.join(run_dir, device_name, f"{pattern_clean}_lvs.log")
+
+    worker = workers.get()
+    try:
+        result = worker.run_job(deck, switches, pattern_log)
+    except Exception:
+        worker.close()
+        worker = LVSWorker()
+        raise
+    finally:
+        workers.put(worker)
+
+    if result["status"] == "error":
+        logging.error("%s generated an exception: %s" % (pattern_clean, result["error"]))
+        raise Exception("Failed LVS run.")
+
+    if result["status"] == "match":
+        logging.info(f"{device_name} testcase passed in {result['run_time']:.2f}s")
+        return "Passed"
+
+    logging.error(f"{device_name} testcase failed.")
+    logging.error(f"Please recheck {layout_path} file.")
+    return "Failed"
+
+
+def get_result_cache_key(lvs_dir, layout_path, netlist_path, device_name):
+    """
+    Compute the result cache key of a single test case.
+
+    The key covers the testcase layout and netlist, its switches file, the
+    LVS rule deck with all included files, the LVS and regression scripts
+    and the KLayout version.
+
+    Parameters
+    ----------
+    lvs_dir : string or Path
+        Path to the location where all runsets exist.
+    layout_path : string or Path object
+        Path string to the layout of the test pattern.
+    netlist_path : string or Path object
+        Path string to the netlist of the test pattern.
+    device_name : string
+        Device name that we are running on.
+
+    Returns
+    -------
+    str
+        Cache key of the test case result.
+    """
+    sw_file = Path(layout_path).parent.absolute() / f"{device_name}.{SUPPORTED_SW_EXT}"
+    files = [
+        layout_path,
+        netlist_path,
+        sw_file,
+        *regression_cache.get_included_files(Path(lvs_dir) / "sg13g2.lvs"),
+        Path(lvs_dir) / "run_lvs.py",
+        Path(__file__).resolve(),
+        WORKER_SCRIPT,
+    ]
+    return regression_cache.get_result_key(files, [device_name])
+
+
+def run_all_test_cases(tc_df, lvs_dir, run_dir, num_workers, cache_dir=None, pool=False):
     """
     This function run all test cases from the input dataframe.
 
@@ -311,6 +531,12 @@ def run_all_test_cases(tc_df, lvs_dir, run_dir, num_workers):
         Path string to the location of the testing code and output.
     num_workers : int
         Number of workers to use for running the regression.
+    cache_dir : Path, optional
+        Result cache directory. Test cases with a stored result for the same
+        inputs are not run again. Disabled if None.
+    pool : bool
+        Run the test cases on ``num_workers`` long-lived KLayout workers
+        instead of one run_lvs.py process per test case.
 
     Returns
     -------
@@ -319,13 +545,39 @@ def run_all_test_cases(tc_df, lvs_dir, run_dir, num_workers):
     """
 
     tc_df["device_status"] = "no status"
+    cache_keys = {}
+
+    # Reuse stored results of test cases whose inputs did not change
+    run_df = tc_df
+    if cache_dir is not None:
+        for _, row in tc_df.iterrows():
+            key = get_result_cache_key(
+                lvs_dir, row["test_layout_path"], row["test_netlist_path"], row["device_name"]
+            )
+            cached = regression_cache.load_result(cache_dir, key)
+            if cached is None:
+                cache_keys[row["run_id"]] = key
+            else:
+                tc_df.loc[tc_df["run_id"] == row["run_id"], "device_status"] = cached["device_status"]
+
+        run_df = tc_df[tc_df["run_id"].isin(cache_keys)]
+        logging.info(
+            f"Reusing cached results of {len(tc_df) - len(run_df)} test cases, running {len(run_df)}."
+        )
+
+    # Each pool task takes an idle worker, so at most num_workers jobs run at once
+    workers = queue.Queue()
+    if pool:
+        for _ in range(min(num_workers, len(run_df))):
+            workers.put(LVSWorker())
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
         future_to_run_id = dict()
-        for _, row in tc_df.iterrows():
+        for _, row in run_df.iterrows():
+            task = (run_pool_test_case, workers) if pool else (run_test_case,)
             future_to_run_id[
                 executor.submit(
-                    run_test_case,
+                    *task,
                     lvs_dir,
                     row["test_layout_path"],
                     row["test_netlist_path"],
@@ -337,12 +589,20 @@ def run_all_test_cases(tc_df, lvs_dir, run_dir, num_workers):
         for future in concurrent.futures.as_completed(future_to_run_id):
             run_id = future_to_run_id[future]
             try:
-                tc_df.loc[tc_df["run_id"] == run_id, "device_status"] = future.result()
+                device_status = future.result()
+                tc_df.loc[tc_df["run_id"] == run_id, "device_status"] = device_status
+                if run_id in cache_keys:
+                    regression_cache.save_result(
+                        cache_dir, cache_keys[run_id], {"device_status": device_status}
+                    )
             except Exception as exc:
                 logging.error("%d generated an exception: %s" % (run_id, exc))
                 traceback.print_exc()
                 tc_df.loc[tc_df["run_id"] == run_id, "device_status"] = "exception"
 
+    while not workers.empty():
+        workers.get().close()
+
     return tc_df
 
 
@@ -379,7 +639,7 @@ def aggregate_results(results_df: pd.DataFrame, devices_df: pd.DataFrame):
     return df
 
 
-def run_regression(lvs_dir, output_path, target_device_group, cpu_count):
+def run_regression(lvs_dir, output_path, target_device_group, cpu_count, cache_dir=None, pool=False):
     """
     Runs the full regression on all test cases.
 
@@ -393,6 +653,10 @@ def run_regression(lvs_dir, output_path, target_device_group, cpu_count):
         Name of device group that we want to run regression for. If None, run all found.
     cpu_count : int
         Number of cpu cores to be used in running testcases.
+    cache_dir : Path, optional
+        Result cache directory, or None to run all test cases.
+    pool : bool
+        Run the test cases on long-lived KLayout workers.
     Returns
     -------
     bool
@@ -414,7 +678,7 @@ def run_regression(lvs_dir, output_path, target_device_group, cpu_count):
     logging.info("Found testcases: \n" + str(tc_df))
 
     # Run all test cases.
-    results_df = run_all_test_cases(tc_df, lvs_dir, output_path, cpu_count)
+    results_df = run_all_test_cases(tc_df, lvs_dir, output_path, cpu_count, cache_dir, pool)
     logging.info("Testcases found results: \n" + str(results_df))
 
     # Aggregate all dataframe into one
@@ -438,7 +702,7 @@ def run_regression(lvs_dir, output_path, target_device_group, cpu_count):
         return True
 
 
-def main(lvs_dir, output_path, target_device_group, workers_count):
+def main(lvs_dir, output_path, target_device_group, workers_count, cache_dir=None, pool=False):
     """
     Main function to run LVS regression for SG13G2.
 
@@ -450,6 +714,12 @@ def main(lvs_dir, output_path, target_device_group, workers_count):
         Path string to the location of the output results of the run.
     target_device_group : str or None
         Name of device group that we want to run regression for. If None, run all found.
+    workers_count : int
+        Number of worker threads.
+    cache_dir : Path, optional
+        Result cache directory, or None to run all test cases.
+    pool : bool
+        Run the test cases on long-lived KLayout workers.
     Returns
     -------
     bool
@@ -464,7 +734,9 @@ def main(lvs_dir, output_path, target_device_group, workers_count):
     t0 = time.time()
 
     # Calling regression function
-    run_status = run_regression(lvs_dir, output_path, target_device_group, workers_count)
+    run_status = run_regression(
+        lvs_dir, output_path, target_device_group, workers_count, cache_dir, pool
+    )
 
     #  End of execution time
     logging.info("Total execution time {}s".format(time.time() - t0))
@@ -480,6 +752,7 @@ if __name__ == "__main__":
     USAGE = """
     run_regression.py (--help | -h)
     run_regression.py [--device=<device>] [--run_dir=<run_dir_path>] [--mp=<num>]
+                      [--cache] [--cache_dir=<cache_dir>] [--pool]
     """
 
     parser = argparse.ArgumentParser(
@@ -504,6 +777,22 @@ if __name__ == "__main__":
         default=None,
         help="Number of worker threads. Default uses os.cpu_count().",
     )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Reuse stored results of test cases whose inputs did not change since an earlier run.",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=str(regression_cache.DEFAULT_CACHE_DIR / "lvs"),
+        help="Directory of the regression result cache. Default: ~/.cache/ihp-sg13g2/regression/lvs.",
+    )
+    parser.add_argument(
+        "--pool",
+        action="store_true",
+        help="Run test cases on --mp long-lived KLayout workers that load the LVS rule deck once.",
+    )
     args = parser.parse_args()
 
     # default run name
@@ -552,4 +841,5 @@ if __name__ == "__main__":
 
     # Calling main function
     workers_count = os.cpu_count() if args.mp is None else int(args.mp)
-    run_status = main(lvs_dir, output_path, target_device_group, workers_count)
+    cache_dir = Path(args.cache_dir).expanduser().resolve() if args.cache else None
+    run_status = main(lvs_dir, output_path, target_device_group, workers_count, cache_dir, args.pool)
@@ -19,6 +19,7 @@
 
 from subprocess import check_call
 import concurrent.futures
+import functools
 import traceback
 import yaml
 import argparse
@@ -30,6 +31,20 @@ import logging
 import glob
 from pathlib import Path
 import shutil
+import sys
+
+import klayout.db
+
+try:
+    import layout_cache
+    import regression_cache
+    import run_lvs
+except ModuleNotFoundError:
+    sys.path.append(str(Path(__file__).resolve().parents[1]))
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+    import layout_cache
+    import regression_cache
+    import run_lvs
 
 # CONSTANTS
 SUPPORTED_TC_EXT = "gds"
@@ -247,7 +262,73 @@ def run_test_case(
     return cell_status
 
 
-def run_all_test_cases(tc_df: pd.DataFrame, lvs_dir, run_dir, num_workers):
+@functools.lru_cache(maxsize=None)
+def get_layout_cell_hashes(layout_path):
+    """
+    Hash the hierarchy of every cell of a testcase layout.
+
+    Parameters
+    ----------
+    layout_path : string or Path
+        Path to the testcase layout.
+
+    Returns
+    -------
+    dict
+        Mapping of cell name to the hash of its geometry and child cells.
+    """
+    layout = klayout.db.Layout()
+    layout.read(str(layout_path))
+    return {
+        layout.cell(ci).name: cell_hash
+        for ci, cell_hash in layout_cache.compute_cell_hashes(layout).items()
+    }
+
+
+def get_result_cache_key(lvs_dir, layout_path, netlist_path, cell_name):
+    """
+    Compute the result cache key of a single cell test case.
+
+    The key covers the fingerprint of the cell hierarchy in the layout, the
+    fingerprint of its subcircuit with all subcircuits below it in the
+    netlist, its switches file, the LVS
+    rule deck with all included files, the LVS and regression scripts and
+    the KLayout version. Edits to the other cells of the same testcase
+    files do not change it.
+
+    Parameters
+    ----------
+    lvs_dir : string or Path
+        Path to the location where all runsets exist.
+    layout_path : string or Path object
+        Path string to the layout of the test pattern.
+    netlist_path : string or Path object
+        Path string to the netlist of the test pattern.
+    cell_name : string
+        Cell name that we are running on.
+
+    Returns
+    -------
+    str or None
+        Cache key of the test case result, or None if the cell is missing
+        from its layout or netlist.
+    """
+    layout_hash = get_layout_cell_hashes(layout_path).get(cell_name)
+    subckt_hash = run_lvs.get_subckt_hashes(str(netlist_path)).get(cell_name.upper())
+    if layout_hash is None or subckt_hash is None:
+        return None
+
+    sw_file = Path(layout_path).parent.absolute() / f"{cell_name}.{SUPPORTED_SW_EXT}"
+    files = [
+        sw_file,
+        *regression_cache.get_included_files(Path(lvs_dir) / "sg13g2.lvs"),
+        Path(lvs_dir) / "run_lvs.py",
+        Path(__file__).resolve(),
+    ]
+    return regression_cache.get_result_key(files, [cell_name, layout_hash, subckt_hash])
+
+
+def run_all_test_cases(tc_df: pd.DataFrame, lvs_dir, run_dir, num_workers, cache_dir=None):
     """
     This function run all test cases from the input dataframe.
 
@@ -261,6 +342,9 @@ def run_all_test_cases(tc_df: pd.DataFrame, lvs_dir, run_dir, num_workers):
         Path string to the location of the testing code and output.
     num_workers : int
         Number of workers to use for running the regression.
+    cache_dir : Path, optional
+        Result cache directory. Cells whose fingerprints and runset did not
+        change since a stored result are not run again. Disabled if None.
 
     Returns
     -------
@@ -269,10 +353,31 @@ def run_all_test_cases(tc_df: pd.DataFrame, lvs_dir, run_dir, num_workers):
     """
 
     tc_df["cell_status"] = "no status"
+    cache_keys = {}
+
+    # Report unchanged cells from their previous result
+    run_df = tc_df
+    if cache_dir is not None:
+        skipped = set()
+        for _, row in tc_df.iterrows():
+            key = get_result_cache_key(
+                lvs_dir, row["layout_path"], row["netlist_path"], row["cell_name"]
+            )
+            cached = regression_cache.load_result(cache_dir, key) if key else None
+            if cached is None:
+                cache_keys[row["run_id"]] = key
+            else:
+                skipped.add(row["run_id"])
+                tc_df.loc[tc_df["run_id"] == row["run_id"], "cell_status"] = cached["cell_status"]
+
+        run_df = tc_df[~tc_df["run_id"].isin(skipped)]
+        logging.info(
+            f"Reusing previous results of {len(skipped)} unchanged cells, running {len(run_df)}."
+        )
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
         future_to_run_id = dict()
-        for _, row in tc_df.iterrows():
+        for _, row in run_df.iterrows():
             future_to_run_id[
                 executor.submit(
                     run_test_case,
@@ -287,7 +392,12 @@ def run_all_test_cases(tc_df: pd.DataFrame, lvs_dir, run_dir, num_workers):
         for future in concurrent.futures.as_completed(future_to_run_id):
             run_id = future_to_run_id[future]
             try:
-                tc_df.loc[tc_df["run_id"] == run_id, "cell_status"] = future.result()
+                cell_status = future.result()
+                tc_df.loc[tc_df["run_id"] == run_id, "cell_status"] = cell_status
+                if cache_keys.get(run_id):
+                    regression_cache.save_result(
+                        cache_dir, cache_keys[run_id], {"cell_status": cell_status}
+                    )
             except Exception as exc:
                 logging.error("%d generated an exception: %s" % (run_id, exc))
                 traceback.print_exc()
@@ -296,7 +406,7 @@ def run_all_test_cases(tc_df: pd.DataFrame, lvs_dir, run_dir, num_workers):
     return tc_df
 
 
-def run_regression(lvs_dir, cells_dir, output_path, target_cell, cpu_count, cells):
+def run_regression(lvs_dir, cells_dir, output_path, target_cell, cpu_count, cells, cache_dir=None):
     """
     Runs the full regression for std cells.
 
@@ -314,6 +424,8 @@ def run_regression(lvs_dir, cells_dir, output_path, target_cell, cpu_count, cell
         Number of cpu cores to be used in running testcases.
     cells : list
         List that holds all available cells will be tested.
+    cache_dir : Path, optional
+        Result cache directory, or None to run all cells.
     Returns
     -------
     bool
@@ -324,7 +436,7 @@ def run_regression(lvs_dir, cells_dir, output_path, target_cell, cpu_count, cell
     tc_df = build_tests_dataframe(cells_dir, target_cell, cells)
 
     # Run all test cases.
-    results_df = run_all_test_cases(tc_df, lvs_dir, output_path, cpu_count)
+    results_df = run_all_test_cases(tc_df, lvs_dir, output_path, cpu_count, cache_dir)
     results_df.drop_duplicates(inplace=True)
     results_df.drop("run_id", inplace=True, axis=1)
     logging.info("Final results table: \n" + str(results_df))
@@ -346,7 +458,7 @@ def run_regression(lvs_dir, cells_dir, output_path, target_cell, cpu_count, cell
         return True
 
 
-def main(lvs_dir, cells_dir, output_path, target_cell, cells, workers_count):
+def main(lvs_dir, cells_dir, output_path, target_cell, cells, workers_count, cache_dir=None):
     """
     Main function to run LVS regression for SG13G2 std cells.
 
@@ -362,6 +474,10 @@ def main(lvs_dir, cells_dir, output_path, target_cell, cells, workers_count):
         Name of cell that we want to run regression for. If None, run all found.
     cells : list
         List that holds all available cells will be tested
+    workers_count : int
+        Number of worker threads.
+    cache_dir : Path, optional
+        Result cache directory, or None to run all cells.
     Returns
     -------
     bool
@@ -377,7 +493,7 @@ def main(lvs_dir, cells_dir, output_path, target_cell, cells, workers_count):
 
     # Calling regression function
     run_status = run_regression(
-        lvs_dir, cells_dir, output_path, target_cell, workers_count, cells
+        lvs_dir, cells_dir, output_path, target_cell, workers_count, cells, cache_dir
     )
 
     #  End of execution time
@@ -394,6 +510,7 @@ if __name__ == "__main__":
     USAGE = """
     run_regression_cells.py (--help | -h)
     run_regression_cells.py [--cell=<cell>] [--run_dir=<run_dir_path>] [--mp=<num>]
+                            [--cache] [--cache_dir=<cache_dir>]
     """
 
     parser = argparse.ArgumentParser(
@@ -418,6 +535,17 @@ if __name__ == "__main__":
         default=None,
         help="Number of worker threads. Default uses os.cpu_count().",
     )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Report cells whose layout, netlist and LVS runset did not change from their previous result.",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=str(regression_cache.DEFAULT_CACHE_DIR / "lvs_cells"),
+        help="Directory of the regression result cache. Default: ~/.cache/ihp-sg13g2/regression/lvs_cells.",
+    )
     args = parser.parse_args()
 
     # default run name
@@ -477,4 +605,5 @@ if __name__ == "__main__":
 
     # Calling main function
     workers_count = os.cpu_count() if args.mp is None else int(args.mp)
-    main(lvs_dir, cells_dir, output_path, target_cell, cells, workers_count)
+    cache_dir = Path(args.cache_dir).expanduser().resolve() if args.cache else None
+    main(lvs_dir, cells_dir, output_path, target_cell, cells, workers_count, cache_dir)
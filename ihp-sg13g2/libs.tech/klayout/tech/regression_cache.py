@@ -0,0 +1,157 @@
+# =========================================================================================
+# Copyright 2025 IHP PDK Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================================
+
+"""
+Testcase result cache shared by the SG13G2 KLayout DRC and LVS regressions.
+
+The result of a testcase is stored under a hash of all its inputs: the
+testcase files, its switches, the rule deck files it runs, the tech JSON
+and the KLayout version. A later regression reuses the stored result of
+every testcase whose inputs did not change, so only the testcases affected
+by an edit are run again.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "ihp-sg13g2" / "regression"
+
+# KLayout rule deck include directive, resolved relative to the including file.
+INCLUDE_PATTERN = re.compile(r"^\s*#\s*%include\s+(\S+)", re.MULTILINE)
+
+
+def get_included_files(deck_path: Path) -> List[Path]:
+    """
+    Get a rule deck and all files it includes, recursively.
+
+    Parameters
+    ----------
+    deck_path : Path
+        Path to the rule deck.
+
+    Returns
+    -------
+    List of Path
+        The deck followed by its included files, in include order.
+    """
+    files = []
+
+    def add_file(path: Path):
+        path = path.resolve()
+        if path in files or not path.is_file():
+            return
+        files.append(path)
+        for include in INCLUDE_PATTERN.findall(path.read_text()):
+            add_file(path.parent / include)
+
+    add_file(Path(deck_path))
+    return files
+
+
+@functools.lru_cache(maxsize=None)
+def get_klayout_version() -> str:
+    """Return the version string of the KLayout executable in PATH."""
+    return os.popen("klayout -b -v").read().strip()
+
+
+def get_result_key(files: Iterable[Path], extra: Iterable[str] = ()) -> str:
+    """
+    Compute the cache key of a testcase result.
+
+    Parameters
+    ----------
+    files : iterable of Path
+        Input files of the testcase. Missing files are recorded as missing,
+        so adding one later changes the key.
+    extra : iterable of str
+        Other inputs of the testcase, such as the top cell name.
+
+    Returns
+    -------
+    str
+        SHA-256 hex digest over the file contents, the extra inputs and the
+        KLayout version.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"klayout {get_klayout_version()}\n".encode())
+
+    for value in extra:
+        digest.update(f"extra {value}\n".encode())
+
+    for path in files:
+        path = Path(path)
+        if not path.is_file():
+            digest.update(f"missing {path.name}\n".encode())
+            continue
+        digest.update(f"file {path.name}\n".encode())
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 24), b""):
+                digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def load_result(cache_dir: Path, key: str) -> Optional[dict]:
+    """
+    Load a stored testcase result.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        Cache directory.
+    key : str
+        Cache key from ``get_result_key``.
+
+    Returns
+    -------
+    dict or None
+        The stored result, or None if there is none.
+    """
+    result_path = Path(cache_dir) / f"{key}.json"
+    if not result_path.is_file():
+        return None
+    try:
+        with open(result_path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def save_result(cache_dir: Path, key: str, result: dict):
+    """
+    Store a testcase result atomically.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        Cache directory.
+    key : str
+        Cache key from ``get_result_key``.
+    result : dict
+        JSON serializable result of the testcase.
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    result_path = cache_dir / f"{key}.json"
+    tmp_path = result_path.with_name(f"{result_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(result, f, indent=2)
+    os.replace(tmp_path, result_path)
@@ -27,21 +27,205 @@
 import sys
 import os
 import re
+import csv
 import glob
-import select
+import json
+import queue
+import functools
 import subprocess
+import multiprocessing
+
+import numpy as np
+
+# Layers reported by the check script, in the order used for the density
+# arrays:  (magic output name, report name, stepped area limits, whole-chip
+# limits).  Limits are (min, min rule, max, max rule), with None for limits
+# that are not checked.
+
+density_layers = [
+    ('ACTIVE', 'Active', (0.33, 'AFil.g2', 0.65, 'AFil.g3'), (0.35, 'aFil.g', 0.55, 'AFil.g1')),
+    ('POLY',   'Poly',   None,                               (0.15, 'GFil.g', None, None)),
+    ('MET1',   'MET1',   (0.25, 'MFil.h', 0.75, 'MFil.k'),   (0.35, 'M1.j', 0.60, 'M1.k')),
+    ('MET2',   'MET2',   (0.25, 'MFil.h', 0.75, 'MFil.k'),   (0.35, 'M2.j', 0.60, 'M2.k')),
+    ('MET3',   'MET3',   (0.25, 'MFil.h', 0.75, 'MFil.k'),   (0.35, 'M3.j', 0.60, 'M3.k')),
+    ('MET4',   'MET4',   (0.25, 'MFil.h', 0.75, 'MFil.k'),   (0.35, 'M4.j', 0.60, 'M4.k')),
+    ('MET5',   'MET5',   (0.25, 'MFil.h', 0.75, 'MFil.k'),   (0.35, 'M5.j', 0.60, 'M5.k')),
+    ('TOP1',   'TOP1',   None,                               (0.25, 'TM1.c', 0.70, 'TM1.d')),
+    ('TOP2',   'TOP2',   None,                               (0.25, 'TM2.c', 0.70, 'TM2.d'))]
 
 def usage():
     print("Usage:")
-    print("check_density.py [<layout_file_name>] [-keep]")
+    print("check_density.py [<layout_file_name>] [-keep] [-debug] [-csv=<file>] [-dist[=<n>]]")
     print("")
     print("where:")
     print("   <layout_file_name> is the path to the .gds or .mag file to be checked.")
     print("")
     print("  If '-keep' is specified, then keep the check script.")
     print("  If '-debug' is specified, then print diagnostic information.")
+    print("  If '-csv=<file>' is specified, then write the stepped area densities")
+    print("     of all layers to <file>.")
+    print("  If '-dist' is specified, then run distributed (multi-processing), with")
+    print("     the rows of tiles split over <n> magic processes (default one per CPU).")
     return 0
 
+# Run the density check script in magic on every <workers>th row of tiles,
+# starting at row <worker>.  Magic output is read as it arrives:  each JSON
+# record is passed to handler, and all other lines are printed.  Returns the
+# magic exit status.
+
+def run_density_check(layoutpath, rcfile_path, handler, worker=0, workers=1):
+    myenv = os.environ.copy()
+    myenv['MAGTYPE'] = 'mag'
+    myenv['DENSITY_ROW_START'] = str(worker)
+    myenv['DENSITY_ROW_STEP'] = str(workers)
+
+    magic_run_opts = [
+		'magic',
+		'-dnull',
+		'-noconsole',
+		'-rcfile', rcfile_path,
+		layoutpath + '/check_density.tcl']
+
+    mproc = subprocess.Popen(magic_run_opts,
+		stdin = subprocess.DEVNULL,
+		stdout = subprocess.PIPE,
+		stderr = subprocess.STDOUT,
+		cwd = layoutpath,
+		env = myenv,
+		universal_newlines = True)
+
+    for line in mproc.stdout:
+        line = line.strip()
+        record = None
+        if line.startswith('{'):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                pass
+        if record is None:
+            print(line, flush=True)
+        else:
+            handler(record)
+    return mproc.wait()
+
+# Procedure for multiprocessing only:  Run the density check on one subset
+# of the rows of tiles, passing the density records back through tilequeue.
+
+def checkrows(worker, workers, layoutpath, rcfile_path, tilequeue):
+    return run_density_check(layoutpath, rcfile_path, tilequeue.put, worker, workers)
+
+# Collects the density records of the check script as they arrive into an
+# array of tile densities (layers x ytiles x xtiles).  The stepped area
+# violations of each row of areas are reported as soon as both rows of
+# tiles under it are complete, while magic is still running.
+
+class DensityTiles:
+    def __init__(self, debugmode=False):
+        self.debugmode = debugmode
+        self.xtiles = 0
+        self.ytiles = 0
+        self.xfrac = 0.0
+        self.yfrac = 0.0
+        self.tiles = None
+        self.weights = None
+        self.rowcount = None
+        self.nextrow = 0
+
+    def add(self, record):
+        if self.debugmode:
+            print('Magic output record: ' + json.dumps(record))
+        if 'xtiles' in record:
+            if self.tiles is None:
+                self.xtiles = int(record['xtiles'])
+                self.ytiles = int(record['ytiles'])
+                self.xfrac = float(record['xfrac'])
+                self.yfrac = float(record['yfrac'])
+                self.tiles = np.full((len(density_layers), self.ytiles, self.xtiles), np.nan)
+                self.weights = tile_weights(self.xtiles, self.ytiles, self.xfrac, self.yfrac)
+                self.rowcount = np.zeros(self.ytiles, dtype=int)
+            return
+        if self.tiles is None:
+            return
+
+        x = int(record['x'])
+        y = int(record['y'])
+        if x >= self.xtiles or y >= self.ytiles:
+            return
+        for index, layer in enumerate(density_layers):
+            self.tiles[index, y, x] = float(record.get(layer[0], np.nan))
+        self.rowcount[y] += 1
+
+        while self.nextrow < self.ytiles - 1 and self.rowcount[self.nextrow] >= self.xtiles \
+			and self.rowcount[self.nextrow + 1] >= self.xtiles:
+            self.report_row(self.nextrow)
+            self.nextrow += 1
+
+    # Print the stepped area violations of one row of areas.  These are
+    # progress notes only;  the errors are reported once in the final results.
+
+    def report_row(self, y):
+        densities = stepped_densities(self.tiles[:, y:y + 2], self.weights[y:y + 2])
+        for name, rule, x, y, density, comparison, limit in stepped_violations(densities, y):
+            print('Found violation:  ' + name + ' Density ' + comparison + ' ' +
+			'{:.0f}'.format(limit * 100) + '% (' + rule + ') at tile (' +
+			str(x) + ', ' + str(y) + '):  ' + '{:.3f}'.format(density), flush=True)
+
+# Weight of each tile in the density sums.  The last column and row of tiles
+# extend past the layout, so only the xfrac and yfrac part of them is counted.
+
+def tile_weights(xtiles, ytiles, xfrac, yfrac):
+    xweights = np.ones(xtiles)
+    xweights[-1] = xfrac
+    yweights = np.ones(ytiles)
+    yweights[-1] = yfrac
+    return np.outer(yweights, xweights)
+
+# Sum each 2 x 2 group of tiles (800um x 800um area stepped by 400um) over
+# the last two axes of the array.
+
+def window_sums(tiles):
+    return tiles[..., :-1, :-1] + tiles[..., :-1, 1:] + tiles[..., 1:, :-1] + tiles[..., 1:, 1:]
+
+# Compute the stepped area densities (layers x ytiles-1 x xtiles-1) from the
+# tile densities (layers x ytiles x xtiles) and the tile weights.
+
+def stepped_densities(tiles, weights):
+    return window_sums(tiles * weights) / window_sums(weights)
+
+# Compute the whole-chip density of each layer from the tile densities.
+
+def global_densities(tiles, weights):
+    return (tiles * weights).sum(axis=(1, 2)) / weights.sum()
+
+# Find the stepped areas violating the density limits, where the first row
+# of densities is row yoffset.  Returns a list of (layer name, rule, x, y,
+# density, comparison, limit) entries.
+
+def stepped_violations(densities, yoffset=0):
+    violations = []
+    for index, (key, name, limits, glimits) in enumerate(density_layers):
+        if limits is None:
+            continue
+        minval, minrule, maxval, maxrule = limits
+        low = densities[index] < minval
+        high = densities[index] > maxval
+        for y, x in zip(*np.nonzero(low | high)):
+            if low[y, x]:
+                violations.append((name, minrule, x, y + yoffset, densities[index, y, x], '<', minval))
+            else:
+                violations.append((name, maxrule, x, y + yoffset, densities[index, y, x], '>', maxval))
+    return violations
+
+# Write the stepped area densities of all layers, one row per area.
+
+def write_density_csv(filename, densities):
+    with open(filename, 'w', newline='') as cfile:
+        writer = csv.writer(cfile)
+        writer.writerow(['x', 'y'] + [layer[0] for layer in density_layers])
+        for y in range(densities.shape[1]):
+            for x in range(densities.shape[2]):
+                writer.writerow([x, y] + ['{:.4f}'.format(d) for d in densities[:, y, x]])
+
 if __name__ == '__main__':
 
     optionlist = []
@@ -49,6 +233,9 @@ if __name__ == '__main__':
 
     debugmode = False
     keepmode = False
+    distmode = False
+    workers = 0
+    csvfile = None
 
     for option in sys.argv[1:]:
         if option.find('-', 0) == 0:
@@ -72,6 +259,17 @@ if __name__ == '__main__':
             print('Keeping all files after running.')
     elif debugmode:
         print('Temporary files will be removed after running.')
+    for option in optionlist:
+        if option.startswith('-csv='):
+            csvfile = option.split('=', 1)[1]
+        elif option == '-dist' or option.startswith('-dist='):
+            distmode = True
+            if option.startswith('-dist='):
+                workers = int(option.split('=', 1)[1])
+            if workers <= 0:
+                workers = os.cpu_count()
+            print('Running in distributed (multi-processing) mode with '
+			+ str(workers) + ' processes.')
 
     # Find layout from command-line argument
 
@@ -206,9 +404,6 @@ if __name__ == '__main__':
         print('set ybase [lindex $fullbox 1]', file=ofile)
         print('', file=ofile)
 
-        print('puts stdout "XTILES: $xtiles"', file=ofile)
-        print('puts stdout "YTILES: $ytiles"', file=ofile)
-        print('', file=ofile)
 
         # Need to know what fraction of a full tile is the last row and column
         print('set xfrac [expr {1.0 - ($xtiles * $stepsizex - $fullwidth + 0.0) / $stepsizex}]', file=ofile)
@@ -218,15 +413,20 @@ if __name__ == '__main__':
         print('if {$xfrac == 0.0} {set xfrac 1.0}', file=ofile)
         print('if {$yfrac == 0.0} {set yfrac 1.0}', file=ofile)
 
-        print('puts stdout "XFRAC: $xfrac"', file=ofile)
-        print('puts stdout "YFRAC: $yfrac"', file=ofile)
+        # Results are written as one JSON record per line
+        print('puts stdout "{\\"xtiles\\": $xtiles, \\"ytiles\\": $ytiles, \\"xfrac\\": $xfrac, \\"yfrac\\": $yfrac}"', file=ofile)
 
         print('cif ostyle density', file=ofile)
 
         # Process density at steps.  For efficiency, this is done in 400x400 um
         # areas, dumped to a file, and then aggregated into the 800x800 areas.
+        # In distributed mode, each process handles one subset of the rows.
 
-        print('for {set y 0} {$y < $ytiles} {incr y} {', file=ofile)
+        print('set ystart 0', file=ofile)
+        print('set ystep 1', file=ofile)
+        print('catch {set ystart $env(DENSITY_ROW_START)}', file=ofile)
+        print('catch {set ystep $env(DENSITY_ROW_STEP)}', file=ofile)
+        print('for {set y $ystart} {$y < $ytiles} {incr y $ystep} {', file=ofile)
         print('    for {set x 0} {$x < $xtiles} {incr x} {', file=ofile)
         print('        set xlo [expr $xbase + $x * $stepsizex]', file=ofile)
         print('        set ylo [expr $ybase + $y * $stepsizey]', file=ofile)
@@ -242,7 +442,6 @@ if __name__ == '__main__':
         # Run density check for each layer.  Note that only active (diffusion)
         # and metal layers 1 to 5 are checked over tiles.  Poly and top metals
         # are also checked in tiles, but only the aggregated results are used.
-        print('        puts stdout "Density results for tile x=$x y=$y"', file=ofile)
 
         print('        set fdens  [cif list cover diff_all]', file=ofile)
         print('        set pdens  [cif list cover poly_all]', file=ofile)
@@ -253,15 +452,7 @@ if __name__ == '__main__':
         print('        set m5dens [cif list cover m5_all]', file=ofile)
         print('        set m6dens [cif list cover m6_all]', file=ofile)
         print('        set m7dens [cif list cover m7_all]', file=ofile)
-        print('        puts stdout "ACTIVE: $fdens"', file=ofile)
-        print('        puts stdout "POLY: $pdens"', file=ofile)
-        print('        puts stdout "MET1: $m1dens"', file=ofile)
-        print('        puts stdout "MET2: $m2dens"', file=ofile)
-        print('        puts stdout "MET3: $m3dens"', file=ofile)
-        print('        puts stdout "MET4: $m4dens"', file=ofile)
-        print('        puts stdout "MET5: $m5dens"', file=ofile)
-        print('        puts stdout "TOP1: $m6dens"', file=ofile)
-        print('        puts stdout "TOP2: $m7dens"', file=ofile)
+        print('        puts stdout "{\\"x\\": $x, \\"y\\": $y, \\"ACTIVE\\": $fdens, \\"POLY\\": $pdens, \\"MET1\\": $m1dens, \\"MET2\\": $m2dens, \\"MET3\\": $m3dens, \\"MET4\\": $m4dens, \\"MET5\\": $m5dens, \\"TOP1\\": $m6dens, \\"TOP2\\": $m7dens}"', file=ofile)
         print('        flush stdout', file=ofile)
         print('        update idletasks', file=ofile)
 
@@ -277,121 +468,40 @@ if __name__ == '__main__':
         print('', file=ofile)
 
 
-    myenv = os.environ.copy()
-    myenv['MAGTYPE'] = 'mag'
-
     print('Running density checks on file ' + user_project_path, flush=True)
-    
-    magic_run_opts = [
-		'magic',
-		'-dnull',
-		'-noconsole',
-		'-rcfile', rcfile_path,
-		layoutpath + '/check_density.tcl']
 
-    mproc = subprocess.Popen(magic_run_opts,
-		stdin = subprocess.DEVNULL,
-		stdout = subprocess.PIPE,
-		stderr = subprocess.PIPE,
-		cwd = layoutpath,
-		env = myenv,
-		universal_newlines = True)
-
-    # Use signal to poll the process and generate any output as it arrives
-
-    dlines = []
-
-    while mproc:
-        status = mproc.poll()
-        if status != None:
+    density_tiles = DensityTiles(debugmode)
+
+    if distmode:
+        # Run magic on each subset of the rows of tiles and merge the results
+        # as they arrive
+        manager = multiprocessing.Manager()
+        tilequeue = manager.Queue()
+        pool = multiprocessing.Pool(workers)
+        checkrowsfunc = functools.partial(checkrows, workers=workers,
+			layoutpath=layoutpath, rcfile_path=rcfile_path, tilequeue=tilequeue)
+        result = pool.map_async(checkrowsfunc, range(workers))
+        while True:
             try:
-                output = mproc.communicate(timeout=1)
-            except ValueError:
-                print('Magic forced stop, status ' + str(status))
-                sys.exit(1)
-            else:
-                outlines = output[0]
-                errlines = output[1]
-                for line in outlines.splitlines():
-                    dlines.append(line)
-                    print(line)
-                for line in errlines.splitlines():
-                    print(line)
-                print('Magic exited with status ' + str(status))
-                if int(status) != 0:
-                    sys.exit(int(status))
-                else:
-                    break
-        else:
-            n = 0
-            while True:
-                n += 1
-                if n > 100:
-                    n = 0
-                    status = mproc.poll()
-                    if status != None:
-                        break
-                sresult = select.select([mproc.stdout, mproc.stderr], [], [], 0)[0]
-                if mproc.stdout in sresult:
-                    outstring = mproc.stdout.readline().strip()
-                    dlines.append(outstring)
-                    print(outstring)
-                elif mproc.stderr in sresult:
-                    outstring = mproc.stderr.readline().strip()
-                    print(outstring)
-                else:
+                density_tiles.add(tilequeue.get(timeout=1))
+            except queue.Empty:
+                if result.ready():
                     break
+        pool.close()
+        for worker, status in enumerate(result.get()):
+            print('Magic process ' + str(worker) + ' exited with status ' + str(status))
+            if status != 0:
+                sys.exit(status)
+    else:
+        status = run_density_check(layoutpath, rcfile_path, density_tiles.add)
+        print('Magic exited with status ' + str(status))
+        if status != 0:
+            sys.exit(status)
 
-    difffill  = []
-    polyfill = []
-    met1fill = []
-    met2fill = []
-    met3fill = []
-    met4fill = []
-    met5fill = []
-    met6fill = []
-    met7fill = []
-    xtiles = 0
-    ytiles = 0
-    xfrac = 0.0
-    yfrac = 0.0
-
-    for line in dlines:
-        dpair = line.split(':')
-        if debugmode:
-            print('Magic output line: ' + line)
-        if len(dpair) == 2:
-            layer = dpair[0]
-            try:
-                density = float(dpair[1].strip())
-            except:
-                continue
-            if layer == 'ACTIVE':
-                difffill.append(density)
-            elif layer == 'POLY':
-                polyfill.append(density)
-            elif layer == 'MET1':
-                met1fill.append(density)
-            elif layer == 'MET2':
-                met2fill.append(density)
-            elif layer == 'MET3':
-                met3fill.append(density)
-            elif layer == 'MET4':
-                met4fill.append(density)
-            elif layer == 'MET5':
-                met5fill.append(density)
-            elif layer == 'TOP1':
-                met6fill.append(density)
-            elif layer == 'TOP2':
-                met7fill.append(density)
-            elif layer == 'XTILES':
-                xtiles = int(dpair[1].strip())
-            elif layer == 'YTILES':
-                ytiles = int(dpair[1].strip())
-            elif layer == 'XFRAC':
-                xfrac = float(dpair[1].strip())
-            elif layer == 'YFRAC':
-                yfrac = float(dpair[1].strip())
+    xtiles = density_tiles.xtiles
+    ytiles = density_tiles.ytiles
+    xfrac = density_tiles.xfrac
+    yfrac = density_tiles.yfrac
 
     if ytiles == 0 or xtiles == 0:
         print('Failed to read XTILES or YTILES from output.')
@@ -401,6 +511,19 @@ if __name__ == '__main__':
         print('Layout is < 800um x 800um;  cannot run density checks.')
         sys.exit(1)
 
+    # Tile densities as an array of layers x ytiles x xtiles
+    tiles = density_tiles.tiles
+    weights = density_tiles.weights
+    for index, layer in enumerate(density_layers):
+        if np.isnan(tiles[index]).any():
+            print('Failed to read ' + layer[0] + ' density of all tiles from output.')
+            sys.exit(1)
+
+    if debugmode:
+        with open('tile_densities.txt', 'w') as dfile:
+            for index in range(len(density_layers)):
+                print(str(tiles[index].flatten().tolist()), file=dfile)
+
     total_tiles = (ytiles - 1) * (xtiles - 1)
 
     print('')
@@ -412,443 +535,57 @@ if __name__ == '__main__':
     print('Side adjustment = ' + '{:.3f}'.format(xfrac))
     print('Top adjustment = ' + '{:.3f}'.format(yfrac))
 
-    if debugmode:
-        with open('tile_densities.txt', 'w') as dfile:
-            print(str(difffill), file=dfile)
-            print(str(polyfill), file=dfile)
-            print(str(met1fill), file=dfile)
-            print(str(met2fill), file=dfile)
-            print(str(met3fill), file=dfile)
-            print(str(met4fill), file=dfile)
-            print(str(met5fill), file=dfile)
-            print(str(met6fill), file=dfile)
-            print(str(met7fill), file=dfile)
-
-    print('')
-    print('Active (Diffusion) Density:')
-    for y in range(0, ytiles - 1):
-        if y == ytiles - 2:
-            locyfrac = yfrac
-        else:
-            locyfrac = 1.0
-        for x in range(0, xtiles - 1):
-            if x == xtiles - 2:
-                locxfrac = xfrac
-            else:
-                locxfrac = 1.0
-
-            diffaccum = 0
-            atotal = 1.0 + locxfrac + locyfrac + locxfrac * locyfrac
-
-            base = xtiles * y + x
-            diffaccum += difffill[base]
-            diffaccum += difffill[base + 1] * locxfrac
-            base = xtiles * (y + 1) + x
-            diffaccum += difffill[base] * locyfrac
-            diffaccum += difffill[base + 1] * locxfrac * locyfrac
-            
-            diffaccum /= atotal
-            diffstr = "{:.3f}".format(diffaccum)
-            print('Tile (' + str(x) + ', ' + str(y) + '):   ' + diffstr)
-            if diffaccum < 0.33:
-                print('***Error:  Active Density < 25% (AFil.g2)')
-            elif diffaccum > 0.65:
-                print('***Error:  Active Density > 65% (AFil.g3)')
-
-    print('')
-    # print('POLY Density:')
-    for y in range(0, ytiles - 1):
-        if y == ytiles - 2:
-            locyfrac = yfrac
-        else:
-            locyfrac = 1.0
-        for x in range(0, xtiles - 1):
-            if x == xtiles - 2:
-                locxfrac = xfrac
-            else:
-                locxfrac = 1.0
-
-            polyaccum = 0
-            atotal = 1.0 + locxfrac + locyfrac + locxfrac * locyfrac
-
-            base = xtiles * y + x
-            polyaccum += polyfill[base]
-            polyaccum += polyfill[base + 1] * locxfrac
-            base = xtiles * (y + 1) + x
-            polyaccum += polyfill[base] * locyfrac
-            polyaccum += polyfill[base + 1] * locxfrac * locyfrac
-                    
-            polyaccum /= atotal
+    densities = stepped_densities(tiles, weights)
+    violations = stepped_violations(densities)
+
+    # Only active (diffusion) and metal layers 1 to 5 are checked over
+    # stepped areas.
+    for index, (key, name, limits, glimits) in enumerate(density_layers):
+        if limits is None:
+            continue
+        minval, minrule, maxval, maxrule = limits
+        print('')
+        print(name + ' Density:  min ' + '{:.3f}'.format(densities[index].min()) +
+                ', max ' + '{:.3f}'.format(densities[index].max()))
+        nlow = np.count_nonzero(densities[index] < minval)
+        nhigh = np.count_nonzero(densities[index] > maxval)
+        if nlow > 0:
+            print('***Error:  ' + name + ' Density < ' + '{:.0f}'.format(minval * 100) +
+                    '% (' + minrule + ') in ' + str(nlow) + ' tiles')
+        if nhigh > 0:
+            print('***Error:  ' + name + ' Density > ' + '{:.0f}'.format(maxval * 100) +
+                    '% (' + maxrule + ') in ' + str(nhigh) + ' tiles')
 
     print('')
-    print('MET1 Density:')
-    for y in range(0, ytiles - 1):
-        if y == ytiles - 2:
-            locyfrac = yfrac
-        else:
-            locyfrac = 1.0
-        for x in range(0, xtiles - 1):
-            if x == xtiles - 2:
-                locxfrac = xfrac
-            else:
-                locxfrac = 1.0
-
-            met1accum = 0
-            atotal = 1.0 + locxfrac + locyfrac + locxfrac * locyfrac
-
-            base = xtiles * y + x
-            met1accum += met1fill[base]
-            met1accum += met1fill[base + 1] * locxfrac
-            base = xtiles * (y + 1) + x
-            met1accum += met1fill[base] * locyfrac
-            met1accum += met1fill[base + 1] * locxfrac * locyfrac
-                    
-            met1accum /= atotal
-            met1str = "{:.3f}".format(met1accum)
-            print('Tile (' + str(x) + ', ' + str(y) + '):   ' + met1str)
-            if met1accum < 0.25:
-                print('***Error:  MET1 Density < 25% (MFil.h)')
-            elif met1accum > 0.75:
-                print('***Error:  MET1 Density > 75% (MFil.k)')
-
-    print('')
-    print('MET2 Density:')
-    for y in range(0, ytiles - 1):
-        if y == ytiles - 2:
-            locyfrac = yfrac
-        else:
-            locyfrac = 1.0
-        for x in range(0, xtiles - 1):
-            if x == xtiles - 2:
-                locxfrac = xfrac
-            else:
-                locxfrac = 1.0
-
-            met2accum = 0
-            atotal = 1.0 + locxfrac + locyfrac + locxfrac * locyfrac
-
-            base = xtiles * y + x
-            met2accum += met2fill[base]
-            met2accum += met2fill[base + 1] * locxfrac
-            base = xtiles * (y + 1) + x
-            met2accum += met2fill[base] * locyfrac
-            met2accum += met2fill[base + 1] * locxfrac * locyfrac
-            
-            met2accum /= atotal
-            met2str = "{:.3f}".format(met2accum)
-            print('Tile (' + str(x) + ', ' + str(y) + '):   ' + met2str)
-            if met2accum < 0.25:
-                print('***Error:  MET2 Density < 25% (Mil.h)')
-            elif met2accum > 0.75:
-                print('***Error:  MET2 Density > 75% (MFil.k)')
-
-    print('')
-    print('MET3 Density:')
-    for y in range(0, ytiles - 1):
-        if y == ytiles - 2:
-            locyfrac = yfrac
-        else:
-            locyfrac = 1.0
-        for x in range(0, xtiles - 1):
-            if x == xtiles - 2:
-                locxfrac = xfrac
-            else:
-                locxfrac = 1.0
-
-            met3accum = 0
-            atotal = 1.0 + locxfrac + locyfrac + locxfrac * locyfrac
-
-            base = xtiles * y + x
-            met3accum += met3fill[base]
-            met3accum += met3fill[base + 1] * locxfrac
-            base = xtiles * (y + 1) + x
-            met3accum += met3fill[base] * locyfrac
-            met3accum += met3fill[base + 1] * locxfrac * locyfrac
-                    
-            met3accum /= atotal
-            met3str = "{:.3f}".format(met3accum)
-            print('Tile (' + str(x) + ', ' + str(y) + '):   ' + met3str)
-            if met3accum < 0.25:
-                print('***Error:  MET3 Density < 25% (MFil.h)')
-            elif met3accum > 0.75:
-                print('***Error:  MET3 Density > 75% (MFil.k)')
-
-    print('')
-    print('MET4 Density:')
-    for y in range(0, ytiles - 1):
-        if y == ytiles - 2:
-            locyfrac = yfrac
-        else:
-            locyfrac = 1.0
-        for x in range(0, xtiles - 1):
-            if x == xtiles - 2:
-                locxfrac = xfrac
-            else:
-                locxfrac = 1.0
-
-            met4accum = 0
-            atotal = 1.0 + locxfrac + locyfrac + locxfrac * locyfrac
-
-            base = xtiles * y + x
-            met4accum += met4fill[base]
-            met4accum += met4fill[base + 1] * locxfrac
-            base = xtiles * (y + 1) + x
-            met4accum += met4fill[base] * locyfrac
-            met4accum += met4fill[base + 1] * locxfrac * locyfrac
-                    
-            met4accum /= atotal
-            met4str = "{:.3f}".format(met4accum)
-            print('Tile (' + str(x) + ', ' + str(y) + '):   ' + met4str)
-            if met4accum < 0.25:
-                print('***Error:  MET4 Density < 25% (MFil.h)')
-            elif met4accum > 0.75:
-                print('***Error:  MET4 Density > 75% (MFil.k)')
-
-    print('')
-    print('MET5 Density:')
-    for y in range(0, ytiles - 1):
-        if y == ytiles - 2:
-            locyfrac = yfrac
-        else:
-            locyfrac = 1.0
-        for x in range(0, xtiles - 1):
-            if x == xtiles - 2:
-                locxfrac = xfrac
-            else:
-                locxfrac = 1.0
-
-            met5accum = 0
-            atotal = 1.0 + locxfrac + locyfrac + locxfrac * locyfrac
-
-            base = xtiles * y + x
-            met5accum += met5fill[base]
-            met5accum += met5fill[base + 1] * locxfrac
-            base = xtiles * (y + 1) + x
-            met5accum += met5fill[base] * locyfrac
-            met5accum += met5fill[base + 1] * locxfrac * locyfrac
-                    
-            met5accum /= atotal
-            met5str = "{:.3f}".format(met5accum)
-            print('Tile (' + str(x) + ', ' + str(y) + '):   ' + met5str)
-            if met5accum < 0.25:
-                print('***Error:  MET5 Density < 25% (MFil.h)')
-            elif met5accum > 0.75:
-                print('***Error:  MET5 Density > 75% (MFil.k)')
-
-    print('')
-    # print('TOP1 Density:')
-    for y in range(0, ytiles - 1):
-        if y == ytiles - 2:
-            locyfrac = yfrac
-        else:
-            locyfrac = 1.0
-        for x in range(0, xtiles - 1):
-            if x == xtiles - 2:
-                locxfrac = xfrac
-            else:
-                locxfrac = 1.0
-
-            met6accum = 0
-            atotal = 1.0 + locxfrac + locyfrac + locxfrac * locyfrac
-
-            base = xtiles * y + x
-            met6accum += met6fill[base]
-            met6accum += met6fill[base + 1] * locxfrac
-            base = xtiles * (y + 1) + x
-            met6accum += met6fill[base] * locyfrac
-            met6accum += met6fill[base + 1] * locxfrac * locyfrac
-            
-            met6accum /= atotal
-
-    print('')
-    # print('TOP2 Density:')
-    for y in range(0, ytiles - 1):
-        if y == ytiles - 2:
-            locyfrac = yfrac
-        else:
-            locyfrac = 1.0
-        for x in range(0, xtiles - 1):
-            if x == xtiles - 2:
-                locxfrac = xfrac
-            else:
-                locxfrac = 1.0
-
-            met7accum = 0
-            atotal = 1.0 + locxfrac + locyfrac + locxfrac * locyfrac
+    if len(violations) > 0:
+        print('Stepped area density violations:')
+        print('{:<8} {:<8} {:<12} {:>8} {:>8}'.format('Layer', 'Rule', 'Tile', 'Density', 'Limit'))
+        for name, rule, x, y, density, comparison, limit in violations:
+            print('{:<8} {:<8} {:<12} {:>8.3f} {:>8}'.format(name, rule,
+                    '(' + str(x) + ', ' + str(y) + ')', density,
+                    comparison + ' {:.2f}'.format(limit)))
+    else:
+        print('No stepped area density violations.')
 
-            base = xtiles * y + x
-            met7accum += met7fill[base]
-            met7accum += met7fill[base + 1] * locxfrac
-            base = xtiles * (y + 1) + x
-            met7accum += met7fill[base] * locyfrac
-            met7accum += met7fill[base + 1] * locxfrac * locyfrac
-            
-            met7accum /= atotal
+    if csvfile:
+        write_density_csv(csvfile, densities)
+        print('Stepped area densities written to ' + csvfile)
 
     print('')
     print('Whole-chip (global) density results:')
 
-    atotal = ((xtiles - 1.0) * (ytiles - 1.0)) + ((ytiles - 1.0) * xfrac) + ((xtiles - 1.0) * yfrac) + (xfrac * yfrac)
-
-    diffaccum = 0
-    for y in range(0, ytiles - 1):
-        base = xtiles * y
-        diffaccum += sum(difffill[base:base + xtiles - 1])
-        diffaccum += difffill[base + xtiles - 1] * xfrac
-    base = xtiles * (ytiles - 1)
-    diffaccum += sum(difffill[base:base + xtiles - 1]) * yfrac
-    diffaccum += difffill[base + xtiles - 1] * xfrac * yfrac
-
-    diffaccum /= atotal
-    diffstr = "{:.3f}".format(diffaccum)
-    print('')
-    print('Active (Diffusion) Density: ' + diffstr)
-    if diffaccum < 0.35:
-        print('***Error:  Active Density < 35% (aFil.g)')
-    elif diffaccum > 0.55:
-        print('***Error:  Active Density > 55% (AFil.g1)')
-
-    polyaccum = 0
-    for y in range(0, ytiles - 1):
-        base = xtiles * y
-        polyaccum += sum(polyfill[base:base + xtiles - 1])
-        polyaccum += polyfill[base + xtiles - 1] * xfrac
-    base = xtiles * (ytiles - 1)
-    polyaccum += sum(polyfill[base:base + xtiles - 1]) * yfrac
-    polyaccum += polyfill[base + xtiles - 1] * xfrac * yfrac
-
-    polyaccum /= atotal
-    polystr = "{:.3f}".format(polyaccum)
-    print('')
-    print('POLY Density: ' + polystr)
-    if polyaccum < 0.15:
-        print('***Error:  Poly Density < 15% (GFil.g)')
-
-    met1accum = 0
-    for y in range(0, ytiles - 1):
-        base = xtiles * y
-        met1accum += sum(met1fill[base:base + xtiles - 1])
-        met1accum += met1fill[base + xtiles - 1] * xfrac
-    base = xtiles * (ytiles - 1)
-    met1accum += sum(met1fill[base:base + xtiles - 1]) * yfrac
-    met1accum += met1fill[base + xtiles - 1] * xfrac * yfrac
-
-    met1accum /= atotal
-    met1str = "{:.3f}".format(met1accum)
-    print('')
-    print('MET1 Density: ' + met1str)
-    if met1accum < 0.35:
-        print('***Error:  MET1 Density < 35% (M1.j)')
-    elif met1accum > 0.60:
-        print('***Error:  MET1 Density > 60% (M1.k)')
-
-    met2accum = 0
-    for y in range(0, ytiles - 1):
-        base = xtiles * y
-        met2accum += sum(met2fill[base:base + xtiles - 1])
-        met2accum += met2fill[base + xtiles - 1] * xfrac
-    base = xtiles * (ytiles - 1)
-    met2accum += sum(met2fill[base:base + xtiles - 1]) * yfrac
-    met2accum += met2fill[base + xtiles - 1] * xfrac * yfrac
-
-    met2accum /= atotal
-    met2str = "{:.3f}".format(met2accum)
-    print('')
-    print('MET2 Density: ' + met2str)
-    if met2accum < 0.35:
-        print('***Error:  MET2 Density < 35% (M2.j)')
-    elif met2accum > 0.60:
-        print('***Error:  MET2 Density > 60% (M2.k)')
-
-    met3accum = 0
-    for y in range(0, ytiles - 1):
-        base = xtiles * y
-        met3accum += sum(met3fill[base:base + xtiles - 1])
-        met3accum += met3fill[base + xtiles - 1] * xfrac
-    base = xtiles * (ytiles - 1)
-    met3accum += sum(met3fill[base:base + xtiles - 1]) * yfrac
-    met3accum += met3fill[base + xtiles - 1] * xfrac * yfrac
-
-    met3accum /= atotal
-    met3str = "{:.3f}".format(met3accum)
-    print('')
-    print('MET3 Density: ' + met3str)
-    if met3accum < 0.35:
-        print('***Error:  MET3 Density < 35% (M3.j)')
-    elif met3accum > 0.60:
-        print('***Error:  MET3 Density > 60% (M3.k)')
-
-    met4accum = 0
-    for y in range(0, ytiles - 1):
-        base = xtiles * y
-        met4accum += sum(met4fill[base:base + xtiles - 1])
-        met4accum += met4fill[base + xtiles - 1] * xfrac
-    base = xtiles * (ytiles - 1)
-    met4accum += sum(met4fill[base:base + xtiles - 1]) * yfrac
-    met4accum += met4fill[base + xtiles - 1] * xfrac * yfrac
-
-    met4accum /= atotal
-    met4str = "{:.3f}".format(met4accum)
-    print('')
-    print('MET4 Density: ' + met4str)
-    if met4accum < 0.35:
-        print('***Error:  MET4 Density < 35% (M4.j)')
-    elif met4accum > 0.60:
-        print('***Error:  MET4 Density > 60% (M4.k)')
-
-    met5accum = 0
-    for y in range(0, ytiles - 1):
-        base = xtiles * y
-        met5accum += sum(met5fill[base:base + xtiles - 1])
-        met5accum += met5fill[base + xtiles - 1] * xfrac
-    base = xtiles * (ytiles - 1)
-    met5accum += sum(met5fill[base:base + xtiles - 1]) * yfrac
-    met5accum += met5fill[base + xtiles - 1] * xfrac * yfrac
-
-    met5accum /= atotal
-    met5str = "{:.3f}".format(met5accum)
-    print('')
-    print('MET5 Density: ' + met5str)
-    if met5accum < 0.35:
-        print('***Error:  MET5 Density < 35% (M5.j)')
-    elif met5accum > 0.60:
-        print('***Error:  MET5 Density > 60% (M5.k)')
-
-    met6accum = 0
-    for y in range(0, ytiles - 1):
-        base = xtiles * y
-        met6accum += sum(met6fill[base:base + xtiles - 1])
-        met6accum += met6fill[base + xtiles - 1] * xfrac
-    base = xtiles * (ytiles - 1)
-    met6accum += sum(met6fill[base:base + xtiles - 1]) * yfrac
-    met6accum += met6fill[base + xtiles - 1] * xfrac * yfrac
-
-    met6accum /= atotal
-    met6str = "{:.3f}".format(met6accum)
-    print('')
-    print('TOP1 Density: ' + met6str)
-    if met6accum < 0.25:
-        print('***Error:  TOP1 Density < 25% (TM1.c)')
-    elif met6accum > 0.70:
-        print('***Error:  TOP1 Density > 70% (TM1.d)')
-
-    met7accum = 0
-    for y in range(0, ytiles - 1):
-        base = xtiles * y
-        met7accum += sum(met7fill[base:base + xtiles - 1])
-        met7accum += met7fill[base + xtiles - 1] * xfrac
-    base = xtiles * (ytiles - 1)
-    met7accum += sum(met7fill[base:base + xtiles - 1]) * yfrac
-    met7accum += met7fill[base + xtiles - 1] * xfrac * yfrac
-
-    met7accum /= atotal
-    met7str = "{:.3f}".format(met7accum)
-    print('')
-    print('TOP2 Density: ' + met7str)
-    if met7accum < 0.25:
-        print('***Error:  TOP2 Density < 25% (TM2.c)')
-    elif met7accum > 0.70:
-        print('***Error:  TOP2 Density > 70% (TM2.d)')
+    gdensities = global_densities(tiles, weights)
+
+    for index, (key, name, limits, glimits) in enumerate(density_layers):
+        minval, minrule, maxval, maxrule = glimits
+        print('')
+        print(key + ' Density: ' + '{:.3f}'.format(gdensities[index]))
+        if minval is not None and gdensities[index] < minval:
+            print('***Error:  ' + name + ' Density < ' + '{:.0f}'.format(minval * 100) +
+                    '% (' + minrule + ')')
+        elif maxval is not None and gdensities[index] > maxval:
+            print('***Error:  ' + name + ' Density > ' + '{:.0f}'.format(maxval * 100) +
+                    '% (' + maxrule + ')')
 
     if not keepmode:
         if os.path.isfile(layoutpath + '/check_density.tcl'):
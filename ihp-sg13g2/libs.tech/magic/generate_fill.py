@@ -25,6 +25,7 @@
 import sys
 import os
 import re
+import csv
 import glob
 import functools
 import subprocess
@@ -32,7 +33,7 @@ import multiprocessing
 
 def usage():
     print("Usage:")
-    print("generate_fill.py <layout_name> [-keep] [-test] [-dist]")
+    print("generate_fill.py <layout_name> [-keep] [-test] [-dist] [-adaptive]")
     print("")
     print("where:")
     print("    <layout_name> is the path to the GDS file to be filled.")
@@ -40,8 +41,66 @@ def usage():
     print("  If '-keep' is specified, then keep the generation script.")
     print("  If '-test' is specified, then create but do not run the generation script.")
     print("  If '-dist' is specified, then run distributed (multi-processing).")
+    print("  If '-adaptive' is specified, then only fill layers in tiles below the")
+    print("     target density, using the densities from check_density.py.")
     return 0
 
+# Fill block layers, each with the layers of the density check whose density
+# is raised by the fill patterns that it blocks.  DIFF and POLY fill patterns
+# are generated together, so they can only be blocked together.
+
+fill_block_layers = [
+    (['DIFFBLOCK', 'POLYBLOCK'], ['ACTIVE', 'POLY']),
+    (['MET1BLOCK'], ['MET1']),
+    (['MET2BLOCK'], ['MET2']),
+    (['MET3BLOCK'], ['MET3']),
+    (['MET4BLOCK'], ['MET4']),
+    (['MET5BLOCK'], ['MET5']),
+    (['MET6BLOCK'], ['TOP1']),
+    (['MET7BLOCK'], ['TOP2'])]
+
+def read_density_csv(filename):
+    # Read the stepped area (800um x 800um areas at 400um steps) densities
+    # written by "check_density.py -csv=<file>", as a dictionary of the
+    # densities of each layer by area position.
+
+    densities = {}
+    with open(filename, 'r', newline='') as cfile:
+        for row in csv.DictReader(cfile):
+            x = int(row.pop('x'))
+            y = int(row.pop('y'))
+            densities[(x, y)] = {key: float(value) for key, value in row.items()}
+    return densities
+
+def get_fill_blocks(densities, targets):
+    # Find the layers that do not need fill in each fill tile (800um x 800um),
+    # which are the layers at or above the target density in all stepped
+    # areas overlapping the tile.  Returns a dictionary of the block layers
+    # to paint by fill tile position.
+
+    xareas = max(x for x, y in densities) + 1
+    yareas = max(y for x, y in densities) + 1
+
+    # There is one more 400um density tile than stepped areas in each
+    # direction, and each fill tile covers two density tiles.
+    xtiles = (xareas + 2) // 2
+    ytiles = (yareas + 2) // 2
+
+    fillblocks = {}
+    for y in range(ytiles):
+        for x in range(xtiles):
+            areas = []
+            for ay in range(max(0, 2 * y - 1), min(yareas, 2 * y + 2)):
+                for ax in range(max(0, 2 * x - 1), min(xareas, 2 * x + 2)):
+                    areas.append(densities[(ax, ay)])
+            blocks = []
+            for blocklayers, layers in fill_block_layers:
+                if all(area[layer] >= targets[layer] for area in areas for layer in layers):
+                    blocks.extend(blocklayers)
+            if len(blocks) > 0:
+                fillblocks[(x, y)] = blocks
+    return fillblocks
+
 def makegds(file, techfile):
     # Procedure for multiprocessing only:  Run the distributed processing
     # script to load a .mag file of one flattened square area of the layout,
@@ -88,6 +147,7 @@ if __name__ == '__main__':
     keepmode = False
     testmode = False
     distmode = False
+    adaptivemode = False
 
     for option in sys.argv[1:]:
         if option.find('-', 0) == 0:
@@ -121,6 +181,10 @@ if __name__ == '__main__':
             print('Running in distributed (multi-processing) mode.')
     elif debugmode:
         print('Running in single-processor mode.')
+    if '-adaptive' in optionlist:
+        adaptivemode = True
+        if debugmode:
+            print('Running in adaptive mode:  Only filling tiles below target density.')
 
     # Find layout from command-line argument
 
@@ -193,7 +257,54 @@ if __name__ == '__main__':
     
     project_file = os.path.split(user_project_path)[1]
     project = project_file.split(os.extsep, 1)[0]
-    
+
+    # In adaptive mode, first measure the density of the layout without
+    # fill, and find which layers of each tile are already dense enough.
+    # The target density of each layer is its whole-chip minimum density.
+
+    fillblocks = {}
+    all_blocks = []
+    for blocklayers, layers in fill_block_layers:
+        all_blocks.extend(blocklayers)
+
+    if adaptivemode:
+        from check_density import density_layers
+        targets = {}
+        for layer in density_layers:
+            targets[layer[0]] = layer[3][0]
+
+        densityfile = layoutpath + '/' + project + '_density.csv'
+        print('Running density checks to find tiles that need fill.', flush=True)
+        density_run_opts = [
+		sys.executable,
+		scriptpath + '/check_density.py',
+		user_project_path,
+		'-csv=' + densityfile]
+        if distmode:
+            density_run_opts.append('-dist')
+
+        mproc = subprocess.run(density_run_opts,
+		stdin = subprocess.DEVNULL,
+		stdout = subprocess.PIPE,
+		stderr = subprocess.STDOUT,
+		universal_newlines = True)
+        if debugmode:
+            for line in mproc.stdout.splitlines():
+                print(line)
+
+        if mproc.returncode != 0 or not os.path.isfile(densityfile):
+            print('Density check failed;  filling all tiles.')
+        else:
+            fillblocks = get_fill_blocks(read_density_csv(densityfile), targets)
+            if not keepmode:
+                os.remove(densityfile)
+            nfull = 0
+            for blocks in fillblocks.values():
+                if len(blocks) == len(all_blocks):
+                    nfull += 1
+            print(str(len(fillblocks)) + ' tiles have layers above target density, '
+			+ str(nfull) + ' of them need no fill.')
+
     ofile = open(layoutpath + '/generate_fill.tcl', 'w') 
 	
     print('#!/usr/bin/env wish', file=ofile)
@@ -300,6 +411,10 @@ if __name__ == '__main__':
     print('    spliterase ne FILLBLOCK', file=ofile)
     print('}', file=ofile) 
 
+    # List the fill block layers of each tile (adaptive mode)
+    for (x, y), blocks in sorted(fillblocks.items()):
+        print('set fillblock(' + str(x) + ',' + str(y) + ') {' + ' '.join(blocks) + '}', file=ofile)
+
     # Break layout into tiles and process each separately
     print('for {set y 0} {$y < $ytiles} {incr y} {', file=ofile)
     print('    for {set x 0} {$x < $xtiles} {incr x} {', file=ofile)
@@ -313,12 +428,23 @@ if __name__ == '__main__':
     # The flattened area must be larger than the fill tile by >1.5um
     print('        box grow c 1.6um', file=ofile)
 
+    print('        set blocks {}', file=ofile)
+    print('        catch {set blocks $fillblock($x,$y)}', file=ofile)
+
+    # A tile that needs no fill on any layer is not flattened;  an empty
+    # cell with all fill blocked is generated for it instead.
+    print('        if {[llength $blocks] == ' + str(len(all_blocks)) + '} {', file=ofile)
+    print('            puts stdout "Tile x=$x y=$y needs no fill. . . "', file=ofile)
+    print('            load ' + project + '_fill_pattern_${x}_$y -silent', file=ofile)
+    print('        } else {', file=ofile)
+
     # Flatten into a cell with a new name
-    print('        puts stdout "Flattening layout of tile x=$x y=$y. . . "', file=ofile)
-    print('        flush stdout', file=ofile)
-    print('        update idletasks', file=ofile)
-    print('        flatten -dobox -nolabels ' + project + '_fill_pattern_${x}_$y', file=ofile)
-    print('        load ' + project + '_fill_pattern_${x}_$y', file=ofile)
+    print('            puts stdout "Flattening layout of tile x=$x y=$y. . . "', file=ofile)
+    print('            flush stdout', file=ofile)
+    print('            update idletasks', file=ofile)
+    print('            flatten -dobox -nolabels ' + project + '_fill_pattern_${x}_$y', file=ofile)
+    print('            load ' + project + '_fill_pattern_${x}_$y', file=ofile)
+    print('        }', file=ofile)
 
     # Remove any GDS_FILE reference (there should not be any?)
     print('        property GDS_FILE ""', file=ofile)
@@ -328,6 +454,8 @@ if __name__ == '__main__':
     print('        erase COMMENT', file=ofile)
     print('        box values $xlo $ylo $xhi $yhi', file=ofile)
     print('        paint COMMENT', file=ofile)
+    # Block fill on layers that are already at the target density
+    print('        foreach layer $blocks {paint $layer}', file=ofile)
 
     if not distmode:
         print('        puts stdout "Writing GDS. . . "', file=ofile)